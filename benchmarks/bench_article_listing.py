@@ -0,0 +1,55 @@
+# bench_article_listing.py
+"""
+Times loading a page of articles with their authors the way GET /articles does, as plain
+rows converted by article_rows_to_dicts, for several page sizes. Loading ORM objects
+with selectinload and converting them with article_to_dict is timed as the baseline.
+
+Run with: python -m benchmarks.bench_article_listing --articles 5000
+"""
+import argparse
+import statistics
+from sqlalchemy.orm import selectinload
+from benchmarks.common import make_app, synthetic_entries, timed
+from src.instrumentation import count_queries
+from src.models import db, Article
+from src.utils import ARTICLE_COLUMNS, article_rows_to_dicts, article_to_dict, build_articles_query, bulk_upsert_articles
+
+
+def load_rows(page, per_page):
+    # The query and conversion of the offset pagination of get_articles
+    articles_query = build_articles_query().with_entities(*ARTICLE_COLUMNS)
+    articles = articles_query.paginate(page=page, per_page=per_page, error_out=False)
+    return article_rows_to_dicts(articles.items)
+
+
+def load_objects(page, per_page):
+    articles_query = build_articles_query().options(selectinload(Article.authorships))
+    articles = articles_query.paginate(page=page, per_page=per_page, error_out=False)
+    return [article_to_dict(article) for article in articles.items]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with make_app().app_context():
+        bulk_upsert_articles(synthetic_entries(args.articles))
+        db.session.commit()
+
+        for per_page in args.page_sizes:
+            for name, load in (("rows", load_rows), ("selectin", load_objects)):
+                timings = []
+                for _ in range(args.repeat):
+                    with count_queries(db.engine) as counter:
+                        _, elapsed = timed(load, 2, per_page)
+                    db.session.expunge_all()
+                    timings.append(elapsed * 1000)
+                print(f"per_page {per_page:>5} {name:<9} {statistics.median(timings):8.2f} ms "
+                      f"{counter.count:>5} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# bench_bulk_upsert.py
+"""
+Compares the per-entry ingestion loop with bulk_upsert_articles.
+
+Run with: python -m benchmarks.bench_bulk_upsert --entries 10000
+"""
+import argparse
+from benchmarks.common import make_app, synthetic_entries, timed
+from src.models import db, Article, Author
+from src.utils import bulk_upsert_articles
+
+
+def per_entry_populate(entries):
+    """The original populate_articles_by_query loop: one session.get per entry."""
+    for entry in entries:
+        existing_article = db.session.get(Article, entry["id"])
+
+        if existing_article is None:
+            new_article = Article(
+                id=entry["id"],
+                title=entry["title"],
+                summary=entry["summary"],
+                published_date=entry["published_date"],
+                updated_date=entry["updated_date"],
+                doi=entry["doi"],
+                comment=entry["comment"],
+                journal_reference=entry["journal_reference"],
+            )
+            for author_entry in entry.get("authors", []):
+                db.session.add(Author(name=author_entry.get("name", ""), article=new_article))
+            db.session.add(new_article)
+
+    db.session.commit()
+
+
+def bulk_populate(entries, chunk_size):
+    counts = bulk_upsert_articles(entries, chunk_size=chunk_size)
+    db.session.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    entries = list(synthetic_entries(args.entries))
+
+    with make_app().app_context():
+        _, elapsed = timed(per_entry_populate, entries)
+        print(f"per-entry  insert {args.entries} entries: {elapsed:8.3f}s")
+        _, elapsed = timed(per_entry_populate, entries)
+        print(f"per-entry  re-run {args.entries} entries: {elapsed:8.3f}s")
+
+    with make_app().app_context():
+        counts, elapsed = timed(bulk_populate, entries, args.chunk_size)
+        print(f"bulk       insert {args.entries} entries: {elapsed:8.3f}s {counts}")
+        counts, elapsed = timed(bulk_populate, entries, args.chunk_size)
+        print(f"bulk       re-run {args.entries} entries: {elapsed:8.3f}s {counts}")
+
+
+if __name__ == "__main__":
+    main()
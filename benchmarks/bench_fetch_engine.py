@@ -0,0 +1,47 @@
+# bench_fetch_engine.py
+"""
+Measures populate_articles_by_query against a local stand-in for the ArXiv API that
+answers every call after a fixed latency, for several fetch concurrency levels.
+
+Run with: python -m benchmarks.bench_fetch_engine --latency 0.5 --pages 20
+"""
+import argparse
+import time
+from unittest.mock import patch
+from benchmarks.common import atom_feed, make_app, synthetic_entries
+from src import utils
+from src.client import ArxivClient, RateLimiter
+from test.stub_server import StubArxivServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per upstream call")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="seconds between two calls")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    def responder(params):
+        time.sleep(args.latency)
+        start, size = int(params["start"]), int(params["max_results"])
+        return 200, atom_feed(synthetic_entries(size, offset=start))
+
+    max_results = args.pages * args.page_size
+    with StubArxivServer(responder) as server:
+        for concurrency in args.concurrency:
+            client = ArxivClient(base_url=server.url, pool_size=concurrency, limiter=RateLimiter(args.rate_limit))
+            with make_app().test_request_context(), patch.object(utils, "arxiv_client", client):
+                start = time.perf_counter()
+                response = utils.populate_articles_by_query(
+                    "bench", max_results, page_size=args.page_size, concurrency=concurrency
+                )
+                elapsed = time.perf_counter() - start
+            client.close()
+            print(f"concurrency {concurrency:>2}: {elapsed:6.2f}s for {args.pages} pages "
+                  f"({response.get_json()['inserted']} articles inserted)")
+
+
+if __name__ == "__main__":
+    main()
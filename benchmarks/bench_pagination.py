@@ -0,0 +1,63 @@
+# bench_pagination.py
+"""
+Compares OFFSET pagination with keyset (cursor) pagination on the first page and on the
+last page of the article listing, or on the pages given with --pages.
+
+Run with: python -m benchmarks.bench_pagination --articles 200000
+"""
+import argparse
+import math
+import statistics
+from benchmarks.common import make_app, synthetic_entries, timed
+from src.models import db, format_datetime, Article
+from src.utils import build_articles_query, bulk_upsert_articles, encode_cursor, keyset_page
+
+
+def dated_entries(count):
+    """Synthetic entries spread over distinct publication dates, as real harvests are."""
+    for i, entry in enumerate(synthetic_entries(count, authors_per_article=0)):
+        entry["published_date"] = f"20{10 + i // 100000:02d}-01-01T00:00:{i % 60:02d}Z"
+        yield entry
+
+
+def offset_page(page, per_page):
+    articles_query = build_articles_query().order_by(Article.published_date.desc(), Article.id.desc())
+    return articles_query.offset((page - 1) * per_page).limit(per_page).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=200000)
+    parser.add_argument("--per-page", type=int, default=10)
+    parser.add_argument("--pages", type=int, nargs="+", help="pages to time, by default the first and the last")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with make_app().app_context():
+        bulk_upsert_articles(dated_entries(args.articles))
+        db.session.commit()
+
+        last_page = max(1, math.ceil(args.articles / args.per_page))
+        for page in args.pages or sorted({1, last_page}):
+            if not 1 <= page <= last_page:
+                print(f"page {page:>7} skipped, the listing has {last_page} pages")
+                continue
+
+            # The cursor a client would hold after walking to this page
+            previous = offset_page(page - 1, args.per_page)[-1] if page > 1 else None
+            cursor = encode_cursor(format_datetime(previous.published_date), previous.id) if previous else None
+
+            for name, load in (
+                ("offset", lambda: offset_page(page, args.per_page)),
+                ("cursor", lambda: keyset_page(build_articles_query(), cursor, args.per_page)[0]),
+            ):
+                timings = []
+                for _ in range(args.repeat):
+                    _, elapsed = timed(load)
+                    db.session.expunge_all()
+                    timings.append(elapsed * 1000)
+                print(f"page {page:>7} {name:<7} {statistics.median(timings):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
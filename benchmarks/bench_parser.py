@@ -0,0 +1,55 @@
+# bench_parser.py
+"""
+Compares the parse throughput of feedparser and src.parser on a synthetic ArXiv feed.
+
+The feed repeats the entry of test/test_data/2401.13999-arxiv.xml with distinct IDs.
+
+Run with: python -m benchmarks.bench_parser --entries 2000
+"""
+import argparse
+import re
+from pathlib import Path
+import feedparser
+from benchmarks.common import timed
+from src.parser import iter_feed_entries
+
+FIXTURE = Path(__file__).parent.parent / "test" / "test_data" / "2401.13999-arxiv.xml"
+
+
+def synthetic_feed(count):
+    """Builds a feed of `count` entries from the reference fixture."""
+    content = FIXTURE.read_bytes()
+    head, rest = content.split(b"<entry>", 1)
+    entry, tail = rest.split(b"</entry>", 1)
+    entries = [
+        b"<entry>" + re.sub(rb"2401\.13999", b"2401.%05d" % i, entry) + b"</entry>"
+        for i in range(count)
+    ]
+    return head + b"\n  ".join(entries) + tail
+
+
+def parse_with_feedparser(content):
+    return len(feedparser.parse(content.decode("utf-8")).entries)
+
+
+def parse_with_iterparse(content):
+    return sum(1 for _ in iter_feed_entries(content))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    content = synthetic_feed(args.entries)
+    megabytes = len(content) / 1e6
+    print(f"feed: {args.entries} entries, {megabytes:.2f} MB")
+
+    for name, function in (("feedparser", parse_with_feedparser), ("iterparse", parse_with_iterparse)):
+        best = min(timed(function, content)[1] for _ in range(args.repeat))
+        print(f"{name:<10} {best:7.3f}s {args.entries / best:10.0f} entries/s {megabytes / best:8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
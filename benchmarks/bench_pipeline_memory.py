@@ -0,0 +1,70 @@
+# bench_pipeline_memory.py
+"""
+Reports the peak RSS and the time to the first commit of the streaming ingestion pipeline.
+
+Each harvest size runs in its own process, so ru_maxrss is the peak of that harvest alone.
+
+Run with: python -m benchmarks.bench_pipeline_memory --sizes 1000 100000
+"""
+import argparse
+import resource
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+from benchmarks.common import make_app, synthetic_entries
+
+
+def run_harvest(size, page_size):
+    from src import utils
+
+    def fetch(query, start, max_results, start_date=None, end_date=None, sort_by=None):
+        return start, max_results
+
+    def parse(feed):
+        start, max_results = feed
+        return synthetic_entries(max_results, offset=start)
+
+    first_commit = []
+    persist_articles = utils.persist_articles
+
+    def timed_persist(*args, **kwargs):
+        for counts in persist_articles(*args, **kwargs):
+            if not first_commit:
+                first_commit.append(time.perf_counter())
+            yield counts
+
+    app = make_app()
+    with app.test_request_context(), patch.object(utils, "fetch_arxiv_feed", fetch), patch.object(
+        utils, "parse_arxiv_feed", parse
+    ), patch.object(utils, "persist_articles", timed_persist):
+        start = time.perf_counter()
+        utils.populate_articles_by_query("bench", size, page_size=page_size, commit_interval=page_size)
+        elapsed = time.perf_counter() - start
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{size:>8} entries: {elapsed:7.2f}s total, first commit after "
+          f"{first_commit[0] - start:6.3f}s, peak RSS {peak_mb:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_harvest(args.child, args.page_size)
+        return
+
+    for size in args.sizes:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_pipeline_memory", "--child", str(size),
+             "--page-size", str(args.page_size)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# bench_search.py
+"""
+Compares the former ILIKE title filter with the FTS5 search of src.search on a synthetic corpus.
+
+Run with: python -m benchmarks.bench_search --articles 500000
+"""
+import argparse
+import random
+import statistics
+from benchmarks.common import make_app, timed
+from src.models import db, Article
+from src.search import search_articles
+from src.utils import bulk_upsert_articles
+
+VOCABULARY = [
+    "quantum", "neural", "network", "graph", "manifold", "entropy", "lattice", "spectral",
+    "stochastic", "gravity", "boson", "fermion", "topology", "algebra", "optimal", "transport",
+    "inference", "bayesian", "kernel", "operator", "galaxy", "cosmology", "plasma", "soliton",
+] + [f"term{i}" for i in range(5000)]
+
+QUERIES = ["neural", "quantum gravity", '"optimal transport"', "term42", "spectr*"]
+
+
+def corpus(count, seed=0):
+    generator = random.Random(seed)
+    for i in range(count):
+        yield {
+            "id": f"search.{i:07d}",
+            "title": " ".join(generator.choices(VOCABULARY, k=8)),
+            "summary": " ".join(generator.choices(VOCABULARY, k=120)),
+            "authors": [],
+        }
+
+
+def ilike_page(query):
+    # ILIKE has no phrase nor prefix syntax, it looks for the bare words in the title
+    query = query.strip('"*')
+    return Article.query.filter(Article.title.ilike(f"%{query}%")).paginate(page=1, per_page=10, error_out=False).items
+
+
+def fts_page(query):
+    return search_articles(Article.query, query).paginate(page=1, per_page=10, error_out=False).items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with make_app().app_context():
+        _, elapsed = timed(bulk_upsert_articles, corpus(args.articles), 5000)
+        db.session.commit()
+        print(f"seeded {args.articles} articles in {elapsed:.1f}s")
+
+        for query in QUERIES:
+            for name, function in (("ILIKE", ilike_page), ("FTS5", fts_page)):
+                timings = []
+                for _ in range(args.repeat):
+                    _, elapsed = timed(function, query)
+                    timings.append(elapsed * 1000)
+                    db.session.expunge_all()
+                print(f"{query:<20} {name:<6} {statistics.median(timings):9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench_serialization.py
+"""
+Compares the cost of serializing pages of 1000 articles, from the former path (Article
+objects, json.dumps with indent=2) to the current one (rows, compact output from the
+fastest encoder installed), and the bytes sent on the wire with each content coding.
+
+Run with: python -m benchmarks.bench_serialization --articles 5000
+"""
+import argparse
+import json
+import statistics
+from sqlalchemy.orm import selectinload
+from benchmarks.common import make_app, synthetic_entries, timed
+from src.models import db, Article
+from src.serializers import JSON_BACKEND, brotli, compress, dumps
+from src.utils import ARTICLE_COLUMNS, article_rows_to_dicts, article_to_dict, bulk_upsert_articles
+
+
+def orm_indented(per_page):
+    articles = Article.query.options(selectinload(Article.authorships)).limit(per_page).all()
+    return json.dumps({"articles": [article_to_dict(article) for article in articles]}, indent=2).encode("utf-8")
+
+
+def orm_compact(per_page):
+    articles = Article.query.options(selectinload(Article.authorships)).limit(per_page).all()
+    return dumps({"articles": [article_to_dict(article) for article in articles]})
+
+
+def rows_compact(per_page):
+    rows = Article.query.with_entities(*ARTICLE_COLUMNS).limit(per_page).all()
+    return dumps({"articles": article_rows_to_dicts(rows)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--per-page", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with make_app().app_context():
+        bulk_upsert_articles(synthetic_entries(args.articles))
+        db.session.commit()
+
+        print(f"JSON backend: {JSON_BACKEND}, {args.per_page} articles per page")
+        bodies = {}
+        for name, serialize in (
+            ("objects + json indent=2", orm_indented),
+            (f"objects + {JSON_BACKEND} compact", orm_compact),
+            (f"rows + {JSON_BACKEND} compact", rows_compact),
+        ):
+            timings = []
+            for _ in range(args.repeat):
+                body, elapsed = timed(serialize, args.per_page)
+                db.session.expunge_all()
+                timings.append(elapsed * 1000)
+            bodies[name] = body
+            print(f"{name:<32} {statistics.median(timings):8.2f} ms")
+
+        print()
+        for name, body in (("indent=2", bodies["objects + json indent=2"]), ("compact", body)):
+            sizes = [f"identity {len(body):>9} B", f"gzip {len(compress(body, 'gzip')):>8} B"]
+            if brotli is not None:
+                sizes.append(f"br {len(compress(body, 'br')):>8} B")
+            print(f"{name:<9} " + "  ".join(sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# bench_similar.py
+"""
+Reports the build time, query latency and memory of the similar articles index of src.similar.
+
+Each corpus size runs in its own process, so ru_maxrss is the peak of that size alone. The
+backend is SciPy sparse matrix products when NumPy and SciPy are installed, an inverted
+index in plain Python otherwise. Small corpora are also ranked by a naive loop over every
+article, for comparison.
+
+Run with: python -m benchmarks.bench_similar --sizes 100000 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+from benchmarks.common import letters, make_app, timed
+from src.models import db, Article
+from src.similar import SIMILAR_BACKEND, SimilarIndex
+
+
+# Abstracts are drawn from a vocabulary with a Zipf-like distribution of word frequencies
+VOCABULARY = [letters(i) for i in range(50000)]
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / (rank + 10) for rank in range(len(VOCABULARY))))
+
+# Largest corpus ranked by the naive loop
+NAIVE_MAX_ARTICLES = 20000
+
+
+def seed(count, seed=0):
+    generator = random.Random(seed)
+    for start in range(0, count, 10000):
+        rows = [
+            {
+                "id": f"similar.{i:07d}",
+                "title": f"Synthetic article {i}",
+                "summary": " ".join(generator.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=120)),
+            }
+            for i in range(start, min(start + 10000, count))
+        ]
+        db.session.execute(Article.__table__.insert(), rows)
+    db.session.commit()
+
+
+def naive_top_k(data, row, k):
+    """Cosine similarity of one row with every other row, in a Python loop."""
+    query = dict(zip(data.row_columns(row), data.weights[data.indptr[row]:data.indptr[row + 1]]))
+    scores = []
+    for other in range(data.rows):
+        start, end = data.indptr[other], data.indptr[other + 1]
+        score = sum(query.get(column, 0.0) * weight for column, weight in zip(data.indices[start:end], data.weights[start:end]))
+        scores.append((score, other))
+    scores.sort(reverse=True)
+    return scores[1:k + 1]
+
+
+def percentile(timings, fraction):
+    return sorted(timings)[min(len(timings) - 1, int(fraction * len(timings)))]
+
+
+def run_size(size, queries, k):
+    app = make_app()
+    with app.app_context():
+        _, elapsed = timed(seed, size)
+        print(f"{size:>8} articles seeded in {elapsed:.1f}s, backend {SIMILAR_BACKEND}")
+
+        index = SimilarIndex(tempfile.mkdtemp(prefix="arxiv-similar-"), refresh_interval=3600)
+        _, elapsed = timed(index.build)
+        stats = index.stats()
+        print(f"{size:>8} build {elapsed:8.1f}s: {stats['terms']} terms, {stats['nonzero_weights']} weights, "
+              f"{stats['disk_bytes'] / 2 ** 20:.1f} MB of index files")
+
+        generator = random.Random(1)
+        article_ids = [f"similar.{generator.randrange(size):07d}" for _ in range(queries)]
+        # The first query maps the files, and builds the inverted index of the Python backend
+        _, elapsed = timed(index.similar, article_ids[:1], k)
+        print(f"{size:>8} first query {elapsed * 1000:9.1f} ms")
+
+        timings = []
+        for article_id in article_ids:
+            _, elapsed = timed(index.similar, [article_id], k)
+            timings.append(elapsed * 1000)
+        print(f"{size:>8} single query  p50 {statistics.median(timings):9.2f} ms  p99 {percentile(timings, 0.99):9.2f} ms")
+
+        _, elapsed = timed(index.similar, article_ids, k)
+        print(f"{size:>8} batch of {queries} {elapsed * 1000 / queries:9.2f} ms per query")
+
+        if size <= NAIVE_MAX_ARTICLES:
+            data = index._data
+            rows = [data.row(article_id) for article_id in article_ids[:10]]
+            _, elapsed = timed(lambda: [naive_top_k(data, row, k) for row in rows])
+            print(f"{size:>8} naive loop    {elapsed * 1000 / len(rows):9.2f} ms per query")
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{size:>8} peak RSS {peak_mb:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_size(args.child, args.queries, args.k)
+        return
+
+    for size in args.sizes:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_similar", "--child", str(size),
+             "--queries", str(args.queries), "--k", str(args.k)],
+            check=True,
+            env=os.environ,
+        )
+
+
+if __name__ == "__main__":
+    main()
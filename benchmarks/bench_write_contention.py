@@ -0,0 +1,112 @@
+# bench_write_contention.py
+"""
+Measures concurrent write throughput: each thread committing its own writes, against
+the single writer of src.storage with group commit, then several processes each with
+their own writer, like gunicorn workers.
+
+Run with: python -m benchmarks.bench_write_contention --threads 16 --writes 200 --processes 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from sqlalchemy.exc import OperationalError
+from benchmarks.common import make_app
+from src.models import db, Article
+from src.storage import writer
+
+
+def add_article(article_id):
+    db.session.add(Article(id=article_id, title="Contention benchmark", summary="x" * 500))
+
+
+def direct_write(article_id):
+    add_article(article_id)
+    db.session.commit()
+
+
+def writer_write(article_id):
+    writer.run(add_article, article_id)
+
+
+def run_threads(app, write, threads, writes, prefix):
+    """Runs threads * writes writes and returns (elapsed seconds, lock errors)."""
+    errors = []
+
+    def work(thread):
+        with app.app_context():
+            for i in range(writes):
+                try:
+                    write(f"{prefix}.{thread}.{i}")
+                except OperationalError:
+                    db.session.rollback()
+                    errors.append(thread)
+
+    workers = [threading.Thread(target=work, args=(thread,)) for thread in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start, len(errors)
+
+
+def process_main(db_path, prefix, threads, writes, results):
+    app = make_app(db_path)
+    elapsed, errors = run_threads(app, writer_write, threads, writes, prefix)
+    results.put((elapsed, errors, writer.stats()["commits"]))
+
+
+def report(label, total, elapsed, errors, commits=None):
+    line = f"{label:<22} {total:6d} writes: {elapsed:7.3f}s {total / elapsed:9.0f} writes/s, {errors} lock errors"
+    if commits:
+        line += f", {total / commits:5.1f} writes per commit"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="writes per thread")
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    total = args.threads * args.writes
+    directory = tempfile.mkdtemp(prefix="arxiv-bench-")
+
+    # Spawned processes, the writer thread of this process is not started yet
+    context = multiprocessing.get_context("spawn")
+    db_path = os.path.join(directory, "processes.db")
+    make_app(db_path)
+    results = context.Queue()
+    processes = [
+        context.Process(target=process_main, args=(db_path, f"p{i}", args.threads, args.writes, results))
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    app = make_app(os.path.join(directory, "direct.db"))
+    report("direct commits", total, *run_threads(app, direct_write, args.threads, args.writes, "direct"))
+
+    app = make_app(os.path.join(directory, "writer.db"))
+    elapsed_writer, errors = run_threads(app, writer_write, args.threads, args.writes, "writer")
+    report("single writer", total, elapsed_writer, errors, writer.stats()["commits"])
+
+    report(
+        f"{args.processes} processes x writer",
+        total * args.processes,
+        # Process start-up excluded, the processes write at the same time
+        max(elapsed for elapsed, _, _ in outcomes),
+        sum(errors for _, errors, _ in outcomes),
+        sum(commits for _, _, commits in outcomes),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# common.py
+import os
+import tempfile
+import time
+from xml.sax.saxutils import escape
+from flask import Flask
+from src.models import db
+
+
+def make_app(db_path=None):
+    """Creates a Flask app bound to a throwaway SQLite database."""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="arxiv-bench-"), "bench.db")
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + db_path
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+
+    return app
+
+
+def synthetic_entries(count, offset=0, authors_per_article=3):
+    """Yields article dictionaries shaped like the output of get_arxiv_articles."""
+    for i in range(offset, offset + count):
+        yield {
+            "id": f"9999.{i:05d}v1",
+            "title": f"Synthetic article number {i}",
+            "summary": f"Abstract of synthetic article {i}. " * 20,
+            "published_date": "2024-01-25T07:57:41Z",
+            "updated_date": "2024-01-25T07:57:41Z",
+            "doi": "",
+            "comment": "Synthetic benchmark entry",
+            "journal_reference": "",
+            "authors": [{"name": f"Author {i % 997}-{j}"} for j in range(authors_per_article)],
+        }
+
+
+def letters(number):
+    """Spells a number in base 26 with the letters a to z, the tokenizer dropping digits."""
+    word = ""
+    while True:
+        number, digit = divmod(number, 26)
+        word += chr(ord("a") + digit)
+        if not number:
+            return "w" + word
+
+
+def timed(function, *args, **kwargs):
+    """Runs the function and returns its result and the elapsed seconds."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def atom_feed(articles):
+    """Renders article dictionaries as an ArXiv Atom feed, the inverse of src.parser."""
+    entries = []
+    for article in articles:
+        authors = "".join(
+            f"<author><name>{escape(author['name'])}</name></author>" for author in article["authors"]
+        )
+        entries.append(
+            "<entry>"
+            f"<id>http://arxiv.org/abs/{article['id']}</id>"
+            f"<updated>{article['updated_date']}</updated>"
+            f"<published>{article['published_date']}</published>"
+            f"<title>{escape(article['title'])}</title>"
+            f"<summary>{escape(article['summary'])}</summary>"
+            f"{authors}"
+            f"<arxiv:comment>{escape(article['comment'])}</arxiv:comment>"
+            "</entry>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:arxiv="http://arxiv.org/schemas/atom">'
+        + "".join(entries)
+        + "</feed>"
+    ).encode("utf-8")
@@ -0,0 +1,228 @@
+# fake_arxiv.py
+"""
+Local stand-in for the ArXiv API serving a deterministic synthetic corpus.
+
+Every call waits a configurable latency, fails with a configurable probability, and is
+capped to a maximum page size like the real API. Feeds are rendered in the format of
+the recorded feeds of test/test_data, so the real parser reads them.
+
+Run with: python -m benchmarks.fake_arxiv --port 8081 --latency 0.2 --error-rate 0.05
+"""
+import argparse
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape, quoteattr
+from benchmarks.common import letters
+
+# Size of the synthetic corpus: article i exists for 0 <= i < FAKE_ARXIV_ARTICLES
+FAKE_ARXIV_ARTICLES = 10_000_000
+
+# Largest max_results answered in full, as on export.arxiv.org
+FAKE_ARXIV_MAX_PAGE_SIZE = 2000
+
+# Publication date of article 0, the next ones being published every few minutes
+FIRST_PUBLISHED = datetime(2015, 1, 1)
+
+CATEGORIES = [
+    "cs.AI", "cs.LG", "cs.CL", "cs.CV", "math.AG", "math.CO", "math.PR", "hep-th", "hep-ph", "quant-ph",
+    "astro-ph.GA", "astro-ph.CO", "cond-mat.str-el", "cond-mat.mes-hall", "physics.optics", "stat.ML",
+]
+
+WORDS = [
+    "quantum", "neural", "network", "graph", "manifold", "entropy", "lattice", "spectral", "stochastic",
+    "gravity", "boson", "fermion", "topology", "algebra", "optimal", "transport", "inference", "bayesian",
+    "kernel", "operator", "galaxy", "cosmology", "plasma", "soliton", "learning", "gradient", "descent",
+    "convex", "sparse", "tensor", "symmetry", "curvature", "moduli", "variety", "sheaf", "cohomology",
+    "scattering", "amplitude", "field", "string", "black", "hole", "dark", "matter", "energy", "spin",
+    "chain", "model", "random", "matrix", "theorem", "conjecture", "bound", "estimate", "regularity",
+    "transformer", "attention", "language", "vision", "reinforcement", "policy", "agent", "reward",
+]
+
+# Summaries are drawn from the words above then synthetic ones, with a Zipf-like distribution of
+# word frequencies, so searches and similar articles do not match the whole corpus
+VOCABULARY = WORDS + [letters(i) for i in range(20000)]
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / (rank + 10) for rank in range(len(VOCABULARY))))
+
+FIRST_NAMES = [
+    "Ada", "Alan", "Emmy", "Henri", "Sofia", "Srinivasa", "Marie", "Paul", "Lise", "Niels", "Grace", "John",
+    "Maryam", "Terence", "Karen", "Pierre", "Yuki", "Chen", "Fatima", "Olga",
+]
+LAST_NAMES = [
+    "Lovelace", "Turing", "Noether", "Poincare", "Kovalevskaya", "Ramanujan", "Curie", "Dirac", "Meitner",
+    "Bohr", "Hopper", "Neumann", "Mirzakhani", "Tao", "Uhlenbeck", "Deligne", "Tanaka", "Wang", "Haddad",
+    "Ladyzhenskaya", "Gauss", "Euler", "Riemann", "Hilbert", "Cartan", "Weil", "Serre", "Grothendieck",
+    "Atiyah", "Bott", "Milnor", "Smale", "Thurston", "Perelman", "Witten", "Connes", "Bourgain", "Lions",
+    "Villani", "Okounkov", "Lindenstrauss", "Ngo", "Smirnov", "Avila", "Bhargava", "Hairer", "Birkar",
+    "Figalli", "Scholze", "Venkatesh",
+]
+
+# Every author of the corpus, as "First Last"
+AUTHORS = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+
+
+def article_id(index):
+    """Returns the ArXiv ID of article index of the corpus, e.g. "1500.00042"."""
+    return f"{1500 + index // 100000}.{index % 100000:05d}"
+
+
+def article_index(arxiv_id):
+    """Returns the index of an ArXiv ID of the corpus, versions ignored, or None."""
+    prefix, _, number = arxiv_id.split("v")[0].partition(".")
+    if not (prefix.isdigit() and number.isdigit() and len(number) == 5):
+        return None
+    index = (int(prefix) - 1500) * 100000 + int(number)
+    return index if 0 <= index < FAKE_ARXIV_ARTICLES else None
+
+
+def fake_article(index):
+    """Returns article index of the corpus, shaped like the output of get_arxiv_articles."""
+    generator = random.Random(index)
+    published = (FIRST_PUBLISHED + timedelta(minutes=7 * index)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    categories = generator.sample(CATEGORIES, generator.randint(1, 3))
+    return {
+        "id": article_id(index) + "v1",
+        "title": " ".join(generator.choices(WORDS, k=8)).capitalize(),
+        "summary": " ".join(generator.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=120)).capitalize() + ".",
+        "published_date": published,
+        "updated_date": published,
+        "doi": f"10.5555/fake.{index}" if index % 3 == 0 else "",
+        "comment": f"{generator.randint(5, 60)} pages",
+        "journal_reference": "",
+        "primary_category": categories[0],
+        "categories": categories,
+        "authors": [{"name": name} for name in generator.sample(AUTHORS, generator.randint(1, 5))],
+    }
+
+
+def render_feed(articles, total, start, items_per_page):
+    """Renders article dictionaries as an ArXiv Atom feed, in the format of test/test_data."""
+    entries = []
+    for article in articles:
+        authors = "".join(
+            f"\n    <author>\n      <name>{escape(author['name'])}</name>\n    </author>" for author in article["authors"]
+        )
+        doi = (
+            f'\n    <arxiv:doi xmlns:arxiv="http://arxiv.org/schemas/atom">{escape(article["doi"])}</arxiv:doi>'
+            if article["doi"] else ""
+        )
+        categories = "".join(
+            f'\n    <category term={quoteattr(term)} scheme="http://arxiv.org/schemas/atom"/>'
+            for term in article["categories"]
+        )
+        entries.append(
+            "\n  <entry>"
+            f"\n    <id>http://arxiv.org/abs/{article['id']}</id>"
+            f"\n    <updated>{article['updated_date']}</updated>"
+            f"\n    <published>{article['published_date']}</published>"
+            f"\n    <title>{escape(article['title'])}</title>"
+            f"\n    <summary>  {escape(article['summary'])}\n</summary>"
+            f"{authors}{doi}"
+            f'\n    <arxiv:comment xmlns:arxiv="http://arxiv.org/schemas/atom">{escape(article["comment"])}</arxiv:comment>'
+            f'\n    <link href="http://arxiv.org/abs/{article["id"]}" rel="alternate" type="text/html"/>'
+            f'\n    <link title="pdf" href="http://arxiv.org/pdf/{article["id"]}" rel="related" type="application/pdf"/>'
+            f'\n    <arxiv:primary_category xmlns:arxiv="http://arxiv.org/schemas/atom" '
+            f'term={quoteattr(article["primary_category"])} scheme="http://arxiv.org/schemas/atom"/>'
+            f"{categories}"
+            "\n  </entry>"
+        )
+    opensearch = 'xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/"'
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">'
+        '\n  <title type="html">ArXiv Query: fake</title>'
+        "\n  <id>http://arxiv.org/api/fake</id>"
+        f"\n  <updated>{datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')}-00:00</updated>"
+        f"\n  <opensearch:totalResults {opensearch}>{total}</opensearch:totalResults>"
+        f"\n  <opensearch:startIndex {opensearch}>{start}</opensearch:startIndex>"
+        f"\n  <opensearch:itemsPerPage {opensearch}>{items_per_page}</opensearch:itemsPerPage>"
+        + "".join(entries)
+        + "\n</feed>\n"
+    ).encode("utf-8")
+
+
+class FakeArxiv:
+    """
+    Responder of a StubArxivServer answering like the ArXiv API from the synthetic corpus.
+
+    id_list calls and searches for one ID get the articles of the corpus with those IDs,
+    other searches get the articles newest first whatever the query, max_results being
+    capped to max_page_size.
+
+    Args:
+        articles (int): The number of articles of the corpus returned by searches.
+        latency (float): The seconds every call waits before answering.
+        jitter (float): The maximum random number of seconds added to the latency.
+        error_rate (float): The probability of a call failing with error_status.
+        error_status (int): The status of failed calls, 503 being retried by the client.
+        max_page_size (int): The maximum number of entries per feed.
+        seed (int): The seed of the random latencies and errors.
+    """
+
+    def __init__(self, articles=FAKE_ARXIV_ARTICLES, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 max_page_size=FAKE_ARXIV_MAX_PAGE_SIZE, seed=0):
+        self.articles = articles
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_page_size = max_page_size
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def __call__(self, params):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+        time.sleep(delay)
+        if failed:
+            return self.error_status, b"Rate exceeded."
+
+        if params.get("id_list"):
+            indexes = [article_index(requested) for requested in params["id_list"].split(",")]
+            articles = [fake_article(index) for index in indexes if index is not None]
+            return 200, render_feed(articles, len(articles), 0, len(articles))
+
+        # A search for an ID of the corpus, as made for articles missing from the database
+        index = article_index(params.get("search_query", ""))
+        if index is not None:
+            return 200, render_feed([fake_article(index)], 1, 0, 1)
+
+        start = int(params.get("start", 0))
+        size = min(int(params.get("max_results", 10)), self.max_page_size)
+        # Newest first: position p of the results is article articles - 1 - p
+        positions = range(start, min(start + size, self.articles))
+        articles = [fake_article(self.articles - 1 - position) for position in positions]
+        return 200, render_feed(articles, self.articles, start, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--articles", type=int, default=FAKE_ARXIV_ARTICLES)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random seconds added per call")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-page-size", type=int, default=FAKE_ARXIV_MAX_PAGE_SIZE)
+    args = parser.parse_args()
+
+    responder = FakeArxiv(args.articles, args.latency, args.jitter, args.error_rate, max_page_size=args.max_page_size)
+    # Imported here: importing the test package points src.app at a throwaway database,
+    # and benchmarks.load_test imports this module in the processes that seed and serve
+    from test.stub_server import StubArxivServer
+
+    with StubArxivServer(responder, port=args.port) as server:
+        print(f"Fake ArXiv API on {server.url}, stop with Ctrl+C")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
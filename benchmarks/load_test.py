@@ -0,0 +1,370 @@
+# load_test.py
+"""
+Load test of the real Flask routes, reporting latency, throughput and memory per endpoint.
+
+For each size, a database of synthetic articles of benchmarks.fake_arxiv is seeded, then the
+app is served by a threaded werkzeug server in a child process, the articles missing from the
+database being fetched from a fake ArXiv API running in another process. Each endpoint is
+called --requests times at each concurrency level, and the p50/p95/p99 latency, requests per
+second and RSS of the server are reported.
+
+Requests are drawn from a seeded generator, so two runs send the same requests. Results are
+written as JSON with --output, and compared with the JSON of an earlier run with --baseline.
+The exit status is 1 when a request failed, or when an endpoint got slower than the
+tolerance allows.
+
+Run with: python -m benchmarks.load_test --articles 10000 1000000 --concurrency 1 8 32 --output results.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+import requests
+from benchmarks.fake_arxiv import AUTHORS, CATEGORIES, VOCABULARY, WORDS, article_id, fake_article
+
+# Root of the repository, put on the path of the child processes
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Number of articles seeded per transaction
+SEED_CHUNK_SIZE = 10000
+
+# Seconds allowed for the app to start, the search index of a new database being built first
+SERVER_START_TIMEOUT = 600
+
+# Endpoints in the order they are run; upstream stores new articles, so it runs last
+ENDPOINTS = {
+    # A random listing page
+    "articles": lambda generator, size, new_ids: f"/articles?page={generator.randint(1, 50)}&per_page=20",
+    # A stored article
+    "article": lambda generator, size, new_ids: f"/articles/{article_id(generator.randrange(size))}v1",
+    # Full-text search for a common word and a word of any frequency
+    "search": lambda generator, size, new_ids: (
+        f"/articles?query={generator.choice(WORDS)}+{generator.choice(VOCABULARY)}&per_page=20"
+    ),
+    # A random page of a category
+    "category": lambda generator, size, new_ids: (
+        f"/articles?subcategory={generator.choice(CATEGORIES)}&page={generator.randint(1, 20)}&per_page=20"
+    ),
+    # A random page of an author
+    "author": lambda generator, size, new_ids: (
+        f"/authors/{quote(generator.choice(AUTHORS))}/articles?page={generator.randint(1, 5)}&per_page=20"
+    ),
+    "stats": lambda generator, size, new_ids: "/stats",
+    # The articles similar to a stored article
+    "similar": lambda generator, size, new_ids: f"/articles/{article_id(generator.randrange(size))}v1/similar",
+    # An article missing from the database, fetched from the fake ArXiv API
+    "upstream": lambda generator, size, new_ids: f"/articles/{article_id(next(new_ids))}v1",
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url, process, timeout):
+    """Polls the URL until it answers 200, failing if the process exits or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            if requests.get(url, timeout=5).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def child(args, cwd, **kwargs):
+    """Starts `python -m <args>` in the given working directory, with the repository on the path."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    # The seeding and serving children use the database of their working directory
+    env.pop("FLASK_SQLALCHEMY_DATABASE_URI", None)
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=cwd, env=env, **kwargs)
+
+
+def seed_database(size):
+    """
+    Seeds data/arxiv_articles.db of the working directory with articles 0 to size - 1 of the
+    fake corpus, then builds the similar articles index. Runs in a child process: src.app
+    opens the database of the working directory when imported.
+    """
+    from src.app import app
+    from src.models import db
+    from src.similar import similar_index
+    from src.utils import bulk_upsert_articles
+
+    with app.app_context():
+        for start in range(0, size, SEED_CHUNK_SIZE):
+            bulk_upsert_articles(fake_article(index) for index in range(start, min(start + SEED_CHUNK_SIZE, size)))
+            db.session.commit()
+        similar_index.build()
+
+
+def serve(port, arxiv_url):
+    """Serves the app of the working directory until killed, fetching from the given ArXiv API."""
+    import logging
+    from werkzeug.serving import make_server
+    from src import utils
+    from src.app import app
+    from src.client import ArxivClient, RateLimiter
+
+    # No rate limit and short backoffs, the fake ArXiv API being local
+    utils.arxiv_client = ArxivClient(
+        base_url=arxiv_url, pool_size=64, limiter=RateLimiter(0), backoff_factor=0.1, backoff_jitter=0.1
+    )
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+def prepare_database(size, data_dir, run_dir):
+    """Copies the seeded data directory of the size into run_dir, seeding it first if needed."""
+    seed_dir = os.path.join(data_dir, f"articles-{size}")
+    if not os.path.exists(os.path.join(seed_dir, "seeded")):
+        shutil.rmtree(seed_dir, ignore_errors=True)
+        os.makedirs(os.path.join(seed_dir, "data"))
+        start = time.perf_counter()
+        if child(["benchmarks.load_test", "--seed-database", str(size)], seed_dir).wait():
+            raise RuntimeError(f"Seeding {size} articles failed")
+        seeded = count_articles(os.path.join(seed_dir, "data", "arxiv_articles.db"))
+        if seeded != size:
+            raise RuntimeError(f"Seeding {size} articles stored {seeded} articles in {seed_dir}")
+        open(os.path.join(seed_dir, "seeded"), "w").close()
+        print(f"{size:>8} articles seeded in {time.perf_counter() - start:.1f}s")
+    shutil.copytree(os.path.join(seed_dir, "data"), os.path.join(run_dir, "data"))
+
+
+def count_articles(path):
+    """Returns the number of rows of the article table of a database, None when it has none."""
+    if not os.path.exists(path):
+        return None
+    with sqlite3.connect(path) as connection:
+        try:
+            return connection.execute("SELECT count(*) FROM article").fetchone()[0]
+        except sqlite3.OperationalError:
+            return None
+
+
+def server_memory(pid):
+    """Returns the current and peak RSS of a process in MB, None where /proc is missing."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            fields = dict(line.split(":", 1) for line in status)
+    except OSError:
+        return None, None
+    return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+
+
+def percentile(timings, fraction):
+    return sorted(timings)[min(len(timings) - 1, int(fraction * len(timings)))]
+
+
+def run_level(base_url, paths, concurrency):
+    """Sends the requests from `concurrency` threads with keep-alive sessions, returning the latencies and errors."""
+    latencies = []
+    errors = []
+
+    def worker(share):
+        with requests.Session() as session:
+            for path in share:
+                start = time.perf_counter()
+                response = session.get(base_url + path, timeout=120)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(paths[i::concurrency],)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def run_size(size, args, data_dir, arxiv_url):
+    """Runs every endpoint at every concurrency level against a fresh copy of the database of the size."""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="arxiv-load-") as run_dir:
+        prepare_database(size, data_dir, run_dir)
+        port = free_port()
+        server = child(
+            ["benchmarks.load_test", "--serve", str(port), "--arxiv-url", arxiv_url], run_dir, stdout=subprocess.DEVNULL
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_until_up(base_url + "/cache/stats", server, SERVER_START_TIMEOUT)
+            generator = random.Random(args.seed)
+            # Upstream articles follow the seeded ones in the fake corpus
+            new_ids = itertools.count(size)
+
+            for endpoint in args.endpoints:
+                path_for = ENDPOINTS[endpoint]
+                run_level(base_url, [path_for(generator, size, new_ids) for _ in range(args.warmup)], 1)
+                for concurrency in args.concurrency:
+                    paths = [path_for(generator, size, new_ids) for _ in range(args.requests)]
+                    latencies, errors, elapsed = run_level(base_url, paths, concurrency)
+                    rss_mb, peak_rss_mb = server_memory(server.pid)
+                    row = {
+                        "articles": size,
+                        "endpoint": endpoint,
+                        "concurrency": concurrency,
+                        "requests": len(latencies),
+                        "errors": len(errors),
+                        "p50_ms": statistics.median(latencies) * 1000,
+                        "p95_ms": percentile(latencies, 0.95) * 1000,
+                        "p99_ms": percentile(latencies, 0.99) * 1000,
+                        "rps": len(latencies) / elapsed,
+                        "rss_mb": rss_mb,
+                        "peak_rss_mb": peak_rss_mb,
+                    }
+                    print_row(row)
+                    results.append(row)
+        finally:
+            server.kill()
+            server.wait()
+    return results
+
+
+def print_header():
+    print(f"{'articles':>8} {'endpoint':<9} {'conc':>4} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'req/s':>8} {'RSS MB':>7} {'peak MB':>7}")
+
+
+def print_row(row):
+    memory = (
+        f"{row['rss_mb']:7.1f} {row['peak_rss_mb']:7.1f}" if row["rss_mb"] is not None else f"{'-':>7} {'-':>7}"
+    )
+    print(f"{row['articles']:>8} {row['endpoint']:<9} {row['concurrency']:>4} {row['requests']:>8} {row['errors']:>6} "
+          f"{row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['p99_ms']:9.2f} {row['rps']:8.1f} {memory}", flush=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares results with the results of a baseline run, matched by size, endpoint and concurrency.
+
+    Returns:
+        list: The rows with failed requests, or whose p95 latency grew, or whose throughput fell,
+            by more than the tolerance.
+    """
+    previous_rows = {(row["articles"], row["endpoint"], row["concurrency"]): row for row in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with the baseline of {baseline['meta']['created']} (commit {baseline['meta']['commit']}):")
+    for row in results:
+        previous = previous_rows.get((row["articles"], row["endpoint"], row["concurrency"]))
+        if previous is None:
+            continue
+        p95_change = row["p95_ms"] / previous["p95_ms"] - 1
+        rps_change = row["rps"] / previous["rps"] - 1
+        regressed = row["errors"] > 0 or p95_change > tolerance or rps_change < -tolerance
+        print(f"{row['articles']:>8} {row['endpoint']:<9} {row['concurrency']:>4}  p95 {p95_change:+7.1%}  "
+              f"req/s {rps_change:+7.1%}  errors {row['errors']}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(row)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, nargs="+", default=[10000, 100000], help="database sizes")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="directory keeping the seeded databases between runs")
+    parser.add_argument("--arxiv-latency", type=float, default=0.2, help="seconds per fake ArXiv API call")
+    parser.add_argument("--arxiv-jitter", type=float, default=0.05)
+    parser.add_argument("--arxiv-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change of p95 and req/s")
+    parser.add_argument("--seed-database", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--arxiv-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed_database:
+        seed_database(args.seed_database)
+        return
+    if args.serve:
+        serve(args.serve, args.arxiv_url)
+        return
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="arxiv-load-data-")
+    arxiv_port = free_port()
+    arxiv = child(
+        ["benchmarks.fake_arxiv", "--port", str(arxiv_port), "--latency", str(args.arxiv_latency),
+         "--jitter", str(args.arxiv_jitter), "--error-rate", str(args.arxiv_error_rate)],
+        REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+    )
+    arxiv_url = f"http://127.0.0.1:{arxiv_port}/api/query"
+    results = []
+    try:
+        wait_until_up(f"{arxiv_url}?id_list={article_id(0)}", arxiv, 30)
+        print_header()
+        for size in args.articles:
+            results.extend(run_size(size, args, data_dir, arxiv_url))
+    finally:
+        arxiv.kill()
+        arxiv.wait()
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {name: value for name, value in vars(args).items() if name not in ("seed_database", "serve", "arxiv_url")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+    failed = [row for row in results if row["errors"]]
+    if failed:
+        print(f"{sum(row['errors'] for row in failed)} failed request(s) at {len(failed)} endpoint and concurrency level(s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,53 @@
 # app.py
 import os
-import json
-from flask import Flask, jsonify, request, Response
+import click
+from flask import Flask, jsonify, request, Response, stream_with_context, url_for
 from flask_sqlalchemy import SQLAlchemy
-from src.models import db, Article, Author
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from src.cache import (
+    ARTICLES_TAG,
+    UNKNOWN_ARTICLES_TAG,
+    SingleFlight,
+    article_tag,
+    create_cache_invalidation,
+    invalidation_log,
+    mark_articles_changed,
+    response_cache,
+    unknown_article_tag,
+    unknown_articles,
+)
+from src.export import EXPORT_FORMATS, iter_csv, iter_export_batches, iter_gzip, iter_ndjson
+from src.instrumentation import METRICS_CONTENT_TYPE, metrics
+from src.jobs import job_queue, job_to_dict
+from src.models import db, author_key, parse_datetime, Article, ArticleAuthor, Author, HarvestCursor, Job, SyncState
+from src.leases import LEASE_WAIT_TIMEOUT, lease
+from src.migrations import migrate
+from src.search import create_search_index, rebuild_search_index
+from src.serializers import (
+    COMPRESS_MIN_SIZE,
+    COMPRESSIBLE_MIMETYPES,
+    FastJSONProvider,
+    compress,
+    dumps,
+    negotiate_encoding,
+    pretty_requested,
+)
+from src.similar import SIMILAR_K, SIMILAR_MAX_K, SIMILAR_RETRY_AFTER, IndexNotReady, similar_index
+from src.stats import STATS_MAX_TOP_AUTHORS, STATS_TOP_AUTHORS, check_stats, create_stats, read_stats, rebuild_stats
+from src.storage import writer
+from src.summaries import load_summary, summary_cache
 from src.utils import (
+    ARTICLE_COLUMNS,
+    article_rows_to_dicts,
     article_to_dict,
-    fetch_summary_by_id,
+    backfill_categories,
+    build_articles_query,
+    keyset_page,
+    load_categories,
     populate_single_article,
-    populate_articles_by_query,
+    store_article,
     get_arxiv_articles,
 )
 from datetime import datetime
@@ -20,13 +59,35 @@ app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
     os.getcwd(), "data/arxiv_articles.db"
 )
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["JSONIFY_PRETTYPRINT_REGULAR"] = True
+# Any setting can be overridden from the environment, e.g. FLASK_SQLALCHEMY_DATABASE_URI
+app.config.from_prefixed_env()
+# Compact JSON from the fastest encoder installed, indented with ?pretty=1
+app.json = FastJSONProvider(app)
+
+# Concurrent requests for the same article missing from the database, keyed by article ID
+article_flight = SingleFlight()
 
 db.init_app(app)
+job_queue.init_app(app)
+invalidation_log.init_app(app)
+unknown_articles.init_app(app)
+metrics.init_app(app)
+similar_index.init_app(app)
 
 with app.app_context():
     # Initialize the database
     db.create_all()
+    with db.engine.connect() as connection:
+        migrate(connection)
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+        create_stats(connection)
+        create_cache_invalidation(connection)
+        # create_all does not add indexes to tables created by an older version
+        for index in Article.__table__.indexes:
+            index.create(connection, checkfirst=True)
+    # Take over the jobs abandoned by the workers that stopped
+    job_queue.recover()
 
     @app.route("/")
     def home():
@@ -55,31 +116,57 @@ with app.app_context():
         """Upload a new article to the database."""
         data = request.get_json()
 
-        new_article = Article(
-            id=data.get("id"),
-            title=data.get("title"),
-            summary=data.get("summary"),
-            published_date=data.get("published_date"),
-            updated_date=data.get("updated_date"),
-            doi=data.get("doi"),
-            comment=data.get("comment"),
-            journal_reference=data.get("journal_reference"),
-        )
+        for field in ("published_date", "updated_date"):
+            try:
+                parse_datetime(data.get(field))
+            except (TypeError, ValueError):
+                return jsonify({"error": f"Invalid {field}, expected an ISO 8601 date"}), 400
+
+        def store_upload():
+            new_article = Article(
+                id=data.get("id"),
+                title=data.get("title"),
+                summary=data.get("summary"),
+                published_date=data.get("published_date"),
+                updated_date=data.get("updated_date"),
+                doi=data.get("doi"),
+                comment=data.get("comment"),
+                journal_reference=data.get("journal_reference"),
+                primary_category=data.get("primary_category"),
+                # Listed in its primary category, as fetched articles are
+                categories=load_categories([data["primary_category"]] if data.get("primary_category") else []),
+            )
+            db.session.merge(new_article)
+            mark_articles_changed(db.session, [new_article.id])
 
-        db.session.merge(new_article)
-        db.session.commit()
+        writer.run(store_upload)
 
-        return jsonify({"document_id": new_article.id})
+        return jsonify({"document_id": data.get("id")})
 
     @app.route("/articles", methods=["GET"], strict_slashes=False)
     def get_articles():
         """Retrieve a list of articles based on specified filters."""
         query = request.args.get("query", "all")
         page = int(request.args.get("page", 1))
-        per_page = int(request.args.get("per_page", 10))
+        per_page = request.args.get("per_page", 10, type=int)
+        if per_page < 1:
+            return jsonify({"error": "per_page must be at least 1"}), 400
         start_date_str = request.args.get("start_date")
         end_date_str = request.args.get("end_date")
         subcategory = request.args.get("subcategory")
+        # Keyset pagination when a cursor is given, an empty cursor asking for the first page
+        cursor = request.args.get("cursor")
+        include_total = request.args.get("include_total") == "1"
+        pretty = pretty_requested()
+
+        # Serve the cached page while no article changed
+        cache_key = (
+            "articles", query, page, per_page, start_date_str, end_date_str, subcategory, cursor, include_total,
+            pretty,
+        )
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached_response(cached)
 
         # Parse start and end date strings to datetime objects if provided
         start_date = (
@@ -87,103 +174,318 @@ with app.app_context():
         )
         end_date = datetime.strptime(end_date_str, "%Y-%m-%d") if end_date_str else None
 
-        # Base query
-        articles_query = Article.query
-
-        # Apply additional filters
-        if query != "all":
-            articles_query = articles_query.filter(Article.title.ilike(f"%{query}%"))
-        if start_date:
-            articles_query = articles_query.filter(Article.published_date >= start_date)
-        if end_date:
-            articles_query = articles_query.filter(Article.published_date <= end_date)
-        if subcategory:
-            articles_query = articles_query.filter(Article.subcategory == subcategory)
-
-        # Paginate the results
-        articles = articles_query.paginate(
-            page=page, per_page=per_page, error_out=False
+        # Filtered query of plain rows, the authors of the whole page are loaded with one extra SELECT ... IN
+        articles_query = build_articles_query(query, start_date, end_date, subcategory).with_entities(
+            *ARTICLE_COLUMNS
         )
 
-        # Convert articles to dictionaries
-        articles_dict = {
-            "articles": [article_to_dict(article) for article in articles.items]
-        }
+        if cursor is not None:
+            # Keyset pagination: no COUNT nor OFFSET unless the total is asked for
+            try:
+                items, next_cursor = keyset_page(articles_query, cursor, per_page)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            articles_dict = {
+                "articles": article_rows_to_dicts(items),
+                "next_cursor": next_cursor,
+            }
+            if include_total:
+                articles_dict["total"] = articles_query.order_by(None).count()
+        else:
+            # Paginate the results
+            articles = articles_query.paginate(
+                page=page, per_page=per_page, error_out=False
+            )
 
-        # Use json.dumps to serialize the data to a JSON-formatted string with indentation
-        json_data = json.dumps(articles_dict, indent=2)
+            # Convert articles to dictionaries
+            articles_dict = {
+                "articles": article_rows_to_dicts(articles.items)
+            }
 
-        # Create a Flask Response with the formatted JSON
-        response = Response(response=json_data, status=200, mimetype="application/json")
+        json_data = dumps(articles_dict, pretty=pretty)
 
+        # Cache the page until any article changes
+        return cached_response(response_cache.set(cache_key, json_data, [ARTICLES_TAG]))
+
+    @app.route("/authors/<path:name>/articles", methods=["GET"], strict_slashes=False)
+    def get_author_articles(name):
+        """Retrieve the articles of an author, most recently published first."""
+        page = int(request.args.get("page", 1))
+        per_page = int(request.args.get("per_page", 10))
+        pretty = pretty_requested()
+
+        cache_key = ("author_articles", author_key(name), page, per_page, pretty)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached_response(cached)
+
+        author = db.session.scalars(select(Author).where(Author.key == author_key(name))).first()
+        if author is None:
+            return jsonify({"error": f"Author {name} not found"}), 404
+
+        articles = (
+            build_articles_query(author=name)
+            .with_entities(*ARTICLE_COLUMNS)
+            .order_by(Article.published_date.desc(), Article.id.desc())
+            .paginate(page=page, per_page=per_page, error_out=False)
+        )
+        json_data = dumps(
+            {"author": {"name": author.name}, "articles": article_rows_to_dicts(articles.items), "total": articles.total},
+            pretty=pretty,
+        )
+        return cached_response(response_cache.set(cache_key, json_data, [ARTICLES_TAG]))
+
+    @app.route("/articles/<string:article_id>/similar", methods=["GET"], strict_slashes=False)
+    def get_similar_articles(article_id):
+        """Retrieve the stored articles whose summary is the most similar to the summary of an article."""
+        try:
+            k = int(request.args.get("k", SIMILAR_K))
+        except ValueError:
+            k = None
+        if k is None or not 1 <= k <= SIMILAR_MAX_K:
+            return jsonify({"error": f"k must be an integer from 1 to {SIMILAR_MAX_K}"}), 400
+        pretty = pretty_requested()
+
+        cache_key = ("similar", article_id, k, pretty)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached_response(cached)
+
+        if db.session.scalar(select(Article.id).where(Article.id == article_id)) is None:
+            return jsonify({"error": f"Article {article_id} not found"}), 404
+
+        # Articles without a summary are not indexed and have no similar articles
+        try:
+            ranked = similar_index.similar([article_id], k)[0] or []
+        except IndexNotReady as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": str(SIMILAR_RETRY_AFTER)}
+        titles = dict(
+            db.session.execute(
+                select(Article.id, Article.title).where(Article.id.in_([other for other, _ in ranked]))
+            ).all()
+        )
+        json_data = dumps(
+            {
+                "article_id": article_id,
+                "similar": [
+                    {"id": other, "title": titles[other], "score": round(score, 6)}
+                    # Articles deleted since the index was refreshed are left out
+                    for other, score in ranked if other in titles
+                ],
+            },
+            pretty=pretty,
+        )
+        return cached_response(response_cache.set(cache_key, json_data, [ARTICLES_TAG]))
+
+    @app.route("/export", methods=["GET"], strict_slashes=False)
+    def export_articles():
+        """Stream every article matching the filters of /articles as NDJSON or CSV."""
+        export_format = request.args.get("format", "ndjson")
+        compress = request.args.get("compress")
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unknown format {export_format}, expected ndjson or csv"}), 400
+        if compress not in (None, "gzip"):
+            return jsonify({"error": f"Unknown compression {compress}, expected gzip"}), 400
+
+        try:
+            start_date = parse_date_arg("start_date")
+            end_date = parse_date_arg("end_date")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        articles_query = build_articles_query(
+            request.args.get("query", "all"), start_date, end_date, request.args.get("subcategory")
+        )
+
+        serialize = iter_ndjson if export_format == "ndjson" else iter_csv
+        chunks = serialize(iter_export_batches(articles_query))
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        filename = f"articles.{extension}"
+        if compress == "gzip":
+            chunks = iter_gzip(chunks)
+            mimetype = "application/gzip"
+            filename += ".gz"
+
+        # The generator runs while the response is sent, within the request context
+        response = Response(stream_with_context(chunks), mimetype=mimetype)
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
         return response
 
+    def parse_date_arg(name):
+        """Parses a YYYY-MM-DD query string argument, None when it is missing."""
+        value = request.args.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"Invalid {name}, expected YYYY-MM-DD") from None
+
     @app.route("/articles/<string:article_id>", methods=["GET"], strict_slashes=False)
     def get_article(article_id):
         """Describe the requested article, all metadata."""
-        article = db.session.query(Article).filter_by(id=article_id).one_or_none()
+        cache_key = ("article", article_id, pretty_requested())
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached_response(cached)
+
+        article = (
+            db.session.query(Article)
+            .options(joinedload(Article.authorships))
+            .filter_by(id=article_id)
+            .one_or_none()
+        )
 
         if article:
             # Convert the article to a dictionary
             article_dict = {"article": article_to_dict(article)}
 
-            # Use json.dumps to serialize the data to a JSON-formatted string with indentation
-            json_data = json.dumps(article_dict, indent=2)
+            json_data = dumps(article_dict, pretty=pretty_requested())
+
+            return cached_response(response_cache.set(cache_key, json_data, [article_tag(article_id)]))
+        else:
+            # If article not found in the database, fetch it from arXiv API, once for all concurrent requests.
+            # Hand the connection back to the pool first: waiting requests must not starve the fetching one.
+            db.session.close()
+            if unknown_articles.contains(article_id):
+                return jsonify({"error": "Article not found in arXiv"}), 404
+            try:
+                article_dict = article_flight.do(article_id, fetch_article, article_id)
+            except TimeoutError as e:
+                return jsonify({"error": str(e)}), 503, {"Retry-After": str(LEASE_WAIT_TIMEOUT)}
+            if article_dict is None:
+                return jsonify({"error": "Article not found in arXiv"}), 404
+
+            json_data = dumps({"article": article_dict}, pretty=pretty_requested())
 
             # Create a Flask Response with the formatted JSON
-            response = Response(
-                response=json_data, status=200, mimetype="application/json"
-            )
+            return Response(response=json_data, status=200, mimetype="application/json")
+
+    def fetch_article(article_id):
+        """
+        Fetch an article from arXiv and store it, returning its dictionary or None.
+
+        Workers of other processes wait on the lease of the article while it is fetched,
+        then find it stored.
+
+        Raises:
+            TimeoutError: Another worker held the lease of the article for too long.
+        """
+        with lease(f"article:{article_id}") as acquired:
+            # Another worker may have stored it while this one waited for the lease
+            article = db.session.get(Article, article_id)
+            if article is not None:
+                return article_to_dict(article)
+            if not acquired:
+                raise TimeoutError(f"Article {article_id} is being fetched by another worker, try again later")
 
-            return response
-        else:
-            # If article not found in the database, fetch it from arXiv API
             articles = get_arxiv_articles(query=article_id, max_results=1)
+            if not articles:
+                unknown_articles.add(article_id)
+                return None
+
+            # Add the new article to the database
+            try:
+                writer.run(store_article, article_id, articles[0])
+            except IntegrityError:
+                # Stored meanwhile by a worker that did not wait for the lease
+                pass
+
+            # Convert the new article to a dictionary
+            return article_to_dict(db.session.get(Article, article_id))
+
+    def cached_response(cached):
+        """Answer with a cached body, or with 304 Not Modified when the client already has it."""
+        encoding = negotiate_encoding(request.accept_encodings) if len(cached.body) >= COMPRESS_MIN_SIZE else None
+        # Each content coding of the body is a representation with its own ETag
+        etag = f"{cached.etag}-{encoding}" if encoding else cached.etag
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(response=cached.encoded(encoding), status=200, mimetype="application/json")
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        response.vary.add("Accept-Encoding")
+        return response
 
-            if articles:
-                entry = articles[0]
-
-                new_article = Article(
-                    id=article_id,
-                    title=entry.get("title", ""),
-                    summary=entry.get("summary", ""),
-                    published_date=entry.get("published_date", ""),
-                    updated_date=entry.get("updated_date", ""),
-                    doi=entry.get("doi", ""),
-                    comment=entry.get("comment", ""),
-                    journal_reference=entry.get("journal_reference", ""),
-                )
-
-                # Add authors to the new article
-                for author_entry in entry.get("authors", []):
-                    author = Author(
-                        name=author_entry.get("name", ""), article=new_article
-                    )
-                    db.session.add(author)
-
-                # Add the new article to the database
-                db.session.add(new_article)
-                db.session.commit()
-
-                # Convert the new article to a dictionary
-                new_article_dict = {"article": article_to_dict(new_article)}
-
-                # Use json.dumps to serialize the data to a JSON-formatted string with indentation
-                json_data = json.dumps(new_article_dict, indent=2)
-
-                # Create a Flask Response with the formatted JSON
-                response = Response(
-                    response=json_data, status=200, mimetype="application/json"
-                )
-
-                return response
-            else:
-                return jsonify({"error": "Article not found in arXiv"}), 404
+    @app.after_request
+    def compress_response(response):
+        """Compress large responses for clients accepting br or gzip."""
+        if (
+            response.status_code != 200
+            or response.is_streamed
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding and len(body) >= COMPRESS_MIN_SIZE:
+            response.set_data(compress(body, encoding))
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+    @app.route("/cache/stats", methods=["GET"])
+    def cache_stats():
+        """Report the hit and miss counters of the response and summary caches."""
+        return jsonify(
+            {
+                "responses": response_cache.stats(),
+                "summaries": summary_cache.stats(),
+                "unknown_articles": unknown_articles.stats(),
+                "invalidation_log": invalidation_log.stats(),
+            }
+        )
+
+    @app.route("/stats", methods=["GET"])
+    def get_stats():
+        """Report the article counts per month, per category and of the top authors."""
+        try:
+            top_authors = int(request.args.get("top_authors", STATS_TOP_AUTHORS))
+        except ValueError:
+            return jsonify({"error": "top_authors must be an integer"}), 400
+        top_authors = min(max(top_authors, 1), STATS_MAX_TOP_AUTHORS)
+        pretty = pretty_requested()
+
+        cache_key = ("stats", top_authors, pretty)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached_response(cached)
+
+        # Read from the stats tables, never from the article table
+        json_data = dumps(read_stats(db.session, top_authors), pretty=pretty)
+        return cached_response(response_cache.set(cache_key, json_data, [ARTICLES_TAG]))
+
+    @app.route("/metrics", methods=["GET"])
+    def get_metrics():
+        """Report the latency of each route and the time spent per stage, in the Prometheus text format."""
+        return Response(metrics.render(), mimetype=METRICS_CONTENT_TYPE)
+
+    @app.route("/cache/unknown_articles/purge", methods=["POST"])
+    def purge_unknown_articles():
+        """Forget IDs remembered as unknown to arXiv, all of them unless a list is given."""
+        data = request.get_json(silent=True) or {}
+        article_ids = data.get("article_ids")
+        # The other workers apply the purge from the invalidation log
+        if article_ids is None:
+            invalidation_log.publish(UNKNOWN_ARTICLES_TAG)
+            unknown_articles.purge()
+        else:
+            invalidation_log.publish(*(unknown_article_tag(article_id) for article_id in article_ids))
+            unknown_articles.discard(*article_ids)
+        return jsonify({"message": "Unknown article IDs purged"})
 
     @app.route("/text/<string:article_id>", methods=["GET"], strict_slashes=False)
     def get_summary(article_id):
         """Retrieve the summary of the specified article."""
-        summary = fetch_summary_by_id(article_id)
+        summary = load_summary(article_id)
         return summary
 
     @app.route("/populate_articles", methods=["POST"], strict_slashes=False)
@@ -192,20 +494,54 @@ with app.app_context():
         data = request.get_json()
 
         article_id = data.get("article_id")
+        article_ids = data.get("article_ids")
         query = data.get("query", "all")
         max_results = data.get("max_results", 10)
 
         if article_id:
             return populate_single_article(article_id)
+        elif article_ids:
+            job = job_queue.submit("populate_ids", article_ids=article_ids)
         else:
-            return populate_articles_by_query(query, max_results)
+            job = job_queue.submit("populate_query", query=query, max_results=max_results)
+
+        return job_accepted(job)
 
     @app.route("/auto_populate", methods=["GET"])
     def populate_database():
         """Populate the database with articles using default parameters."""
-        # Call the populate_articles_by_query function with the desired parameters
-        result = populate_articles_by_query(query="all", max_results=1000)
-        return result
+        # Fetch the articles published or revised since the last call, in the background
+        job = job_queue.submit("sync_query", query="all", max_results=1000)
+        return job_accepted(job)
+
+    @app.route("/jobs/<string:job_id>", methods=["GET"])
+    def get_job(job_id):
+        """Report the status and progress of a population job."""
+        # A job polled while its worker is gone is taken over by this one
+        job_queue.recover()
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return jsonify({"error": f"Job {job_id} not found"}), 404
+        return jsonify({"job": job_to_dict(job)})
+
+    @app.route("/jobs/<string:job_id>/cancel", methods=["POST"])
+    def cancel_job(job_id):
+        """Cancel a queued population job, or stop a running one after its current batch."""
+        job = job_queue.cancel(job_id)
+        if job is None:
+            return jsonify({"error": f"Job {job_id} not found"}), 404
+        return jsonify({"job": job_to_dict(job)})
+
+    def job_accepted(job):
+        """Build the response of a request handed over to the job queue."""
+        response = jsonify(
+            {
+                "message": "Population job queued",
+                "job_id": job.id,
+                "status_url": url_for("get_job", job_id=job.id),
+            }
+        )
+        return response, 202
 
 
 from flask import render_template
@@ -219,12 +555,19 @@ def empty_database():
             # Check if the confirmation form was submitted
             confirmation = request.form.get("confirmation", "").lower()
             if confirmation == "yes":
-                # Delete all records from the Article and Author tables
-                db.session.query(Article).delete()
-                db.session.query(Author).delete()
+
+                def delete_all():
+                    # Delete all records from the Article and Author tables and their associations
+                    db.session.query(ArticleAuthor).delete()
+                    db.session.query(Article).delete()
+                    db.session.query(Author).delete()
+                    # Forget how far syncs and harvests went, so they fetch the articles again
+                    db.session.query(SyncState).delete()
+                    db.session.query(HarvestCursor).delete()
 
                 # Commit the changes to the database
-                db.session.commit()
+                writer.run(delete_all)
+                response_cache.clear()
 
                 return jsonify({"message": "Database emptied successfully"})
             else:
@@ -240,11 +583,16 @@ def empty_database():
 def delete_article(article_id):
     """Delete the specified article from the database."""
     try:
-        # Delete the record from the Article table
-        article = db.session.query(Article).filter_by(id=article_id).first()
-        if article:
-            db.session.delete(article)
-            db.session.commit()
+
+        def delete_one():
+            # Delete the record from the Article table
+            article = db.session.query(Article).filter_by(id=article_id).first()
+            if article:
+                db.session.delete(article)
+                mark_articles_changed(db.session, [article_id])
+            return article is not None
+
+        if writer.run(delete_one):
             return jsonify({"message": f"Article {article_id} deleted successfully"})
         else:
             return jsonify({"message": f"Article {article_id} not found"}), 404
@@ -253,6 +601,52 @@ def delete_article(article_id):
         return jsonify({"error": f"Error: {str(e)}"}), 500
 
 
+@app.cli.command("backfill-categories")
+def backfill_categories_command():
+    """Fetch the categories of the articles stored before categories were."""
+    counts = backfill_categories()
+    click.echo(f"Categories of {counts['updated']} articles stored, {counts['not_found']} not found in arXiv")
+
+
+@app.cli.command("rebuild-search-index")
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from the article table."""
+    with db.engine.begin() as connection:
+        rebuild_search_index(connection)
+    click.echo("Search index rebuilt")
+
+
+@app.cli.command("build-similar-index")
+def build_similar_index_command():
+    """Build the index of /articles/<id>/similar from the article table."""
+    if not similar_index.build():
+        raise click.ClickException("The similar articles index is being built by another worker")
+    stats = similar_index.stats()
+    click.echo(
+        f"Similar articles index built: {stats['articles']} articles, {stats['terms']} terms, {stats['disk_bytes']} bytes"
+    )
+
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recount the statistics served by /stats from the article tables."""
+    with db.engine.begin() as connection:
+        rebuild_stats(connection)
+    click.echo("Statistics rebuilt")
+
+
+@app.cli.command("check-stats")
+def check_stats_command():
+    """Compare the statistics served by /stats with a full recount, failing when they differ."""
+    with db.engine.connect() as connection:
+        differences = check_stats(connection)
+    for table, rows in differences.items():
+        for key, stored, counted in rows:
+            click.echo(f"{table} {key}: {stored} stored, {counted} counted")
+    if any(differences.values()):
+        raise click.ClickException("Statistics are inconsistent, run `flask --app src.app rebuild-stats`")
+    click.echo("Statistics are consistent")
+
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,543 @@
+# cache.py
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from flask import has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models import db, CacheInvalidation
+from src.serializers import compress
+from src.storage import writer
+
+# Maximum number of responses kept by the response cache
+RESPONSE_CACHE_SIZE = 512
+
+# Seconds a cached response is served before being rebuilt
+RESPONSE_CACHE_TTL = 30
+
+# Number of slots holding the generation of the last invalidation of the tags hashed to them
+RESPONSE_CACHE_GENERATION_SLOTS = 4096
+
+# Tag of every cached listing of articles
+ARTICLES_TAG = "articles"
+
+# Tag logged when every ID remembered as unknown to arXiv is forgotten
+UNKNOWN_ARTICLES_TAG = "unknown_articles"
+
+# Maximum number of IDs remembered as unknown to arXiv
+NEGATIVE_CACHE_SIZE = 10000
+
+# Seconds an ID is remembered as unknown to arXiv, it may be published in the meantime
+NEGATIVE_CACHE_TTL = 3600
+
+# Rate of false positives of the Bloom filter of the negative cache when it is full
+NEGATIVE_CACHE_FALSE_POSITIVE_RATE = 0.01
+
+# Key of the session.info set holding the IDs of the articles written in the transaction
+CHANGED_ARTICLES_KEY = "changed_article_ids"
+
+# Number of invalidations kept in the shared log, a process further behind clears its caches
+CACHE_INVALIDATION_LOG_SIZE = 10000
+
+# Logs the articles written by any process to cache_invalidation, so every gunicorn worker
+# drops the responses built from them, whatever the write path
+CACHE_INVALIDATION_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS cache_article_insert AFTER INSERT ON article BEGIN "
+    "INSERT INTO cache_invalidation (tag) VALUES ('article:' || new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS cache_article_update AFTER UPDATE ON article BEGIN "
+    "INSERT INTO cache_invalidation (tag) VALUES ('article:' || new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS cache_article_delete AFTER DELETE ON article BEGIN "
+    "INSERT INTO cache_invalidation (tag) VALUES ('article:' || old.id); END",
+    "CREATE TRIGGER IF NOT EXISTS cache_category_insert AFTER INSERT ON article_category BEGIN "
+    "INSERT INTO cache_invalidation (tag) VALUES ('article:' || new.article_id); END",
+    "CREATE TRIGGER IF NOT EXISTS cache_category_delete AFTER DELETE ON article_category BEGIN "
+    "INSERT INTO cache_invalidation (tag) VALUES ('article:' || old.article_id); END",
+    "CREATE TRIGGER IF NOT EXISTS cache_invalidation_prune AFTER INSERT ON cache_invalidation BEGIN "
+    f"DELETE FROM cache_invalidation WHERE seq <= new.seq - {CACHE_INVALIDATION_LOG_SIZE}; END",
+)
+
+
+class CachedResponse:
+    """A serialized response body with its ETag and its compressed variants."""
+
+    __slots__ = ("body", "etag", "expires_at", "tags", "encoded_bodies")
+
+    def __init__(self, body, tags, ttl):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.expires_at = time.monotonic() + ttl
+        self.tags = tags
+        self.encoded_bodies = {}
+
+    def encoded(self, encoding):
+        """Returns the body compressed with a content coding, compressing it once per coding."""
+        if encoding is None:
+            return self.body
+        encoded_body = self.encoded_bodies.get(encoding)
+        if encoded_body is None:
+            encoded_body = self.encoded_bodies[encoding] = compress(self.body, encoding)
+        return encoded_body
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of serialized responses with a time to live.
+
+    Each entry carries tags naming the data it was built from, such as "articles" or
+    "article:<id>", and invalidate() drops exactly the entries carrying a given tag.
+    The cache lives in the process: given an InvalidationLog, get() first applies the
+    invalidations logged by the writes of every gunicorn worker.
+
+    Every invalidation starts a new generation. A miss records the generation of the
+    lookup for its thread, and set() does not store a body built from data invalidated
+    since, which a request that read the database before a write committed would
+    otherwise cache until it expires. Generations are kept in a fixed number of slots:
+    a tag sharing its slot with an invalidated tag is not cached either, until the
+    next lookup.
+
+    Args:
+        max_entries (int): The maximum number of cached responses.
+        ttl (float): The number of seconds a response is served.
+        generation_slots (int): The number of slots of the generations of the tags.
+        log (InvalidationLog): The log of the invalidations shared between processes.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                 generation_slots=RESPONSE_CACHE_GENERATION_SLOTS, log=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_tag = defaultdict(set)
+        self._lock = threading.Lock()
+        self._generation = 0
+        # Generation of the last invalidation of the tags hashed to each slot
+        self._invalidated_at = [0] * generation_slots
+        # Generation of the last clear(), which invalidates every tag
+        self._cleared_at = 0
+        self._lookups = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+        self.log = log
+
+    def get(self, key):
+        """Returns the fresh CachedResponse stored under key, or None."""
+        if self.log is not None:
+            self.log.sync()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            self._lookups.last = (key, self._generation)
+            return None
+
+    def set(self, key, body, tags=(), generation=None):
+        """
+        Stores a response body (bytes) under key and returns its CachedResponse.
+
+        Args:
+            key: The key the body is stored under.
+            body (bytes): The serialized response.
+            tags (iterable): The tags naming the data the body was built from.
+            generation (int): The generation the data was read at, by default the one of
+                the last miss of key on this thread. The body is not stored when one of
+                its tags was invalidated since.
+        """
+        entry = CachedResponse(body, tuple(tags), self.ttl)
+        if generation is None:
+            looked_up_key, generation = getattr(self._lookups, "last", (None, None))
+            self._lookups.last = None, None
+            if looked_up_key != key:
+                generation = None
+        with self._lock:
+            if generation is not None and self._is_stale(entry.tags, generation):
+                # Served to this request only
+                self.stale_sets += 1
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._keys_by_tag[tag].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, *tags):
+        """Drops every entry carrying one of the given tags."""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._invalidated_at[self._slot(tag)] = self._generation
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._generation += 1
+            self._cleared_at = self._generation
+
+    def stats(self):
+        """Returns the counters of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "stale_sets": self.stale_sets,
+            }
+
+    def _slot(self, tag):
+        return hash(tag) % len(self._invalidated_at)
+
+    def _is_stale(self, tags, generation):
+        """Tells whether one of the tags may have been invalidated after the given generation."""
+        if self._cleared_at > generation:
+            return True
+        return any(self._invalidated_at[self._slot(tag)] > generation for tag in tags)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+class InvalidationLog:
+    """
+    Applies the invalidations logged to the cache_invalidation table to the caches of the process.
+
+    The triggers of CACHE_INVALIDATION_DDL log a tag for each article written, whichever
+    process wrote it. sync() compares the last sequence number of the log with the last
+    one applied, a single indexed read when nothing changed, and invalidates the tags
+    logged since. A process that fell behind by more than CACHE_INVALIDATION_LOG_SIZE
+    entries clears its caches. Its own writes are applied twice, once by
+    invalidate_after_commit right after the commit, and once from the log.
+
+    Tags naming articles are invalidated in the response cache and forgotten by the
+    negative cache; purges of the negative cache are logged with publish().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # Sequence number of the last invalidation applied, None until the first sync
+        self._seq = None
+        self._lock = threading.Lock()
+        self.applied = 0
+        self.resets = 0
+
+    def init_app(self, app):
+        """Starts following the log of the database of the app, once it uses SQLite."""
+        with self._lock:
+            self.enabled = app.config.get("SQLALCHEMY_DATABASE_URI", "").startswith("sqlite")
+            self._seq = None
+
+    def restart(self):
+        """Follows the log from its end at the next sync, once this process recreated it."""
+        with self._lock:
+            self._seq = None
+
+    def sync(self):
+        """Applies the invalidations logged since the last call."""
+        if not self.enabled or not has_app_context():
+            return
+        with db.engine.connect() as connection:
+            seq = self._last_seq(connection)
+            if seq == self._seq:
+                return
+            with self._lock:
+                if self._seq is None:
+                    # Nothing was cached before the first lookup
+                    self._seq = seq
+                    return
+                if seq == self._seq:
+                    return
+                rows = connection.exec_driver_sql(
+                    "SELECT seq, tag FROM cache_invalidation WHERE seq > ? ORDER BY seq", (self._seq,)
+                ).all()
+                if seq < self._seq or not rows or rows[0][0] != self._seq + 1:
+                    # The log was recreated, or the invalidations in between were pruned
+                    response_cache.clear()
+                    unknown_articles.purge()
+                    self.resets += 1
+                else:
+                    self._apply({tag for _, tag in rows})
+                    self.applied += len(rows)
+                self._seq = max(seq, rows[-1][0]) if rows else seq
+
+    def publish(self, *tags):
+        """Logs tags for every process, e.g. UNKNOWN_ARTICLES_TAG or unknown_article_tag(id)."""
+
+        def log_tags():
+            db.session.add_all(CacheInvalidation(tag=tag) for tag in tags)
+
+        if self.enabled and tags:
+            writer.run(log_tags)
+
+    def stats(self):
+        """Returns the counters of the log."""
+        return {"applied": self.applied, "resets": self.resets}
+
+    def _apply(self, tags):
+        response_tags = [tag for tag in tags if tag.startswith("article:")]
+        if response_tags:
+            response_cache.invalidate(ARTICLES_TAG, *response_tags)
+        if UNKNOWN_ARTICLES_TAG in tags:
+            unknown_articles.purge()
+        else:
+            # A stored article is no longer unknown
+            unknown_articles.discard(*(tag.partition(":")[2] for tag in tags if ":" in tag))
+
+    def _last_seq(self, connection):
+        return connection.exec_driver_sql(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'cache_invalidation'"
+        ).scalar() or 0
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set: `key in bloom` is never False for an added key, and True
+    for a key never added with a probability of about false_positive_rate once `capacity`
+    keys were added. Keys cannot be removed.
+    """
+
+    def __init__(self, capacity, false_positive_rate):
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def _positions(self, key):
+        # Double hashing: two 64-bit halves of one digest give all the positions
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+
+class NegativeCache:
+    """
+    Thread-safe cache of the keys known to have no result, such as IDs unknown to arXiv.
+
+    Entries expire after `ttl` seconds and the oldest are evicted beyond `max_entries`.
+    A Bloom filter answers the common case of a key that was never added without taking
+    the lock, and is rebuilt from the live entries once evictions and purges made it
+    answer "maybe" for too many removed keys. The cache lives in the process: given an
+    InvalidationLog, contains() first applies the purges logged by every gunicorn worker
+    when the filter answers "maybe".
+
+    Args:
+        max_entries (int): The maximum number of remembered keys.
+        ttl (float): The number of seconds a key is remembered.
+        false_positive_rate (float): The target error rate of the Bloom filter.
+        log (InvalidationLog): The log of the invalidations shared between processes.
+    """
+
+    def __init__(self, max_entries=NEGATIVE_CACHE_SIZE, ttl=NEGATIVE_CACHE_TTL,
+                 false_positive_rate=NEGATIVE_CACHE_FALSE_POSITIVE_RATE, log=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.false_positive_rate = false_positive_rate
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._reset_filter()
+        self.avoided_calls = 0
+        self.filter_rebuilds = 0
+        self.log = log
+
+    def init_app(self, app):
+        """Reads the NEGATIVE_CACHE_TTL and NEGATIVE_CACHE_SIZE settings of the app."""
+        with self._lock:
+            self.ttl = app.config.get("NEGATIVE_CACHE_TTL", self.ttl)
+            self.max_entries = app.config.get("NEGATIVE_CACHE_SIZE", self.max_entries)
+            self._entries.clear()
+            self._reset_filter()
+
+    def add(self, key):
+        """Remembers that key has no result."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = time.monotonic() + self.ttl
+            self._bloom.add(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._removed += 1
+            self._maybe_rebuild_filter()
+
+    def contains(self, key):
+        """Whether key is remembered as having no result, counting an avoided upstream call."""
+        if key not in self._bloom:
+            return False
+        if self.log is not None:
+            self.log.sync()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._removed += 1
+                return False
+            self.avoided_calls += 1
+            return True
+
+    def discard(self, *keys):
+        """Forgets keys, e.g. IDs that now exist."""
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._removed += 1
+            self._maybe_rebuild_filter()
+
+    def purge(self):
+        """Forgets every key."""
+        with self._lock:
+            self._entries.clear()
+            self._reset_filter()
+
+    def stats(self):
+        """Returns the counters of the cache."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "avoided_upstream_calls": self.avoided_calls,
+                "bloom_filter_bytes": len(self._bloom.bits),
+                "bloom_filter_rebuilds": self.filter_rebuilds,
+            }
+
+    def _reset_filter(self):
+        self._bloom = BloomFilter(self.max_entries, self.false_positive_rate)
+        self._removed = 0
+
+    def _maybe_rebuild_filter(self):
+        # Removed keys still set bits of the filter, which then lets more keys reach the lock
+        if self._removed > self.max_entries // 2:
+            self._reset_filter()
+            for key in self._entries:
+                self._bloom.add(key)
+            self.filter_rebuilds += 1
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls made with the same key into a single call.
+
+    The first caller of a key runs the function; callers arriving while it runs wait for
+    it and get the same result, or the same exception. Once the call is over, the next
+    caller of the key makes a new call.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, function, *args, **kwargs):
+        """Returns function(*args, **kwargs), called once for all concurrent callers of key."""
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+
+def create_cache_invalidation(connection):
+    """Creates the triggers logging the invalidations shared between processes, if needed."""
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in CACHE_INVALIDATION_DDL:
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, "after_create")
+def _create_cache_invalidation(target, connection, **kw):
+    create_cache_invalidation(connection)
+
+
+@event.listens_for(CacheInvalidation.__table__, "after_drop")
+def _restart_invalidation_log(target, connection, **kw):
+    invalidation_log.restart()
+
+
+def article_tag(article_id):
+    """Returns the tag of the cached responses describing one article."""
+    return f"article:{article_id}"
+
+
+def unknown_article_tag(article_id):
+    """Returns the tag logged when one ID remembered as unknown to arXiv is forgotten."""
+    return f"unknown_article:{article_id}"
+
+
+def mark_articles_changed(session, article_ids):
+    """Records that the current transaction writes these articles, see invalidate_after_commit."""
+    session.info.setdefault(CHANGED_ARTICLES_KEY, set()).update(article_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_after_commit(session):
+    """Invalidates the responses built from the articles written by the committed transaction."""
+    article_ids = session.info.pop(CHANGED_ARTICLES_KEY, None)
+    if article_ids:
+        response_cache.invalidate(ARTICLES_TAG, *(article_tag(article_id) for article_id in article_ids))
+        # A stored article is no longer unknown
+        unknown_articles.discard(*article_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_after_rollback(session):
+    """Nothing was written, nothing needs to be invalidated."""
+    session.info.pop(CHANGED_ARTICLES_KEY, None)
+
+
+# Invalidations made by the writes of every process
+invalidation_log = InvalidationLog()
+
+response_cache = ResponseCache(log=invalidation_log)
+
+# IDs recently answered as unknown by arXiv, checked before calling it for one ID
+unknown_articles = NegativeCache(log=invalidation_log)
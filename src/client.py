@@ -0,0 +1,117 @@
+# client.py
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from src.instrumentation import metrics
+
+# ArXiv API URL
+ARXIV_API_FEED_URL = "http://export.arxiv.org/api/query"
+
+# Minimum number of seconds between two calls, as asked by the arXiv API terms of use
+ARXIV_RATE_LIMIT_DELAY = 3
+
+# HTTP statuses worth retrying: rate limiting and server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RateLimiter:
+    """Spaces out calls made from any thread by at least `interval` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        """Blocks until the calling thread may make its call."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Shared by every client of the process, so the limit holds across gunicorn threads
+rate_limiter = RateLimiter(ARXIV_RATE_LIMIT_DELAY)
+
+
+class ArxivClient:
+    """
+    HTTP client for the ArXiv API.
+
+    It keeps a pool of keep-alive connections, applies connect/read timeouts, retries
+    failed calls with exponential backoff and jitter, and waits on a rate limiter
+    before every attempt.
+
+    Args:
+        base_url (str): The URL of the ArXiv API query endpoint.
+        pool_size (int): The maximum number of connections kept open.
+        connect_timeout (float): Seconds allowed to open a connection.
+        read_timeout (float): Seconds allowed between two bytes of the response.
+        retries (int): The number of attempts made after the first one fails.
+        backoff_factor (float): The wait before the first retry, doubled on each retry.
+        backoff_max (float): The maximum wait between two attempts.
+        backoff_jitter (float): The maximum random number of seconds added to each wait.
+        limiter (RateLimiter): The rate limiter to wait on, the process-wide one by default.
+    """
+
+    def __init__(self, base_url=ARXIV_API_FEED_URL, pool_size=10, connect_timeout=5, read_timeout=30,
+                 retries=4, backoff_factor=1, backoff_max=60, backoff_jitter=1, limiter=None):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.backoff_jitter = backoff_jitter
+        self.limiter = limiter if limiter is not None else rate_limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, params=None):
+        """
+        Calls the ArXiv API with the given query parameters.
+
+        Returns:
+            requests.Response: The successful response.
+
+        Raises:
+            requests.HTTPError: The last response still had an error status after all retries.
+            requests.RequestException: The connection kept failing after all retries.
+        """
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                with metrics.timer("upstream"):
+                    response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                response.raise_for_status()
+                return response
+
+            time.sleep(self.backoff(attempt, response.headers.get("Retry-After")))
+
+    def backoff(self, attempt, retry_after=None):
+        """Returns the number of seconds to wait before the retry following `attempt`."""
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        delay = min(self.backoff_factor * 2**attempt, self.backoff_max)
+        return delay + random.uniform(0, self.backoff_jitter)
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
+
+
+# Client shared by the fetch functions of src.utils
+arxiv_client = ArxivClient()
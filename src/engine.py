@@ -0,0 +1,71 @@
+# engine.py
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+# Number of ArXiv API calls kept in flight by the populate functions
+FETCH_CONCURRENCY = 4
+
+
+async def map_in_order(function, calls, concurrency=FETCH_CONCURRENCY):
+    """
+    Runs blocking calls concurrently and yields their results in submission order.
+
+    Up to `concurrency` calls run at once on worker threads. As soon as the oldest call
+    completes, the next one is started and its result is handed to the consumer, so the
+    consumer parses and writes one result while the following ones are being fetched.
+    Calls to the ArXiv client still wait on its process-wide rate limiter.
+
+    Args:
+        function (callable): The blocking function to call, e.g. fetch_arxiv_feed.
+        calls (iterable): The keyword arguments of each call, consumed lazily.
+        concurrency (int): The maximum number of calls in flight.
+
+    Yields:
+        The return value of each call. An exception raised by a call is raised here.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="arxiv-fetch")
+    calls = iter(calls)
+    pending = deque()
+
+    def schedule():
+        for kwargs in islice(calls, concurrency - len(pending)):
+            pending.append(loop.run_in_executor(executor, partial(function, **kwargs)))
+
+    try:
+        schedule()
+        while pending:
+            future = pending.popleft()
+            schedule()
+            yield await future
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_in_order(function, calls, concurrency=FETCH_CONCURRENCY):
+    """
+    Synchronous wrapper around map_in_order, usable from Flask routes and populate functions.
+
+    With a concurrency of 1 the calls are simply made one after the other.
+    """
+    if concurrency <= 1:
+        for kwargs in calls:
+            yield function(**kwargs)
+        return
+
+    loop = asyncio.new_event_loop()
+    results = map_in_order(function, calls, concurrency)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
@@ -0,0 +1,66 @@
+# export.py
+import csv
+import io
+import zlib
+from src.models import db
+from src.serializers import dumps
+from src.utils import ARTICLE_COLUMNS, ARTICLE_FIELDS, article_rows_to_dicts
+
+# Number of articles loaded, serialized and sent at once by an export
+EXPORT_BATCH_SIZE = 1000
+
+# Columns of CSV exports, the authors being joined by AUTHOR_SEPARATOR
+CSV_COLUMNS = ("id",) + ARTICLE_FIELDS + ("authors",)
+AUTHOR_SEPARATOR = "; "
+
+# Media type and file extension of each export format
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+def iter_export_batches(articles_query, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Streams the articles of a query as lists of at most batch_size article dictionaries.
+
+    Rows are read from the open cursor batch_size at a time (yield_per) and each batch
+    loads its authors with one SELECT ... IN, so memory use does not grow with the
+    number of exported articles.
+    """
+    statement = articles_query.with_entities(*ARTICLE_COLUMNS).statement
+    result = db.session.execute(statement, execution_options={"yield_per": batch_size})
+    for rows in result.partitions():
+        yield article_rows_to_dicts(rows)
+
+
+def iter_ndjson(batches):
+    """Yields one chunk of newline-delimited JSON per batch of articles."""
+    for batch in batches:
+        yield b"".join(dumps(article) + b"\n" for article in batch)
+
+
+def iter_csv(batches):
+    """Yields the CSV header, then one chunk of CSV rows per batch of articles."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue().encode("utf-8")
+
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for article in batch:
+            article["authors"] = AUTHOR_SEPARATOR.join(author["name"] for author in article["authors"])
+            writer.writerow([article[column] for column in CSV_COLUMNS])
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_gzip(chunks):
+    """Compresses chunks of bytes into a gzip stream, one compressed chunk per input chunk."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
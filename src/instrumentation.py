@@ -0,0 +1,289 @@
+# instrumentation.py
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds, in seconds, of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Parts of the work of a request timed separately, in the order of the Server-Timing header
+STAGES = ("sql", "upstream", "parse", "serialize", "compress")
+
+# Media type of the Prometheus text exposition format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Route label of the requests matching no route, so unknown URLs add no series
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class QueryCounter:
+    """Counts the SQL statements sent to the database, and the time they took, on one thread."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+        self._thread = threading.get_ident()
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread:
+            self.duration += time.perf_counter() - conn.info["query_start"].pop()
+            self.count += 1
+            self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """
+    Counts the statements executed on the engine by the current thread inside the block.
+
+    Example:
+        with count_queries(db.engine) as counter:
+            client.get("/articles?per_page=100")
+        assert counter.count <= 3
+    """
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter._before)
+    event.listen(engine, "after_cursor_execute", counter._after)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._before)
+        event.remove(engine, "after_cursor_execute", counter._after)
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus histogram with one series per combination of label values.
+
+    Args:
+        name (str): The metric name.
+        description (str): The HELP text.
+        label_names (tuple): The names of the labels given to observe, in order.
+        buckets (tuple): The increasing upper bounds of the buckets.
+    """
+
+    def __init__(self, name, description, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """Records one value in the series of the given label values."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per bucket counts, the last one for +Inf, then the sum of the values
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *label_values):
+        """Returns the number of values recorded in a series."""
+        with self._lock:
+            series = self._series.get(label_values)
+            return sum(series[:-1]) if series else 0
+
+    def clear(self):
+        """Forgets every recorded value."""
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """Returns the histogram in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+
+        for label_values, values in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += bucket_count
+                bucket_labels = ",".join(labels + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {values[-1]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Context manager adding the time spent in its block to a stage of the metrics."""
+
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.record(self.stage, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """
+    Request-level performance metrics of the application.
+
+    Records the latency of each route, and the time spent in SQL statements, arXiv API
+    calls, feed parsing, JSON serialization and compression. The totals are exposed in
+    the Prometheus text format by render(), and the stages of each request can be sent
+    back in a Server-Timing header. The metrics live in the process: with several
+    gunicorn workers, each one reports its own.
+
+    When disabled, timers are a shared no-op and the request hooks return at once.
+
+    Settings read by init_app:
+        METRICS_ENABLED (bool): Record the metrics, True by default.
+        SERVER_TIMING (bool): Add a Server-Timing header to every response, False by default.
+    """
+
+    def __init__(self, enabled=True, server_timing=False):
+        self.enabled = enabled
+        self.server_timing = server_timing
+        self.requests = Histogram(
+            "http_request_duration_seconds", "Time spent answering HTTP requests.", ("method", "route", "status")
+        )
+        self.stages = Histogram(
+            "stage_duration_seconds",
+            "Time spent in SQL statements, arXiv API calls, feed parsing, serialization and compression.",
+            ("stage",),
+        )
+        self._local = threading.local()
+        self._listening = False
+
+    def init_app(self, app):
+        """Reads the METRICS_ENABLED and SERVER_TIMING settings and hooks into the app and SQLAlchemy."""
+        self.enabled = app.config.get("METRICS_ENABLED", self.enabled)
+        self.server_timing = app.config.get("SERVER_TIMING", self.server_timing)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+        if not self._listening:
+            event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+            self._listening = True
+
+    def timer(self, stage):
+        """Returns a context manager timing its block as part of a stage."""
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self, stage)
+
+    def timed_iter(self, iterable, stage):
+        """Times the work done producing each item of a lazy iterable, as one stage sample."""
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(iter(iterable), stage)
+
+    def record(self, stage, seconds):
+        """Adds seconds spent in a stage to its histogram and to the current request."""
+        self.stages.observe(seconds, stage)
+        timings = getattr(self._local, "timings", None)
+        if timings is not None:
+            total, count = timings.get(stage, (0.0, 0))
+            timings[stage] = (total + seconds, count + 1)
+
+    def render(self):
+        """Returns every metric in the Prometheus text format."""
+        return self.requests.render() + self.stages.render()
+
+    def clear(self):
+        """Forgets every recorded value."""
+        self.requests.clear()
+        self.stages.clear()
+
+    def _timed_iter(self, iterator, stage):
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            self.record(stage, elapsed)
+
+    def _start_request(self):
+        if self.enabled:
+            self._local.timings = {}
+            self._local.request_start = time.perf_counter()
+
+    def _finish_request(self, response):
+        timings = getattr(self._local, "timings", None)
+        if not self.enabled or timings is None:
+            return response
+        self._local.timings = None
+
+        duration = time.perf_counter() - self._local.request_start
+        route = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+        self.requests.observe(duration, request.method, route, str(response.status_code))
+
+        if self.server_timing:
+            response.headers["Server-Timing"] = server_timing_header(timings, duration)
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled and context is not None:
+            # Kept on the execution context, so a failed statement leaves nothing behind
+            context.metrics_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "metrics_start", None)
+        if start is not None:
+            self.record("sql", time.perf_counter() - start)
+
+
+def server_timing_header(timings, duration):
+    """
+    Builds a Server-Timing header value from the stage timings of a request.
+
+    Args:
+        timings (dict): The (seconds, count) pair of each stage reached by the request.
+        duration (float): The total number of seconds spent on the request.
+
+    Returns:
+        str: e.g. 'sql;dur=1.20;desc="3 calls", total;dur=4.56', durations in milliseconds.
+    """
+    metrics = [
+        f'{stage};dur={timings[stage][0] * 1000:.2f};desc="{timings[stage][1]} calls"'
+        for stage in STAGES
+        if stage in timings
+    ]
+    metrics.append(f"total;dur={duration * 1000:.2f}")
+    return ", ".join(metrics)
+
+
+def _escape(value):
+    """Escapes a label value of the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Timer handed out while the metrics are disabled
+NULL_TIMER = nullcontext()
+
+# Metrics of the process, recorded by the app, the arXiv client, the parser and the serializers
+metrics = Metrics()
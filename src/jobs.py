@@ -0,0 +1,229 @@
+# jobs.py
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from src import utils
+from src.models import db, Job
+from src.storage import writer
+
+# Number of jobs run at the same time by each process
+JOB_WORKERS = 2
+
+# Time without progress after which a job is deemed abandoned by a worker that stopped,
+# and queued again: a harvest reports its progress after each page, which takes seconds
+JOB_HEARTBEAT_TIMEOUT = timedelta(minutes=10)
+
+# Statuses of the jobs that are not over
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+# Harvest functions of src.utils run by each kind of job
+JOB_FUNCTIONS = {
+    "populate_query": "harvest_articles_by_query",
+    "populate_ids": "harvest_articles_by_ids",
+    "sync_query": "sync_articles_by_query",
+}
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its cancellation has been requested."""
+
+
+class JobQueue:
+    """
+    Runs population jobs on a pool of background threads.
+
+    Jobs are stored in the job table of the application database, so their progress can
+    be read, and their cancellation requested, from any gunicorn worker. A job is queued
+    in the process that submitted it: when that worker stops, recover() lets another one
+    take over the jobs it left queued or running, harvests resuming where they stopped.
+    """
+
+    def __init__(self, app=None, max_workers=JOB_WORKERS, heartbeat_timeout=JOB_HEARTBEAT_TIMEOUT):
+        self.max_workers = max_workers
+        self.heartbeat_timeout = heartbeat_timeout
+        self.app = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+
+    def submit(self, kind, **params):
+        """
+        Records a new job and queues it. Returns the Job.
+
+        When a job of the same kind and parameters is still queued or running, it is
+        returned instead, so repeated requests do not run the same harvest twice.
+        """
+        if kind not in JOB_FUNCTIONS:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        self.recover()
+        job_id, created = writer.run(_add_job, str(uuid.uuid4()), kind, params)
+        if created:
+            self.executor.submit(self._run, job_id)
+        return db.session.get(Job, job_id)
+
+    def recover(self):
+        """
+        Queues again, in this process, the jobs abandoned by a worker that stopped.
+
+        A job is abandoned once it made no progress for heartbeat_timeout, queued jobs
+        being deemed to make none. Queuing a job twice is harmless: it only starts once.
+
+        Returns:
+            list: The IDs of the jobs queued again.
+        """
+        stale = datetime.utcnow() - self.heartbeat_timeout
+        with db.engine.connect() as connection:
+            abandoned = connection.scalars(_abandoned_jobs(stale)).all()
+        if not abandoned:
+            return []
+
+        job_ids = writer.run(_requeue_jobs, abandoned, stale)
+        for job_id in job_ids:
+            self.app.logger.warning("Job %s was abandoned by its worker, queued again", job_id)
+            self.executor.submit(self._run, job_id)
+        return job_ids
+
+    def cancel(self, job_id):
+        """Cancels a queued job, or asks a running one to stop after its current batch."""
+        if not writer.run(_cancel_job, job_id):
+            return None
+        return db.session.get(Job, job_id)
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            if not writer.run(_start_job, job_id):
+                return
+            job = db.session.get(Job, job_id)
+
+            def progress(counts):
+                # Read in the write, so this sees the flag set by other workers
+                if writer.run(_record_progress, job_id, counts):
+                    raise JobCancelled()
+
+            harvest = getattr(utils, JOB_FUNCTIONS[job.kind])
+            try:
+                counts = harvest(**json.loads(job.params), progress=progress)
+            except JobCancelled:
+                writer.run(_finish_job, job_id, "cancelled")
+            except Exception as e:
+                self.app.logger.exception("Job %s failed", job_id)
+                writer.run(_finish_job, job_id, "failed", error=f"{type(e).__name__}: {e}")
+            else:
+                writer.run(_finish_job, job_id, "succeeded", counts)
+            db.session.remove()
+
+
+def _add_job(job_id, kind, params):
+    """Returns the ID of the active job with these parameters, or of the new job, and whether it is new."""
+    params = json.dumps(params, sort_keys=True)
+    active = db.session.scalar(
+        select(Job.id).where(Job.kind == kind, Job.params == params, Job.status.in_(ACTIVE_JOB_STATUSES)).limit(1)
+    )
+    if active is not None:
+        return active, False
+
+    db.session.add(Job(id=job_id, kind=kind, params=params, status="queued"))
+    return job_id, True
+
+
+def _abandoned_jobs(stale):
+    """Selects the IDs of the active jobs without progress since the stale date."""
+    return select(Job.id).where(
+        Job.status.in_(ACTIVE_JOB_STATUSES), func.coalesce(Job.heartbeat_at, Job.created_at) < stale
+    )
+
+
+def _requeue_jobs(job_ids, stale):
+    """Marks abandoned jobs as queued again, or cancelled if asked. Returns the IDs of the queued ones."""
+    requeued = []
+    # Read again in the write: another worker may have recovered them meanwhile
+    for job in db.session.scalars(select(Job).where(Job.id.in_(job_ids), Job.id.in_(_abandoned_jobs(stale)))):
+        if job.cancel_requested:
+            job.status = "cancelled"
+            job.finished_at = datetime.utcnow()
+            continue
+        job.status = "queued"
+        # Not abandoned again until this worker had the time to start it
+        job.heartbeat_at = datetime.utcnow()
+        requeued.append(job.id)
+    return requeued
+
+
+def _cancel_job(job_id):
+    """Returns False when the job does not exist."""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return False
+
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = datetime.utcnow()
+    elif job.status == "running":
+        job.cancel_requested = True
+    return True
+
+
+def _start_job(job_id):
+    """Marks a queued job as running. Returns False when it is no longer queued."""
+    job = db.session.get(Job, job_id)
+    if job is None or job.status != "queued":
+        return False
+
+    job.status = "running"
+    job.started_at = job.heartbeat_at = datetime.utcnow()
+    return True
+
+
+def _record_progress(job_id, counts):
+    """Stores the counts of a running job. Returns whether its cancellation was requested."""
+    job = db.session.get(Job, job_id)
+    _record_counts(job, counts)
+    job.heartbeat_at = datetime.utcnow()
+    return job.cancel_requested
+
+
+def _finish_job(job_id, status, counts=None, error=None):
+    job = db.session.get(Job, job_id)
+    if counts is not None:
+        _record_counts(job, counts)
+        job.result = json.dumps(counts)
+    job.status = status
+    job.error = error
+    job.finished_at = datetime.utcnow()
+
+
+def _record_counts(job, counts):
+    job.pages_fetched = counts["pages"]
+    job.articles_inserted = counts["inserted"]
+    job.articles_updated = counts["updated"]
+    job.articles_skipped = counts["skipped"]
+
+
+def job_to_dict(job):
+    """Converts a Job object to a dictionary."""
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "params": json.loads(job.params) if job.params else {},
+        "status": job.status,
+        "pages_fetched": job.pages_fetched,
+        "articles_inserted": job.articles_inserted,
+        "articles_updated": job.articles_updated,
+        "articles_skipped": job.articles_skipped,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "cancel_requested": job.cancel_requested,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+job_queue = JobQueue()
@@ -0,0 +1,88 @@
+# leases.py
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select
+from src.models import db, FetchLease
+
+# Time after which a lease whose holder died can be taken over
+LEASE_TTL = timedelta(seconds=60)
+
+# Maximum number of seconds spent waiting for a lease held by another worker
+LEASE_WAIT_TIMEOUT = 60
+
+# Seconds between the first two checks of a lease held by another worker, doubled after each check
+LEASE_POLL_INTERVAL = 0.05
+
+# Maximum number of seconds between two checks of a lease held by another worker
+LEASE_POLL_MAX_INTERVAL = 1
+
+
+def acquire_lease(key, owner, ttl=LEASE_TTL):
+    """
+    Takes the lease of key if no other owner holds an unexpired one.
+
+    The lease is written in its own transaction, so workers of other processes sharing
+    the database see it at once.
+
+    Returns:
+        bool: Whether the lease was taken.
+    """
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        connection.execute(delete(FetchLease).where(FetchLease.key == key, FetchLease.expires_at <= now))
+        result = connection.execute(
+            insert(FetchLease).prefix_with("OR IGNORE").values(key=key, owner=owner, expires_at=now + ttl)
+        )
+    return result.rowcount == 1
+
+
+def release_lease(key, owner):
+    """Releases the lease of key if owner still holds it."""
+    with db.engine.begin() as connection:
+        connection.execute(delete(FetchLease).where(FetchLease.key == key, FetchLease.owner == owner))
+
+
+def lease_holder(key):
+    """Returns the owner of the unexpired lease of key, or None."""
+    with db.engine.connect() as connection:
+        return connection.scalar(
+            select(FetchLease.owner).where(FetchLease.key == key, FetchLease.expires_at > datetime.utcnow())
+        )
+
+
+@contextmanager
+def lease(key, ttl=LEASE_TTL, wait_timeout=LEASE_WAIT_TIMEOUT, poll_interval=LEASE_POLL_INTERVAL,
+          max_poll_interval=LEASE_POLL_MAX_INTERVAL):
+    """
+    Holds the lease of key for the duration of the block, across processes.
+
+    When another worker holds the lease, waits until it is released, expires, or
+    wait_timeout elapses. The block should check whether that worker already did the
+    work before doing it again, and must not do it when the lease was not taken.
+
+    While waiting, the lease is checked with a read, backing off from poll_interval to
+    max_poll_interval: taking it is a write transaction, which would hold the SQLite
+    write lock the writer of src.storage needs. It is only taken once it looks free.
+
+    Yields:
+        bool: True once the lease is held, False when waiting timed out.
+    """
+    owner = f"{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex[:8]}"
+    deadline = time.monotonic() + wait_timeout
+    interval = poll_interval
+    while lease_holder(key) is not None or not acquire_lease(key, owner, ttl):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            yield False
+            return
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, max_poll_interval)
+
+    try:
+        yield True
+    finally:
+        release_lease(key, owner)
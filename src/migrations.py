@@ -0,0 +1,137 @@
+# migrations.py
+from sqlalchemy import MetaData
+from src.models import author_key, normalize_author_name, ArticleAuthor, Author
+
+# Number of rows rewritten per transaction when backfilling a column
+MIGRATION_BATCH_SIZE = 5000
+
+# SQLite rendering of the dates stored by SQLAlchemy's DateTime type: %f gives the seconds
+# with 3 decimals, SQLAlchemy writes 6
+DATETIME_SQL = "strftime('%Y-%m-%d %H:%M:%f', {column}) || '000'"
+
+
+def migrate(connection, batch_size=MIGRATION_BATCH_SIZE):
+    """
+    Runs the migration steps the database has not run yet, committing as it goes.
+
+    db.create_all() creates missing tables and indexes but never changes an existing
+    table, the steps of MIGRATIONS do. The version reached is kept in SQLite's
+    user_version pragma so each step runs once, and a step interrupted midway can
+    safely run again.
+
+    Args:
+        connection (Connection): A connection outside of any transaction.
+        batch_size (int): The number of rows rewritten per transaction.
+
+    Returns:
+        int: The schema version of the database.
+    """
+    if connection.dialect.name != "sqlite":
+        return len(MIGRATIONS)
+
+    version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+    for target, step in enumerate(MIGRATIONS, start=1):
+        if version < target:
+            step(connection, batch_size)
+            connection.exec_driver_sql(f"PRAGMA user_version = {target}")
+            connection.commit()
+            version = target
+    return version
+
+
+def typed_dates_and_categories(connection, batch_size):
+    """
+    Version 1: published_date and updated_date hold dates, articles get a primary_category.
+
+    Older databases stored the raw ArXiv strings, e.g. "2024-01-25T07:57:41Z", which do
+    not compare with dates. They are rewritten to the format of SQLAlchemy's DateTime
+    type, empty strings becoming NULL. SQLite keeps the declared VARCHAR type of the
+    columns, which has no effect on the values stored.
+
+    The categories of existing articles are not in the database: run
+    `flask backfill-categories` to fetch them.
+    """
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(article)")}
+    if not columns:
+        return
+    if "primary_category" not in columns:
+        connection.exec_driver_sql("ALTER TABLE article ADD COLUMN primary_category VARCHAR(50)")
+        connection.commit()
+
+    published_date = DATETIME_SQL.format(column="published_date")
+    updated_date = DATETIME_SQL.format(column="updated_date")
+    last_rowid = connection.exec_driver_sql("SELECT max(rowid) FROM article").scalar() or 0
+    for low in range(0, last_rowid, batch_size):
+        connection.exec_driver_sql(
+            f"UPDATE article SET published_date = {published_date}, updated_date = {updated_date} "
+            "WHERE rowid > ? AND rowid <= ?",
+            (low, low + batch_size),
+        )
+        connection.commit()
+
+
+def normalized_authors(connection, batch_size):
+    """
+    Version 2: one author row per author, listed on the articles through article_author.
+
+    Older databases stored an author row per (article, name), with no index. The names
+    are merged by author_key into a new author table, the first spelling met being kept,
+    then each article is linked to its authors in their original order. Author rows of
+    articles no longer stored are left out. The old table is dropped once everything is
+    copied, and the copy is done again if it was interrupted.
+    """
+    tables = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(author)")}
+    if "article_id" not in columns and "author_normalized" not in tables:
+        return
+
+    driver_connection = connection.connection.driver_connection
+    driver_connection.create_function("author_key", 1, author_key, deterministic=True)
+    driver_connection.create_function("normalize_author_name", 1, normalize_author_name, deterministic=True)
+
+    if "article_id" in columns:
+        Author.__table__.to_metadata(MetaData(), name="author_normalized").create(connection, checkfirst=True)
+        ArticleAuthor.__table__.create(connection, checkfirst=True)
+        # Walks the author rows of each batch of articles in order, instead of scanning them all
+        connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_author_article_id ON author (article_id, id)")
+        connection.commit()
+
+        last_rowid = connection.exec_driver_sql("SELECT max(rowid) FROM author").scalar() or 0
+        for low in range(0, last_rowid, batch_size):
+            connection.exec_driver_sql(
+                "INSERT OR IGNORE INTO author_normalized (name, key) "
+                "SELECT normalize_author_name(name), author_key(name) FROM author "
+                "WHERE rowid > ? AND rowid <= ? AND article_id IN (SELECT id FROM article) ORDER BY rowid",
+                (low, low + batch_size),
+            )
+            connection.commit()
+
+        last_rowid = connection.exec_driver_sql("SELECT max(rowid) FROM article").scalar() or 0
+        for low in range(0, last_rowid, batch_size):
+            connection.exec_driver_sql(
+                "INSERT OR IGNORE INTO article_author (article_id, position, author_id) "
+                "SELECT author.article_id, row_number() OVER (PARTITION BY author.article_id ORDER BY author.id) - 1, "
+                "author_normalized.id FROM author "
+                "JOIN author_normalized ON author_normalized.key = author_key(author.name) "
+                "WHERE author.article_id IN (SELECT id FROM article WHERE rowid > ? AND rowid <= ?)",
+                (low, low + batch_size),
+            )
+            connection.commit()
+
+        connection.exec_driver_sql("DROP TABLE author")
+        connection.commit()
+
+    connection.exec_driver_sql("ALTER TABLE author_normalized RENAME TO author")
+    connection.commit()
+
+
+def job_heartbeats(connection, batch_size):
+    """Version 3: jobs record the last sign of life of the worker running them."""
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(job)")}
+    if columns and "heartbeat_at" not in columns:
+        connection.exec_driver_sql("ALTER TABLE job ADD COLUMN heartbeat_at DATETIME")
+        connection.commit()
+
+
+# Migration steps, the step at index i upgrading a database to version i + 1
+MIGRATIONS = (typed_dates_and_categories, normalized_authors, job_heartbeats)
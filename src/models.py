@@ -1,20 +1,112 @@
 # models.py
 
+import unicodedata
+from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import relationship
+from sqlalchemy import event, select
+from sqlalchemy.ext.orderinglist import ordering_list
+from sqlalchemy.orm import Session, relationship
+from sqlalchemy.types import DateTime, TypeDecorator
 
 db = SQLAlchemy()
 
 
+def parse_datetime(value):
+    """
+    Parses an ArXiv or ISO 8601 date, such as "2024-01-25T07:57:41Z" or "2024-01-27".
+
+    Args:
+        value (str or datetime): The date to parse. Aware dates are converted to UTC.
+
+    Returns:
+        datetime: The naive UTC date, or None for a missing or empty value.
+
+    Raises:
+        ValueError: The value is not an ISO 8601 date.
+    """
+    if value is None or value == "":
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def format_datetime(value):
+    """Formats a stored date the way the ArXiv API does, e.g. "2024-01-25T07:57:41Z"."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return value
+
+
+def normalize_author_name(name):
+    """Returns an author name in Unicode NFC form, with its runs of whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFC", name or "").split())
+
+
+def author_key(name):
+    """
+    Returns the key identifying an author: the normalized name, case folded.
+
+    "Jane  Doe", "JANE DOE" and "jane doe" are the same author.
+    """
+    return normalize_author_name(name).casefold()
+
+
+class ISODateTime(TypeDecorator):
+    """DateTime column that also accepts the ISO 8601 strings found in feeds and uploads."""
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return parse_datetime(value)
+
+
+# Association between articles and all their ArXiv categories, the primary one included
+article_category = db.Table(
+    "article_category",
+    db.Column("article_id", db.String(255), db.ForeignKey("article.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("category_id", db.Integer, db.ForeignKey("category.id"), primary_key=True),
+    # Category filters read the article IDs of one category from this index alone
+    db.Index("ix_article_category_category_id", "category_id", "article_id"),
+)
+
+
 class Author(db.Model):
     __tablename__ = "author"
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(255))
-    article_id = db.Column(db.String(255), db.ForeignKey("article.id", ondelete="CASCADE"), nullable=False)
+    # Normalized name, as first seen
+    name = db.Column(db.String(255), nullable=False)
+    # author_key of the name, one author per key
+    key = db.Column(db.String(255), unique=True, nullable=False)
+
+    # The articles of the author, through the article_author association
+    authorships = relationship("ArticleAuthor", back_populates="author")
+
+    def __init__(self, name="", article=None, **kwargs):
+        name = normalize_author_name(name)
+        super().__init__(name=name, key=author_key(name), **kwargs)
+        # Author(name=..., article=...) lists the author on the article, after its other authors
+        if article is not None:
+            article.authorships.append(ArticleAuthor(author=self))
+
+
+class ArticleAuthor(db.Model):
+    __tablename__ = "article_author"
 
-    # Define the relationship with the Article model
-    article = relationship("Article", back_populates="authors")
+    article_id = db.Column(db.String(255), db.ForeignKey("article.id", ondelete="CASCADE"), primary_key=True)
+    # Rank of the author in the author list of the article, from 0
+    position = db.Column(db.Integer, primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey("author.id"), nullable=False)
+
+    article = relationship("Article", back_populates="authorships")
+    author = relationship("Author", back_populates="authorships", lazy="joined", innerjoin="unnested")
+
+    # Author pages read the article IDs of one author from this index alone
+    __table_args__ = (db.Index("ix_article_author_author_id", "author_id", "article_id"),)
 
 
 class Article(db.Model):
@@ -23,11 +115,176 @@ class Article(db.Model):
     id = db.Column(db.String(255), primary_key=True)
     title = db.Column(db.String(255))
     summary = db.Column(db.Text)
-    published_date = db.Column(db.String(20))
-    updated_date = db.Column(db.String(20))
+    published_date = db.Column(ISODateTime)
+    updated_date = db.Column(ISODateTime)
     doi = db.Column(db.String(50))
     comment = db.Column(db.Text)
     journal_reference = db.Column(db.String(255))
+    # ArXiv primary category, e.g. "cs.AI"
+    primary_category = db.Column(db.String(50))
+
+    # The authors of the article in order, each listed through an ArticleAuthor
+    authorships = relationship(
+        "ArticleAuthor",
+        back_populates="article",
+        order_by="ArticleAuthor.position",
+        collection_class=ordering_list("position"),
+        cascade="all, delete-orphan",
+    )
+
+    @property
+    def authors(self):
+        """The authors of the article in order."""
+        return [authorship.author for authorship in self.authorships]
+
+    @authors.setter
+    def authors(self, authors):
+        self.authorships = [ArticleAuthor(author=author) for author in authors]
+
+    # All the categories of the article, cross-lists included
+    categories = relationship("Category", secondary=article_category, passive_deletes=True)
+
+    # Keyset pagination walks articles by (published_date, id), date ranges use it too
+    __table_args__ = (db.Index("ix_article_published_date_id", "published_date", "id"),)
+
+
+class Category(db.Model):
+    __tablename__ = "category"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # ArXiv category term, e.g. "cs.AI" or "math.CO"
+    term = db.Column(db.String(50), unique=True, nullable=False)
+
+
+class MonthStats(db.Model):
+    __tablename__ = "stats_month"
+
+    # Number of articles published each month, kept up to date by the triggers of src.stats
+    month = db.Column(db.String(7), primary_key=True)  # "2024-01", "" for articles without a date
+    articles = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CategoryStats(db.Model):
+    __tablename__ = "stats_category"
+
+    # Number of articles listed in each category, kept up to date by the triggers of src.stats
+    category_id = db.Column(db.Integer, db.ForeignKey("category.id"), primary_key=True)
+    articles = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AuthorStats(db.Model):
+    __tablename__ = "stats_author"
+
+    # Number of articles of each author, kept up to date by the triggers of src.stats
+    author_id = db.Column(db.Integer, db.ForeignKey("author.id"), primary_key=True)
+    # Top authors are read from this index alone
+    articles = db.Column(db.Integer, nullable=False, default=0, index=True)
+
+
+class CachedSummary(db.Model):
+    __tablename__ = "summary_cache"
+
+    # Summaries fetched from arXiv for articles that are not stored, see src.summaries
+    article_id = db.Column(db.String(255), primary_key=True)
+    summary = db.Column(db.Text, nullable=False)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Least recently used entries are evicted first
+    accessed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class FetchLease(db.Model):
+    __tablename__ = "fetch_lease"
+
+    # Held by the worker fetching a resource from arXiv, see src.leases
+    key = db.Column(db.String(512), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class HarvestCursor(db.Model):
+    __tablename__ = "harvest_cursor"
+
+    # One cursor per (query, start_date, end_date, max_results) harvest
+    key = db.Column(db.String(512), primary_key=True)
+    next_start = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ArticleChange(db.Model):
+    __tablename__ = "article_change"
+
+    # Articles written since the similar articles index was refreshed, logged by the triggers of src.similar
+    seq = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.String(255), nullable=False)
+
+    # Sequence numbers are never reused, even once the log is emptied
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class CacheInvalidation(db.Model):
+    __tablename__ = "cache_invalidation"
+
+    # Tags invalidated by a write of any process, logged by the triggers of src.cache and
+    # applied by each process to its own caches
+    seq = db.Column(db.Integer, primary_key=True)
+    tag = db.Column(db.String(512), nullable=False)
+
+    # Sequence numbers are never reused, even once the log is pruned
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class SyncState(db.Model):
+    __tablename__ = "sync_state"
+
+    # One state per query kept up to date by incremental syncs
+    query = db.Column(db.String(512), primary_key=True)
+    newest_published_date = db.Column(ISODateTime)
+    newest_updated_date = db.Column(ISODateTime)
+    # Set while a sync stopped at max_results before reaching the articles known from the previous one,
+    # the newest dates become the recorded ones once the next calls have read down to them
+    resume_start = db.Column(db.Integer)
+    resume_published_date = db.Column(ISODateTime)
+    resume_updated_date = db.Column(ISODateTime)
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Job(db.Model):
+    __tablename__ = "job"
+
+    id = db.Column(db.String(36), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text)
+    # queued, running, succeeded, failed or cancelled
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    pages_fetched = db.Column(db.Integer, nullable=False, default=0)
+    articles_inserted = db.Column(db.Integer, nullable=False, default=0)
+    articles_updated = db.Column(db.Integer, nullable=False, default=0)
+    articles_skipped = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Last sign of life of the worker running the job, see JobQueue.recover
+    heartbeat_at = db.Column(db.DateTime)
+
+
+@event.listens_for(Session, "before_flush")
+def merge_duplicate_authors(session, flush_context, instances):
+    """Lists the new Author objects whose key is already taken as the author holding it."""
+    new_authors = [instance for instance in session.new if isinstance(instance, Author)]
+    if not new_authors:
+        return
 
-    # Define the relationship with the Author model
-    authors = relationship("Author", back_populates="article", cascade="all, delete-orphan", passive_deletes=True)
+    with session.no_autoflush:
+        authors_by_key = {
+            author.key: author
+            for author in session.scalars(select(Author).where(Author.key.in_({a.key for a in new_authors})))
+        }
+    for author in new_authors:
+        holder = authors_by_key.setdefault(author.key, author)
+        if holder is not author:
+            for authorship in list(author.authorships):
+                authorship.author = holder
+            session.expunge(author)
@@ -0,0 +1,80 @@
+# parser.py
+import io
+import re
+import xml.etree.ElementTree as ET
+
+# XML namespaces used by the ArXiv API Atom feeds
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+ARXIV_NS = "{http://arxiv.org/schemas/atom}"
+
+ENTRY_TAG = ATOM_NS + "entry"
+
+# ArXiv category terms such as "cs.AI", "hep-th" or "cond-mat.str-el". Feeds also list
+# MSC and ACM classes ("14J45, 32Q20", "I.2.6") as categories, which are left out.
+CATEGORY_PATTERN = re.compile(r"^[a-z]+(-[a-z]+)*(\.[A-Za-z]+(-[a-z]+)*)?$")
+
+
+def iter_feed_entries(source):
+    """
+    Incrementally parses an ArXiv Atom feed and yields one article dictionary per entry.
+
+    Each entry is converted as soon as its closing tag is read, then removed from the
+    tree, so memory use does not grow with the size of the feed.
+
+    Args:
+        source (bytes or file-like): The raw feed, or a binary stream to read it from.
+
+    Yields:
+        dict: The article fields, shaped like the output of get_arxiv_articles.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    root = None
+    try:
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            if root is None:
+                root = element
+            elif event == "end" and element.tag == ENTRY_TAG:
+                yield entry_element_to_article(element)
+                # Drop the processed entry and anything read before it
+                root.clear()
+    except ET.ParseError:
+        # Like feedparser, a body that is not well-formed XML ends the feed
+        return
+
+
+def entry_element_to_article(entry):
+    """Converts an <entry> element to the article dictionary stored in the database."""
+    authors = []
+    for author in entry.iterfind(ATOM_NS + "author"):
+        authors.append({"name": _text(author.find(ATOM_NS + "name"))})
+
+    categories = []
+    for category in entry.iterfind(ATOM_NS + "category"):
+        term = category.get("term", "")
+        if CATEGORY_PATTERN.match(term) and term not in categories:
+            categories.append(term)
+
+    primary_category = entry.find(ARXIV_NS + "primary_category")
+
+    return {
+        "id": _text(entry.find(ATOM_NS + "id")).split("/")[-1],
+        "title": _text(entry.find(ATOM_NS + "title")),
+        "summary": _text(entry.find(ATOM_NS + "summary")),
+        "published_date": _text(entry.find(ATOM_NS + "published")),
+        "updated_date": _text(entry.find(ATOM_NS + "updated")),
+        "doi": _text(entry.find(ARXIV_NS + "doi")),
+        "comment": _text(entry.find(ARXIV_NS + "comment")),
+        "journal_reference": _text(entry.find(ARXIV_NS + "journal_ref")),
+        "primary_category": primary_category.get("term", "") if primary_category is not None else "",
+        "categories": categories,
+        "authors": authors,
+    }
+
+
+def _text(element):
+    """Returns the stripped text content of an element, or "" when it is missing."""
+    if element is None:
+        return ""
+    return "".join(element.itertext()).strip()
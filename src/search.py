@@ -0,0 +1,105 @@
+# search.py
+import re
+from sqlalchemy import column, event, literal_column, table
+from src.models import Article
+
+# Weights of the title and summary columns in the BM25 ranking
+TITLE_WEIGHT = 10.0
+SUMMARY_WEIGHT = 1.0
+
+# FTS5 index over the title and summary of the article table. It stores no copy of the
+# text (external content) and is kept in sync by triggers, so every write path, including
+# bulk Core statements, updates it. It points to articles by rowid: run
+# rebuild_search_index after a VACUUM, which may renumber the rowids of the article table.
+SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS article_fts USING fts5("
+    "title, summary, content='article', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS article_fts_insert AFTER INSERT ON article BEGIN "
+    "INSERT INTO article_fts(rowid, title, summary) VALUES (new.rowid, new.title, new.summary); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS article_fts_delete AFTER DELETE ON article BEGIN "
+    "INSERT INTO article_fts(article_fts, rowid, title, summary) "
+    "VALUES ('delete', old.rowid, old.title, old.summary); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS article_fts_update AFTER UPDATE OF title, summary ON article BEGIN "
+    "INSERT INTO article_fts(article_fts, rowid, title, summary) "
+    "VALUES ('delete', old.rowid, old.title, old.summary); "
+    "INSERT INTO article_fts(rowid, title, summary) VALUES (new.rowid, new.title, new.summary); "
+    "END",
+)
+
+article_fts = table("article_fts", column("rowid"), column("rank"))
+
+# Quoted phrases, or single terms optionally ending with * for a prefix search
+QUERY_TOKEN_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def create_search_index(connection):
+    """Creates the full-text index and its triggers if needed, indexing the existing articles."""
+    if connection.dialect.name != "sqlite":
+        return
+
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'article_fts'"
+    ).first()
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+
+    if not exists:
+        connection.exec_driver_sql(
+            f"INSERT INTO article_fts(article_fts, rank) VALUES ('rank', 'bm25({TITLE_WEIGHT}, {SUMMARY_WEIGHT})')"
+        )
+        rebuild_search_index(connection)
+
+
+def rebuild_search_index(connection):
+    """Rebuilds the full-text index from the content of the article table."""
+    connection.exec_driver_sql("INSERT INTO article_fts(article_fts) VALUES ('rebuild')")
+
+
+@event.listens_for(Article.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(Article.__table__, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS article_fts")
+
+
+def match_expression(user_query):
+    """
+    Translates a user query to an FTS5 MATCH expression, or returns None when it has no term.
+
+    Every term must match. "quoted words" match as a phrase, and a term ending with *
+    matches as a prefix. Other FTS5 operators are treated as plain text, so no user
+    query can be a syntax error.
+    """
+    terms = []
+    for phrase, word in QUERY_TOKEN_PATTERN.findall(user_query):
+        text = phrase if phrase else word
+        prefix = not phrase and text.endswith("*")
+        text = text.rstrip("*") if prefix else text
+        # Keep letters and digits only, as the unicode61 tokenizer does
+        text = " ".join(re.findall(r"\w+", text))
+        if text:
+            terms.append(f'"{text}"*' if prefix else f'"{text}"')
+    return " ".join(terms) or None
+
+
+def search_articles(articles_query, user_query):
+    """
+    Restricts an Article query to the articles matching user_query, best BM25 rank first.
+
+    The title and the summary are both searched, a title match weighing more.
+    """
+    expression = match_expression(user_query)
+    if expression is None:
+        return articles_query
+
+    return (
+        articles_query.join(article_fts, article_fts.c.rowid == literal_column("article.rowid"))
+        .filter(literal_column("article_fts").op("MATCH")(expression))
+        .order_by(article_fts.c.rank)
+    )
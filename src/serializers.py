@@ -0,0 +1,136 @@
+# serializers.py
+import gzip
+import json
+from datetime import date
+from flask import has_request_context, request
+from flask.json.provider import JSONProvider
+from src.instrumentation import metrics
+
+# Optional fast JSON encoders, the standard library is used when none is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Optional Brotli compression, gzip only when it is not installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+elif msgspec is not None:
+    JSON_BACKEND = "msgspec"
+else:
+    JSON_BACKEND = "json"
+
+# Bodies smaller than this are sent uncompressed, compressing them gains nothing
+COMPRESS_MIN_SIZE = 1024
+
+# Compression levels, chosen for speed since every response is compressed on the fly
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# Media types worth compressing
+COMPRESSIBLE_MIMETYPES = frozenset(
+    {"application/json", "application/x-ndjson", "text/csv", "text/html", "text/plain"}
+)
+
+
+def dumps(data, pretty=False):
+    """
+    Serializes data to JSON with the fastest backend installed.
+
+    Args:
+        data: The data to serialize. Dates are written in ISO 8601.
+        pretty (bool): Indent the output by 2 spaces instead of writing it compactly.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document.
+    """
+    with metrics.timer("serialize"):
+        return _dumps(data, pretty)
+
+
+def _dumps(data, pretty):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if msgspec is not None:
+        body = msgspec.json.encode(data)
+        return msgspec.json.format(body, indent=2) if pretty else body
+    if pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False, default=_default).encode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def loads(data):
+    """Parses a JSON document with the fastest backend installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    if msgspec is not None:
+        return msgspec.json.decode(data)
+    return json.loads(data)
+
+
+def pretty_requested():
+    """Whether the current request asks for indented JSON with ?pretty=1."""
+    return has_request_context() and request.args.get("pretty") == "1"
+
+
+def negotiate_encoding(accept_encodings):
+    """
+    Picks the content coding of a response from the Accept-Encoding header.
+
+    Args:
+        accept_encodings (MIMEAccept): The parsed header, request.accept_encodings.
+
+    Returns:
+        str: "br", "gzip", or None to send the body as is.
+    """
+    if brotli is not None and accept_encodings.quality("br") > 0:
+        return "br"
+    if accept_encodings.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    """Compresses a body with the content coding returned by negotiate_encoding."""
+    if encoding == "br":
+        with metrics.timer("compress"):
+            return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        with metrics.timer("compress"):
+            return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask JSON provider built on dumps, so jsonify shares its backend.
+
+    Responses are compact unless the request asks for ?pretty=1.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, pretty=pretty_requested()).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, pretty=pretty_requested()), mimetype="application/json")
+
+
+def _default(value):
+    """Serializes the types the standard library encoder does not know."""
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,695 @@
+# similar.py
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import delete, select
+from src.leases import lease
+from src.models import db, Article, ArticleChange
+from src.storage import writer
+
+# Vectorized backend: sparse matrix products with NumPy and SciPy, listed in requirements.txt,
+# plain Python over an inverted index when they are not installed
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = sparse = None
+
+SIMILAR_BACKEND = "scipy" if sparse is not None else "python"
+
+# Number of similar articles returned unless the request asks for another number
+SIMILAR_K = 10
+
+# Maximum number of similar articles a request can ask for
+SIMILAR_MAX_K = 100
+
+# Seconds between two checks for articles written since the index was refreshed
+SIMILAR_REFRESH_INTERVAL = 5
+
+# Number of queries ranked by one matrix product, the scores take 4 bytes per article and query
+SIMILAR_QUERY_BATCH_SIZE = 16
+
+# The index is rebuilt once the rows appended or superseded since the last build exceed
+# this share of the rows it was built with: their weights use the document frequencies
+# of the time they were appended
+SIMILAR_REBUILD_RATIO = 0.2
+
+# Smallest number of rows the rebuild ratio applies to, small indexes are not rebuilt for every change
+SIMILAR_REBUILD_MIN_ROWS = 1000
+
+# Number of articles read per query when building the index
+SIMILAR_BUILD_CHUNK_SIZE = 1000
+
+# Lease of the worker writing the index files
+SIMILAR_LEASE_KEY = "similar_index"
+
+# Time after which the lease of a worker that died while writing the index can be taken over,
+# building the index of a large corpus takes minutes
+SIMILAR_LEASE_TTL = timedelta(minutes=30)
+
+# Seconds a client is asked to wait before retrying while the index is first built
+SIMILAR_RETRY_AFTER = 30
+
+# Words of at least 2 letters, digits and underscores excluded
+TOKEN_PATTERN = re.compile(r"[^\W\d_]{2,}")
+
+# Words too common in abstracts to tell articles apart
+STOP_WORDS = frozenset(
+    "about above after all also an and any are as at be been between both but by can could do does for from "
+    "has have here how however if in into is it its more most not of on one only or other our over show such "
+    "than that the their them then there these they this those through to two under use used using via was we "
+    "were what when where which while who with within without".split()
+)
+
+# Typecodes of the index files, little-endian on every supported platform
+INDEX_TYPECODE = "i"
+WEIGHT_TYPECODE = "f"
+
+# Logs the articles written to article_change, so the index applies them at its next refresh
+SIMILAR_TRIGGERS_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS similar_article_insert AFTER INSERT ON article BEGIN "
+    "INSERT INTO article_change (article_id) VALUES (new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS similar_article_update AFTER UPDATE OF summary ON article BEGIN "
+    "INSERT INTO article_change (article_id) VALUES (new.id); END",
+    "CREATE TRIGGER IF NOT EXISTS similar_article_delete AFTER DELETE ON article BEGIN "
+    "INSERT INTO article_change (article_id) VALUES (old.id); END",
+)
+
+
+def tokenize(text):
+    """Returns the lowercase words of a text, stop words left out."""
+    return [word for word in TOKEN_PATTERN.findall((text or "").lower()) if word not in STOP_WORDS]
+
+
+def idf(document_frequency, documents):
+    """Smoothed inverse document frequency of a term found in document_frequency of documents."""
+    return math.log((1 + documents) / (1 + document_frequency)) + 1
+
+
+def tfidf_row(counts, columns, document_frequencies, documents):
+    """
+    Returns the L2-normalized TF-IDF vector of a document as (columns, weights), by column.
+
+    Args:
+        counts (Counter): The number of occurrences of each term of the document.
+        columns (dict): The column of each term.
+        document_frequencies (Sequence): The number of documents containing the term of each column.
+        documents (int): The number of documents.
+    """
+    weights = {}
+    for term, count in counts.items():
+        column = columns.get(term)
+        if column is not None:
+            weights[column] = (1 + math.log(count)) * idf(document_frequencies[column], documents)
+    norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+    ordered = sorted(weights)
+    return ordered, [weights[column] / norm for column in ordered]
+
+
+class IndexNotReady(Exception):
+    """Raised by SimilarIndex.similar while the first index of the database is being built."""
+
+
+class IndexData:
+    """
+    A read-only snapshot of the index files: article IDs, vocabulary and the TF-IDF matrix.
+
+    The matrix is stored in CSR form, one row per article version, and memory-mapped.
+    Rows of articles deleted or changed since are marked dead and never returned.
+    """
+
+    def __init__(self, path, meta, previous=None):
+        self.path = path
+        self.meta = meta
+        self.generation = meta["generation"]
+        self.seq = meta["seq"]
+        self.rows = meta["rows"]
+        self.nnz = meta["nnz"]
+        self.documents = meta["documents"]
+        files = index_files(path, self.generation)
+
+        same_generation = previous is not None and previous.generation == self.generation
+        if same_generation:
+            # The text files only grow within a generation: read their new lines
+            self.ids = previous.ids + _read_lines(files["ids"], previous.meta["ids_bytes"], self.rows - previous.rows)
+            self.terms = previous.terms + _read_lines(
+                files["terms"], previous.meta["terms_bytes"], meta["terms"] - len(previous.terms)
+            )
+            self.row_of = previous.row_of
+            self.columns = previous.columns
+        else:
+            self.ids = _read_lines(files["ids"], 0, self.rows)
+            self.terms = _read_lines(files["terms"], 0, meta["terms"])
+            self.row_of = {}
+            self.columns = {}
+        # Later rows of an article supersede the earlier ones
+        start = previous.rows if same_generation else 0
+        self.row_of.update((self.ids[row], row) for row in range(start, self.rows))
+        self.columns.update((self.terms[column], column) for column in range(len(self.columns), len(self.terms)))
+
+        with open(files["alive"], "rb") as file:
+            self.alive = bytearray(file.read(self.rows))
+        self.document_frequencies = _read_array(files["df"], INDEX_TYPECODE, meta["terms"])
+        self.indptr = _map_array(files["indptr"], INDEX_TYPECODE, self.rows + 1)
+        self.indices = _map_array(files["indices"], INDEX_TYPECODE, self.nnz)
+        self.weights = _map_array(files["data"], WEIGHT_TYPECODE, self.nnz)
+
+        self._matrix = None
+        # Built on first use by the Python backend, and extended by the later snapshots of the generation
+        self._postings = previous._postings if same_generation else _Postings()
+
+    def row(self, article_id):
+        """Returns the live row of an article, or None when it is not indexed."""
+        row = self.row_of.get(article_id)
+        if row is None or row >= self.rows or not self.alive[row]:
+            return None
+        return row
+
+    def row_columns(self, row):
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def top_k(self, rows, k):
+        """Returns the k best (row, score) of each row, by cosine similarity."""
+        if SIMILAR_BACKEND == "scipy":
+            results = []
+            for start in range(0, len(rows), SIMILAR_QUERY_BATCH_SIZE):
+                results.extend(self._scipy_top_k(rows[start:start + SIMILAR_QUERY_BATCH_SIZE], k))
+            return results
+        return [self._python_top_k(row, k) for row in rows]
+
+    def _scipy_top_k(self, rows, k):
+        if self._matrix is None:
+            self._matrix = sparse.csr_matrix(
+                (self.weights, self.indices, self.indptr), shape=(self.rows, len(self.terms)), copy=False
+            )
+            self._dead = numpy.frombuffer(bytes(self.alive), dtype=numpy.uint8) == 0
+        # One sparse-dense product ranks every article against the whole batch of queries
+        scores = self._matrix @ self._matrix[rows].T.toarray()
+        scores[self._dead] = 0
+        results = []
+        for query, row in enumerate(rows):
+            column = scores[:, query]
+            column[row] = 0
+            best = numpy.argpartition(-column, k)[:k] if k < len(column) else numpy.arange(len(column))
+            best = best[numpy.argsort(-column[best], kind="stable")]
+            results.append([(int(other), float(column[other])) for other in best if column[other] > 0])
+        return results
+
+    def _python_top_k(self, row, k):
+        postings = self._inverted_index()
+        scores = defaultdict(float)
+        for column, weight in zip(self.row_columns(row), self.weights[self.indptr[row]:self.indptr[row + 1]]):
+            other_rows, other_weights = postings[column]
+            for other, other_weight in zip(other_rows, other_weights):
+                scores[other] += weight * other_weight
+        candidates = (
+            (score, other) for other, score in scores.items()
+            if other != row and other < self.rows and self.alive[other]
+        )
+        # Weights are NumPy scalars when the files are mapped by NumPy
+        return [(other, float(score)) for score, other in heapq.nlargest(k, candidates)]
+
+    def _inverted_index(self):
+        """Returns the rows and weights of each column, built from the matrix on first use."""
+        postings = self._postings
+        with postings.lock:
+            # Rows appended since the postings were last extended, none when a later snapshot
+            # of the generation extended them: its extra rows are skipped by _python_top_k
+            for row in range(postings.rows, self.rows):
+                start, end = self.indptr[row], self.indptr[row + 1]
+                for column, weight in zip(self.indices[start:end], self.weights[start:end]):
+                    rows, weights = postings.columns[column]
+                    rows.append(row)
+                    weights.append(weight)
+            postings.rows = max(postings.rows, self.rows)
+            return postings.columns
+
+    def disk_bytes(self):
+        return sum(os.path.getsize(file) for file in index_files(self.path, self.generation).values())
+
+
+class SimilarIndex:
+    """
+    TF-IDF index of the article summaries, answering the articles most similar to another one.
+
+    The index lives in files of its own, the matrix being memory-mapped, so it is shared
+    by the workers through the page cache. Triggers log the articles written to the
+    article_change table, and the index applies them on the next query, at most once
+    every refresh_interval seconds: changed articles get a new row, their old row is
+    marked dead. It is rebuilt from the article table once too many rows changed, since
+    it was first built, or when the database was reset.
+
+    Queries never build the index: builds run on a thread in the background, or from
+    `flask --app src.app build-similar-index`, while the previous index answers. Until the
+    first index exists, queries raise IndexNotReady.
+
+    Args:
+        path (str): The directory of the index files.
+        refresh_interval (float): The minimum number of seconds between two refreshes.
+    """
+
+    def __init__(self, path=None, refresh_interval=SIMILAR_REFRESH_INTERVAL):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._data = None
+        self._next_refresh = 0.0
+        self._lock = threading.RLock()
+        self._build_thread = None
+        self.builds = 0
+        self.refreshes = 0
+
+    def init_app(self, app):
+        """Reads the SIMILAR_INDEX_PATH and SIMILAR_REFRESH_INTERVAL settings of the app."""
+        with self._lock:
+            self.path = app.config.get("SIMILAR_INDEX_PATH", os.path.join(os.getcwd(), "data", "similar_index"))
+            self.refresh_interval = app.config.get("SIMILAR_REFRESH_INTERVAL", self.refresh_interval)
+            self._data = None
+            self._next_refresh = 0.0
+
+    def similar(self, article_ids, k=SIMILAR_K):
+        """
+        Ranks the indexed articles by similarity with each of the given articles.
+
+        Args:
+            article_ids (list): The ArXiv IDs of the articles.
+            k (int): The number of similar articles returned per article.
+
+        Returns:
+            list: For each ID, the (article ID, score) of its k most similar articles, best
+                first, or None when the article is not indexed (unknown, or no summary).
+
+        Raises:
+            IndexNotReady: The index is being built and there is no previous one.
+        """
+        self.refresh()
+        data = self._data
+        rows = [data.row(article_id) for article_id in article_ids]
+        ranked = iter(data.top_k([row for row in rows if row is not None], k))
+        return [
+            None if row is None else [(data.ids[other], score) for other, score in next(ranked)]
+            for row in rows
+        ]
+
+    def refresh(self, force=False):
+        """Applies the articles written since the last refresh, starting a build if needed."""
+        now = time.monotonic()
+        if not force and self._data is not None and now < self._next_refresh:
+            return
+        with self._lock:
+            self._next_refresh = now + self.refresh_interval
+            seq, triggers = self._database_state()
+            meta = self._read_meta()
+            if meta is None or not triggers or seq < meta["seq"]:
+                self.build_in_background(meta["generation"] if meta else 0)
+                if meta is None:
+                    raise IndexNotReady("The similar articles index is being built, try again later")
+                # The index of the previous database answers until then, its deleted articles left out by the caller
+                self._load(meta)
+                return
+
+            self._load(meta)
+            if seq == self._data.seq:
+                return
+            # Without waiting: the worker holding the lease applies the changes, or rebuilds the index
+            with lease(SIMILAR_LEASE_KEY, wait_timeout=0) as acquired:
+                meta = self._read_meta()
+                if not acquired or meta is None:
+                    return
+                # Another worker may have applied the changes before this one took the lease
+                self._load(meta)
+                if seq <= meta["seq"] or not self._apply_changes(meta, seq):
+                    return
+            self.build_in_background(meta["generation"])
+
+    def build(self, stale_generation=None):
+        """
+        Builds the index from the article table, replacing the previous one.
+
+        Args:
+            stale_generation (int): The generation of the index found stale, 0 for none. The
+                index is not built again when another worker replaced that generation while
+                this one waited for the lease. Always built when None.
+
+        Returns:
+            bool: Whether the index is up to date, False when another worker held the lease too long.
+        """
+        with lease(SIMILAR_LEASE_KEY, ttl=SIMILAR_LEASE_TTL) as acquired:
+            if not acquired:
+                return False
+            meta = self._read_meta()
+            if stale_generation is not None and meta is not None and meta["generation"] != stale_generation:
+                with self._lock:
+                    self._load(meta)
+                return True
+            self._build()
+            return True
+
+    def build_in_background(self, stale_generation=None):
+        """Starts build(stale_generation) on a thread of its own, unless a build of this process is running."""
+        with self._lock:
+            if self._build_thread is not None and self._build_thread.is_alive():
+                return
+            self._build_thread = threading.Thread(
+                target=self._build_in_app_context,
+                args=(current_app._get_current_object(), stale_generation),
+                name="similar-index",
+                daemon=True,
+            )
+            self._build_thread.start()
+
+    def wait(self, timeout=None):
+        """Waits for the build started in the background, if any, to finish."""
+        thread = self._build_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _build_in_app_context(self, app, stale_generation):
+        with app.app_context():
+            try:
+                if not self.build(stale_generation):
+                    app.logger.warning("The similar articles index is being built by another worker")
+            except Exception:
+                app.logger.exception("Building the similar articles index failed")
+
+    def _build(self):
+        os.makedirs(self.path, exist_ok=True)
+        writer.run(_create_triggers)
+        # Changes logged from now on are applied by the next refresh
+        seq, _ = self._database_state()
+
+        # First pass: document frequencies
+        document_frequencies = Counter()
+        documents = 0
+        for _, summary in self._summaries():
+            document_frequencies.update(set(tokenize(summary)))
+            documents += 1
+        terms = sorted(document_frequencies)
+        columns = {term: column for column, term in enumerate(terms)}
+        frequencies = [document_frequencies[term] for term in terms]
+
+        # Second pass: one row per article
+        previous = self._read_meta()
+        generation = previous["generation"] + 1 if previous else 1
+        files = index_files(self.path, generation)
+        meta = {
+            "generation": generation, "seq": seq, "rows": 0, "nnz": 0, "documents": 0, "terms": len(terms),
+            "base_rows": 0, "dead": 0, "ids_bytes": 0, "terms_bytes": 0,
+        }
+        for name in files:
+            open(files[name], "wb").close()
+        _write_array(files["indptr"], array(INDEX_TYPECODE, [0]))
+        _write_array(files["df"], array(INDEX_TYPECODE, frequencies))
+        with open(files["terms"], "ab") as file:
+            meta["terms_bytes"] = file.write("".join(term + "\n" for term in terms).encode("utf-8"))
+
+        batch = []
+        for article_id, summary in self._summaries():
+            counts = Counter(tokenize(summary))
+            if counts:
+                batch.append((article_id, *tfidf_row(counts, columns, frequencies, documents)))
+            if len(batch) >= SIMILAR_BUILD_CHUNK_SIZE:
+                _append_rows(files, meta, batch)
+                batch = []
+        _append_rows(files, meta, batch)
+        meta["base_rows"] = meta["rows"]
+        self._write_meta(meta)
+
+        self._prune_changes(seq)
+        with self._lock:
+            if previous:
+                for file in index_files(self.path, previous["generation"]).values():
+                    if os.path.exists(file):
+                        os.remove(file)
+            self._data = None
+            self._load(meta)
+        self.builds += 1
+
+    def stats(self):
+        """Returns the size of the index."""
+        data = self._data
+        return {
+            "backend": SIMILAR_BACKEND,
+            "articles": data.documents if data else 0,
+            "rows": data.rows if data else 0,
+            "terms": len(data.terms) if data else 0,
+            "nonzero_weights": data.nnz if data else 0,
+            "disk_bytes": data.disk_bytes() if data else 0,
+            "builds": self.builds,
+            "refreshes": self.refreshes,
+        }
+
+    def _apply_changes(self, meta, seq):
+        """
+        Gives the articles logged up to seq a new row and marks their previous row dead.
+
+        Returns:
+            bool: Whether the index should be rebuilt, too many of its rows having changed.
+        """
+        data = self._data
+        with db.engine.connect() as connection:
+            article_ids = list(
+                connection.scalars(
+                    select(ArticleChange.article_id)
+                    .where(ArticleChange.seq > meta["seq"], ArticleChange.seq <= seq)
+                    .distinct()
+                )
+            )
+            summaries = {}
+            for start in range(0, len(article_ids), SIMILAR_BUILD_CHUNK_SIZE):
+                chunk = article_ids[start:start + SIMILAR_BUILD_CHUNK_SIZE]
+                summaries.update(connection.execute(select(Article.id, Article.summary).where(Article.id.in_(chunk))).all())
+
+        frequencies = array(INDEX_TYPECODE, data.document_frequencies)
+        columns = data.columns
+        new_terms = {}
+        documents = data.documents
+        dead_rows = []
+        for article_id in article_ids:
+            row = data.row(article_id)
+            if row is not None:
+                dead_rows.append(row)
+                documents -= 1
+                for column in data.row_columns(row):
+                    frequencies[column] -= 1
+
+        changed_counts = []
+        for article_id in article_ids:
+            counts = Counter(tokenize(summaries.get(article_id)))
+            if not counts:
+                continue
+            for term in counts:
+                column = columns.get(term, new_terms.get(term))
+                if column is None:
+                    column = new_terms[term] = len(frequencies)
+                    frequencies.append(0)
+                frequencies[column] += 1
+            changed_counts.append((article_id, counts))
+            documents += 1
+
+        all_columns = _ChainedColumns(columns, new_terms)
+        rows = [(article_id, *tfidf_row(counts, all_columns, frequencies, documents)) for article_id, counts in changed_counts]
+
+        files = index_files(self.path, meta["generation"])
+        meta = dict(meta)
+        _truncate(files, meta)
+        with open(files["alive"], "r+b") as file:
+            for row in dead_rows:
+                file.seek(row)
+                file.write(b"\0")
+        with open(files["terms"], "ab") as file:
+            meta["terms_bytes"] += file.write("".join(term + "\n" for term in new_terms).encode("utf-8"))
+        meta["terms"] = len(frequencies)
+        _write_array(files["df"], frequencies)
+        _append_rows(files, meta, rows)
+        meta["seq"] = seq
+        meta["documents"] = documents
+        meta["dead"] += len(dead_rows)
+        self._write_meta(meta)
+        self._prune_changes(seq)
+        self._load(meta)
+        self.refreshes += 1
+
+        changed = meta["rows"] - meta["base_rows"] + meta["dead"]
+        return changed > SIMILAR_REBUILD_RATIO * max(meta["base_rows"], SIMILAR_REBUILD_MIN_ROWS)
+
+    def _load(self, meta):
+        data = self._data
+        if data is None or data.generation != meta["generation"] or data.seq != meta["seq"]:
+            self._data = IndexData(self.path, meta, previous=data)
+
+    def _summaries(self):
+        """Yields the (ID, summary) of the articles having a summary, in batches."""
+        last_id = ""
+        while True:
+            with db.engine.connect() as connection:
+                batch = connection.execute(
+                    select(Article.id, Article.summary)
+                    .where(Article.id > last_id, Article.summary.is_not(None), Article.summary != "")
+                    .order_by(Article.id)
+                    .limit(SIMILAR_BUILD_CHUNK_SIZE)
+                ).all()
+            if not batch:
+                return
+            yield from batch
+            last_id = batch[-1][0]
+
+    def _database_state(self):
+        """Returns the last sequence number of article_change, and whether the triggers exist."""
+        with db.engine.connect() as connection:
+            seq = connection.exec_driver_sql(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'article_change'"
+            ).scalar()
+            triggers = connection.exec_driver_sql(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'similar_article_%'"
+            ).scalar()
+        return seq or 0, triggers == len(SIMILAR_TRIGGERS_DDL)
+
+    def _prune_changes(self, seq):
+        def prune():
+            db.session.execute(delete(ArticleChange).where(ArticleChange.seq <= seq))
+
+        writer.run(prune)
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.path, "meta.json"), "rb") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta):
+        # Written last and replaced atomically: readers only use what it counts
+        temporary = os.path.join(self.path, "meta.json.tmp")
+        with open(temporary, "w") as file:
+            json.dump(meta, file)
+        os.replace(temporary, os.path.join(self.path, "meta.json"))
+
+
+class _Postings:
+    """The rows and weights of each column of a generation of the index, shared by its snapshots."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.columns = defaultdict(lambda: (array(INDEX_TYPECODE), array(WEIGHT_TYPECODE)))
+        # Number of rows of the matrix listed
+        self.rows = 0
+
+
+class _ChainedColumns:
+    """The columns of the index, then those of the terms met since it was loaded."""
+
+    def __init__(self, columns, new_columns):
+        self.columns = columns
+        self.new_columns = new_columns
+
+    def get(self, term, default=None):
+        column = self.columns.get(term)
+        return column if column is not None else self.new_columns.get(term, default)
+
+
+def _create_triggers():
+    """Creates the triggers logging the articles written to article_change, a write of the writer."""
+    connection = db.session.connection()
+    for statement in SIMILAR_TRIGGERS_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def index_files(path, generation):
+    """Returns the path of each file of a generation of the index."""
+    return {
+        name: os.path.join(path, f"{generation}.{name}.{extension}")
+        for name, extension in (
+            ("ids", "txt"), ("terms", "txt"), ("df", "bin"), ("indptr", "bin"), ("indices", "bin"), ("data", "bin"),
+            ("alive", "bin"),
+        )
+    }
+
+
+def _append_rows(files, meta, rows):
+    """Appends (article ID, columns, weights) rows to the files of an index, updating meta."""
+    indptr, indices, weights = array(INDEX_TYPECODE), array(INDEX_TYPECODE), array(WEIGHT_TYPECODE)
+    nnz = meta["nnz"]
+    for _, columns, row_weights in rows:
+        indices.extend(columns)
+        weights.extend(row_weights)
+        nnz += len(columns)
+        indptr.append(nnz)
+
+    _append_array(files["indices"], indices)
+    _append_array(files["data"], weights)
+    _append_array(files["indptr"], indptr)
+    with open(files["alive"], "ab") as file:
+        file.write(b"\1" * len(rows))
+    with open(files["ids"], "ab") as file:
+        meta["ids_bytes"] += file.write("".join(article_id + "\n" for article_id, _, _ in rows).encode("utf-8"))
+    meta["rows"] += len(rows)
+    meta["documents"] += len(rows)
+    meta["nnz"] = nnz
+
+
+def _truncate(files, meta):
+    """Drops what an interrupted update wrote past the sizes recorded in meta."""
+    itemsize = array(INDEX_TYPECODE).itemsize
+    sizes = {
+        "ids": meta["ids_bytes"], "terms": meta["terms_bytes"], "indptr": (meta["rows"] + 1) * itemsize,
+        "indices": meta["nnz"] * itemsize, "data": meta["nnz"] * array(WEIGHT_TYPECODE).itemsize,
+        "alive": meta["rows"],
+    }
+    for name, size in sizes.items():
+        os.truncate(files[name], size)
+
+
+def _read_lines(path, offset, count):
+    with open(path, "rb") as file:
+        file.seek(offset)
+        lines = []
+        for _ in range(count):
+            lines.append(file.readline().decode("utf-8").rstrip("\n"))
+    return lines
+
+
+def _read_array(path, typecode, count):
+    values = array(typecode)
+    with open(path, "rb") as file:
+        values.fromfile(file, count)
+    return values
+
+
+def _write_array(path, values):
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        values.tofile(file)
+    os.replace(temporary, path)
+
+
+def _append_array(path, values):
+    with open(path, "ab") as file:
+        values.tofile(file)
+
+
+def _map_array(path, typecode, count):
+    """Maps the first count values of a file in memory, as a NumPy array when installed."""
+    if numpy is not None:
+        dtype = numpy.dtype(typecode)
+        if count == 0:
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+    if count == 0:
+        return array(typecode)
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), count * array(typecode).itemsize, access=mmap.ACCESS_READ)
+    return memoryview(mapping).cast(typecode)
+
+
+# Index of the process, see SimilarIndex.init_app
+similar_index = SimilarIndex()
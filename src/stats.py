@@ -0,0 +1,173 @@
+# stats.py
+from sqlalchemy import event, func, select, text
+from src.models import db, Author, AuthorStats, Category, CategoryStats, MonthStats
+
+# Number of authors listed by /stats unless the request asks for another number
+STATS_TOP_AUTHORS = 10
+
+# Maximum number of authors listed by /stats, larger numbers are lowered to it
+STATS_MAX_TOP_AUTHORS = 100
+
+# Month of an article as stored in stats_month, "" when it has no publication date
+MONTH_SQL = "coalesce(strftime('%Y-%m', {row}.published_date), '')"
+
+
+def _increment(table, key_column, key):
+    return (
+        f"INSERT INTO {table} ({key_column}, articles) VALUES ({key}, 1) "
+        f"ON CONFLICT ({key_column}) DO UPDATE SET articles = articles + 1; "
+    )
+
+
+def _decrement(table, key_column, key):
+    # Rows reaching 0 are deleted, so the tables only hold what exists
+    return (
+        f"UPDATE {table} SET articles = articles - 1 WHERE {key_column} = {key}; "
+        f"DELETE FROM {table} WHERE {key_column} = {key} AND articles <= 0; "
+    )
+
+
+# Triggers keeping the stats tables up to date. Like the full-text index, they see every
+# write path, bulk Core statements included, so /stats never scans the article table.
+# Deleting an article also deletes its category and author associations, as the ON
+# DELETE CASCADE of their foreign keys would if SQLite enforced them.
+STATS_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS stats_article_insert AFTER INSERT ON article BEGIN "
+    + _increment("stats_month", "month", MONTH_SQL.format(row="new"))
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS stats_article_delete AFTER DELETE ON article BEGIN "
+    + _decrement("stats_month", "month", MONTH_SQL.format(row="old"))
+    + "DELETE FROM article_category WHERE article_id = old.id; "
+    "DELETE FROM article_author WHERE article_id = old.id; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS stats_article_update AFTER UPDATE OF published_date ON article "
+    f"WHEN {MONTH_SQL.format(row='old')} != {MONTH_SQL.format(row='new')} BEGIN "
+    + _decrement("stats_month", "month", MONTH_SQL.format(row="old"))
+    + _increment("stats_month", "month", MONTH_SQL.format(row="new"))
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS stats_category_insert AFTER INSERT ON article_category BEGIN "
+    + _increment("stats_category", "category_id", "new.category_id")
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS stats_category_delete AFTER DELETE ON article_category BEGIN "
+    + _decrement("stats_category", "category_id", "old.category_id")
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS stats_author_insert AFTER INSERT ON article_author BEGIN "
+    + _increment("stats_author", "author_id", "new.author_id")
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS stats_author_delete AFTER DELETE ON article_author BEGIN "
+    + _decrement("stats_author", "author_id", "old.author_id")
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS stats_author_update AFTER UPDATE OF author_id ON article_author "
+    "WHEN old.author_id != new.author_id BEGIN "
+    + _decrement("stats_author", "author_id", "old.author_id")
+    + _increment("stats_author", "author_id", "new.author_id")
+    + "END",
+)
+
+# Full recount of each stats table from the tables of the articles, as (key, articles) rows
+STATS_RECOUNTS = {
+    "stats_month": (
+        f"SELECT {MONTH_SQL.format(row='article')}, count(*) FROM article GROUP BY 1"
+    ),
+    "stats_category": (
+        "SELECT category_id, count(*) FROM article_category "
+        "WHERE article_id IN (SELECT id FROM article) GROUP BY category_id"
+    ),
+    "stats_author": (
+        "SELECT author_id, count(*) FROM article_author "
+        "WHERE article_id IN (SELECT id FROM article) GROUP BY author_id"
+    ),
+}
+
+# Key column of each stats table
+STATS_KEYS = {"stats_month": "month", "stats_category": "category_id", "stats_author": "author_id"}
+
+
+def create_stats(connection):
+    """Creates the triggers of the stats tables if needed, counting the existing articles."""
+    if connection.dialect.name != "sqlite":
+        return
+
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'stats_article_insert'"
+    ).first()
+    for statement in STATS_DDL:
+        connection.exec_driver_sql(statement)
+
+    if not exists:
+        # Associations of articles deleted before the triggers existed
+        connection.exec_driver_sql("DELETE FROM article_category WHERE article_id NOT IN (SELECT id FROM article)")
+        connection.exec_driver_sql("DELETE FROM article_author WHERE article_id NOT IN (SELECT id FROM article)")
+        rebuild_stats(connection)
+
+
+def rebuild_stats(connection):
+    """Recounts the stats tables from the article, article_category and article_author tables."""
+    for table, recount in STATS_RECOUNTS.items():
+        connection.exec_driver_sql(f"DELETE FROM {table}")
+        connection.exec_driver_sql(f"INSERT INTO {table} ({STATS_KEYS[table]}, articles) {recount}")
+
+
+def check_stats(connection):
+    """
+    Compares the stats tables with a full recount.
+
+    Returns:
+        dict: The differences of each stats table, as [key, stored count, actual count]
+            lists, a missing row counting 0. Empty lists when the tables are consistent.
+    """
+    differences = {}
+    for table, recount in STATS_RECOUNTS.items():
+        stored = dict(connection.exec_driver_sql(f"SELECT {STATS_KEYS[table]}, articles FROM {table}").all())
+        counted = dict(connection.exec_driver_sql(recount).all())
+        differences[table] = [
+            [key, stored.get(key, 0), counted.get(key, 0)]
+            for key in sorted(stored.keys() | counted.keys(), key=str)
+            if stored.get(key, 0) != counted.get(key, 0)
+        ]
+    return differences
+
+
+def read_stats(session, top_authors=STATS_TOP_AUTHORS):
+    """
+    Reads the article counts per month, per category and of the top authors from the stats tables.
+
+    Args:
+        session (Session): The session to read with.
+        top_authors (int): The number of authors listed, those with the most articles.
+
+    Returns:
+        dict: The totals, and the counts per month, per category and per top author.
+    """
+    months = session.execute(select(MonthStats.month, MonthStats.articles).order_by(MonthStats.month)).all()
+    categories = session.execute(
+        select(Category.term, CategoryStats.articles)
+        .join(Category, Category.id == CategoryStats.category_id)
+        .order_by(CategoryStats.articles.desc(), Category.term)
+    ).all()
+    # Walks the index of stats_author.articles backwards, reading top_authors rows
+    authors = session.execute(
+        select(Author.name, AuthorStats.articles)
+        .join(Author, Author.id == AuthorStats.author_id)
+        .order_by(AuthorStats.articles.desc(), AuthorStats.author_id.desc())
+        .limit(top_authors)
+    ).all()
+    page_size = session.execute(text("PRAGMA page_size")).scalar()
+    page_count = session.execute(text("PRAGMA page_count")).scalar()
+
+    return {
+        "total": {
+            "articles": sum(articles for _, articles in months),
+            "authors": session.scalar(select(func.count()).select_from(AuthorStats)),
+            "categories": len(categories),
+            "database_bytes": page_size * page_count,
+        },
+        "per_month": [{"month": month or None, "articles": articles} for month, articles in months],
+        "per_category": [{"category": term, "articles": articles} for term, articles in categories],
+        "top_authors": [{"name": name, "articles": articles} for name, articles in authors],
+    }
+
+
+@event.listens_for(db.metadata, "after_create")
+def _create_stats(target, connection, **kw):
+    create_stats(connection)
@@ -0,0 +1,165 @@
+# storage.py
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.models import db
+
+# Milliseconds a connection waits for the lock held by another process before failing
+SQLITE_BUSY_TIMEOUT_MS = 30000
+
+# Settings of every SQLite connection, the busy timeout first so the others wait for locks
+SQLITE_PRAGMAS = (
+    f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}",
+    # Readers keep reading the last committed state while a write is in progress
+    "PRAGMA journal_mode = WAL",
+    # Safe with WAL: a power loss may lose the last commits, never corrupt the file
+    "PRAGMA synchronous = NORMAL",
+    # 20 MB page cache per connection, temporary indexes of sorts in memory
+    "PRAGMA cache_size = -20000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Maximum number of writes committed by a single transaction of the writer
+WRITE_GROUP_SIZE = 64
+
+
+@event.listens_for(Engine, "connect")
+def configure_sqlite(dbapi_connection, connection_record):
+    """Applies SQLITE_PRAGMAS to each new SQLite connection."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+class Writer:
+    """
+    Runs the database writes of the process one after the other on a dedicated thread.
+
+    A write is a function using db.session, submitted with run() or submit(). The writer
+    takes every write queued while it was busy, up to group_size, runs them in a single
+    BEGIN IMMEDIATE transaction and commits them together (group commit), so the cost
+    of a commit is shared and writers of the process never compete for the SQLite lock.
+    When a write of a group raises, the group is rolled back and its writes are run
+    again one transaction each, so only the failing write fails.
+
+    Writes run in an app context of their own: the functions must not commit, and must
+    not rely on objects of the caller's session. The thread starts on the first write,
+    so each gunicorn worker gets its own writer; they wait for each other on the busy
+    timeout.
+
+    Args:
+        group_size (int): The maximum number of writes committed together.
+    """
+
+    def __init__(self, group_size=WRITE_GROUP_SIZE):
+        self.group_size = group_size
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.commits = 0
+        self.retried_groups = 0
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Queues a write and returns at once.
+
+        Returns:
+            Future: Resolved with the return value of the function once it is committed,
+                or with the exception it raised.
+        """
+        future = Future()
+        if self._thread is not None and threading.get_ident() == self._thread.ident:
+            # A write submitting another write: it joins the running transaction
+            future.set_result(function(*args, **kwargs))
+            return future
+
+        self._start()
+        self._queue.put((current_app._get_current_object(), future, function, args, kwargs))
+        return future
+
+    def run(self, function, *args, **kwargs):
+        """
+        Runs a write, waiting until it is committed, and returns the value of the function.
+
+        The caller's session is expired afterwards, so it reads what was just written.
+        """
+        result = self.submit(function, *args, **kwargs).result()
+        if has_app_context() and threading.get_ident() != self._thread.ident:
+            db.session.expire_all()
+        return result
+
+    def stats(self):
+        """Returns the counters of the writer."""
+        return {
+            "writes": self.writes,
+            "commits": self.commits,
+            "writes_per_commit": self.writes / self.commits if self.commits else 0.0,
+            "retried_groups": self.retried_groups,
+            "queued": self._queue.qsize(),
+        }
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def _loop(self):
+        carried = None
+        while True:
+            first = carried if carried is not None else self._queue.get()
+            carried = None
+            group = [first]
+            # Group commit: everything queued meanwhile for the same app joins the transaction
+            while len(group) < self.group_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[0] is not first[0]:
+                    carried = item
+                    break
+                group.append(item)
+
+            with first[0].app_context():
+                if not self._commit(group) and len(group) > 1:
+                    self.retried_groups += 1
+                    for item in group:
+                        self._commit([item])
+                db.session.remove()
+
+    def _commit(self, group):
+        """Runs writes in one transaction. Returns False, and resolves nothing, when one raised."""
+        results = []
+        try:
+            db.session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            for _, future, function, args, kwargs in group:
+                results.append(function(*args, **kwargs))
+            db.session.commit()
+        except BaseException as e:
+            db.session.rollback()
+            if len(group) > 1:
+                return False
+            group[0][1].set_exception(e)
+            return True
+
+        self.writes += len(group)
+        self.commits += 1
+        for (_, future, _, _, _), result in zip(group, results):
+            future.set_result(result)
+        return True
+
+
+# Writer of the process, used by every write path of the app
+writer = Writer()
@@ -0,0 +1,150 @@
+# summaries.py
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select, update
+from src import utils
+from src.cache import SingleFlight, unknown_articles
+from src.models import db, Article, CachedSummary
+from src.storage import writer
+
+# Maximum number of summaries kept by the summary cache
+SUMMARY_CACHE_SIZE = 10000
+
+# Time a cached summary is served before being fetched again
+SUMMARY_CACHE_TTL = timedelta(days=1)
+
+# Minimum time between two updates of the last access time of an entry, so that
+# frequently read entries do not cost a write on every read
+SUMMARY_CACHE_TOUCH_INTERVAL = timedelta(minutes=1)
+
+# Answer of fetch_summary_by_id when arXiv does not know the article
+SUMMARY_NOT_AVAILABLE = "Summary not available"
+
+
+class SummaryCache:
+    """
+    Bounded cache of article summaries, kept in the summary_cache table.
+
+    It holds the summaries fetched from arXiv for articles that are not stored, so they
+    survive restarts and are shared by every worker. Entries expire after `ttl` and the
+    least recently used ones are evicted beyond `max_entries`.
+
+    Args:
+        max_entries (int): The maximum number of cached summaries.
+        ttl (timedelta): The time a summary is served after being fetched.
+        touch_interval (timedelta): The precision of the last access times.
+    """
+
+    def __init__(self, max_entries=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL,
+                 touch_interval=SUMMARY_CACHE_TOUCH_INTERVAL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self.database_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.evictions = 0
+
+    def get(self, article_id):
+        """Returns the fresh cached summary of an article, or None."""
+        now = datetime.utcnow()
+        entry = db.session.get(CachedSummary, article_id)
+        if entry is None or entry.fetched_at <= now - self.ttl:
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        if entry.accessed_at <= now - self.touch_interval:
+            # The reader does not wait for this write
+            writer.submit(_touch_summary, article_id, now)
+        return entry.summary
+
+    def set(self, article_id, summary):
+        """Stores a summary, evicting the least recently used entries beyond max_entries."""
+        self._count("evictions", writer.run(_store_summary, article_id, summary, self.max_entries))
+
+    def purge(self):
+        """Deletes every cached summary."""
+        writer.run(lambda: db.session.execute(delete(CachedSummary)))
+
+    def stats(self):
+        """Returns the counters of the cache."""
+        entries = db.session.scalar(select(func.count()).select_from(CachedSummary))
+        with self._lock:
+            lookups = self.database_hits + self.hits + self.misses
+            return {
+                "entries": entries,
+                "database_hits": self.database_hits,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.database_hits + self.hits) / lookups if lookups else 0.0,
+                "upstream_calls": self.upstream_calls,
+                "coalesced": summary_flight.coalesced,
+                "evictions": self.evictions,
+            }
+
+    def _count(self, counter, increment=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + increment)
+
+
+def _touch_summary(article_id, accessed_at):
+    db.session.execute(
+        update(CachedSummary).where(CachedSummary.article_id == article_id).values(accessed_at=accessed_at)
+    )
+
+
+def _store_summary(article_id, summary, max_entries):
+    """Stores a summary and returns the number of entries evicted to make room for it."""
+    now = datetime.utcnow()
+    db.session.merge(CachedSummary(article_id=article_id, summary=summary, fetched_at=now, accessed_at=now))
+
+    # Upstream calls are rate limited, so this runs at most once every few seconds
+    evicted = select(CachedSummary.article_id).order_by(CachedSummary.accessed_at.desc()).offset(max_entries)
+    return db.session.execute(delete(CachedSummary).where(CachedSummary.article_id.in_(evicted))).rowcount
+
+
+def load_summary(article_id):
+    """
+    Returns the summary of an article, calling arXiv only when it is neither stored nor cached.
+
+    The article table is read first, then the summary cache. Concurrent misses for the
+    same ID wait for a single arXiv call.
+
+    Args:
+        article_id (str): The ArXiv ID of the article.
+
+    Returns:
+        str: The summary, or SUMMARY_NOT_AVAILABLE when arXiv does not know the article.
+    """
+    summary = db.session.scalar(select(Article.summary).where(Article.id == article_id))
+    if summary is not None:
+        summary_cache._count("database_hits")
+        return summary
+
+    summary = summary_cache.get(article_id)
+    if summary is not None:
+        return summary
+    if unknown_articles.contains(article_id):
+        return SUMMARY_NOT_AVAILABLE
+
+    return summary_flight.do(article_id, _fetch_summary, article_id)
+
+
+def _fetch_summary(article_id):
+    """Fetches a summary from arXiv and caches it, run once per batch of concurrent misses."""
+    summary_cache._count("upstream_calls")
+    summary = utils.fetch_summary_by_id(article_id)
+    if summary != SUMMARY_NOT_AVAILABLE:
+        summary_cache.set(article_id, summary)
+    else:
+        unknown_articles.add(article_id)
+    return summary
+
+
+summary_cache = SummaryCache()
+
+# Concurrent misses of the summary cache, keyed by article ID
+summary_flight = SingleFlight()
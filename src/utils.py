@@ -1,11 +1,71 @@
 # utils.py
-import feedparser
-import requests
-from src.models import db, Article, Author
+import base64
+import json
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from src.cache import mark_articles_changed, unknown_articles
+from src.client import arxiv_client
+from src.engine import FETCH_CONCURRENCY, iter_in_order
+from src.instrumentation import metrics
+from src.models import (
+    db,
+    article_category,
+    author_key,
+    format_datetime,
+    normalize_author_name,
+    parse_datetime,
+    Article,
+    ArticleAuthor,
+    Author,
+    Category,
+    HarvestCursor,
+    SyncState,
+)
+from src.parser import iter_feed_entries
+from src.search import search_articles
+from src.storage import writer
 from flask import jsonify
 
-# ArXiv API URL
-ARXIV_API_FEED_URL = "http://export.arxiv.org/api/query"
+# Number of articles requested per page when harvesting large result sets
+ARXIV_PAGE_SIZE = 100
+
+# Number of article IDs sent in the id_list parameter of a single call
+ID_LIST_BATCH_SIZE = 100
+
+# Valid ArXiv identifiers, new style (2401.13999) or old style (hep-th/9901001), with an optional version
+ARXIV_ID_PATTERN = re.compile(r"^(\d{4}\.\d{4,5}|[a-z\-]+(\.[A-Z]{2})?/\d{7})(v\d+)?$")
+
+# Number of articles written per transaction while streaming a harvest
+COMMIT_INTERVAL = 100
+
+# Number of articles handled per set-based statement during bulk ingestion
+BULK_CHUNK_SIZE = 500
+
+# Article columns filled from the dictionaries built by get_arxiv_articles
+ARTICLE_FIELDS = (
+    "title",
+    "summary",
+    "published_date",
+    "updated_date",
+    "doi",
+    "comment",
+    "journal_reference",
+    "primary_category",
+)
+
+# Columns read by listings, which serialize rows rather than Article objects
+ARTICLE_COLUMNS = (Article.id,) + tuple(getattr(Article, field) for field in ARTICLE_FIELDS)
+
+# Maximum number of article IDs per SELECT ... IN when loading authors
+AUTHOR_LOOKUP_CHUNK_SIZE = 500
+
+# Maximum number of author keys per SELECT ... IN when resolving authors, below SQLite's
+# limit of 32766 bound parameters so a chunk of articles is usually one lookup
+AUTHOR_KEY_CHUNK_SIZE = 10000
 
 
 def article_to_dict(article):
@@ -14,25 +74,188 @@ def article_to_dict(article):
         "id": article.id,
         "title": article.title,
         "summary": article.summary,
-        "published_date": article.published_date,
-        "updated_date": article.updated_date,
+        "published_date": format_datetime(article.published_date),
+        "updated_date": format_datetime(article.updated_date),
         "doi": article.doi,
         "comment": article.comment,
         "journal_reference": article.journal_reference,
+        "primary_category": article.primary_category,
         "authors": [{"name": author.name} for author in article.authors],
     }
 
 
+def article_rows_to_dicts(rows):
+    """
+    Converts rows of ARTICLE_COLUMNS to the dictionaries returned by article_to_dict.
+
+    The authors of all the rows are read with one SELECT per 500 rows and no ORM object
+    is built, which makes serializing large pages several times faster.
+
+    Args:
+        rows (list): Rows with the ARTICLE_COLUMNS attributes, in the order of the output.
+
+    Returns:
+        list: The article dictionaries.
+    """
+    authors = defaultdict(list)
+    for article_ids in chunked([row.id for row in rows], AUTHOR_LOOKUP_CHUNK_SIZE):
+        author_rows = db.session.execute(
+            select(ArticleAuthor.article_id, Author.name)
+            .join(Author, Author.id == ArticleAuthor.author_id)
+            .where(ArticleAuthor.article_id.in_(article_ids))
+            .order_by(ArticleAuthor.article_id, ArticleAuthor.position)
+        )
+        for article_id, name in author_rows:
+            authors[article_id].append({"name": name})
+
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "summary": row.summary,
+            "published_date": format_datetime(row.published_date),
+            "updated_date": format_datetime(row.updated_date),
+            "doi": row.doi,
+            "comment": row.comment,
+            "journal_reference": row.journal_reference,
+            "primary_category": row.primary_category,
+            "authors": authors[row.id],
+        }
+        for row in rows
+    ]
+
+
+def build_articles_query(query="all", start_date=None, end_date=None, subcategory=None, author=None):
+    """
+    Builds the Article query of the listing filters.
+
+    Args:
+        query (str): Full-text search over title and summary, "all" for no search.
+        start_date (datetime): Keep articles published on or after this date.
+        end_date (datetime): Keep articles published on or before this day.
+        subcategory (str): Keep articles listed in this ArXiv category, e.g. "cs.AI".
+        author (str): Keep articles by this author, the name matched by author_key.
+
+    Returns:
+        Query: The filtered query, ordered by search rank when searching.
+    """
+    articles_query = Article.query
+
+    if query and query != "all":
+        # Full-text search over title and summary, best matches first
+        articles_query = search_articles(articles_query, query)
+    if start_date:
+        articles_query = articles_query.filter(Article.published_date >= start_date)
+    if end_date:
+        # The end day is included, up to its last second
+        articles_query = articles_query.filter(Article.published_date < end_date + timedelta(days=1))
+    if subcategory:
+        # Read the IDs of the category from the (category_id, article_id) index
+        category_articles = (
+            select(article_category.c.article_id)
+            .join(Category, Category.id == article_category.c.category_id)
+            .where(Category.term == subcategory)
+        )
+        articles_query = articles_query.filter(Article.id.in_(category_articles))
+    if author:
+        # Read the IDs of the author from the (author_id, article_id) index
+        author_articles = (
+            select(ArticleAuthor.article_id)
+            .join(Author, Author.id == ArticleAuthor.author_id)
+            .where(Author.key == author_key(author))
+        )
+        articles_query = articles_query.filter(Article.id.in_(author_articles))
+
+    return articles_query
+
+
+def keyset_page(articles_query, cursor=None, per_page=10):
+    """
+    Returns one page of articles ordered by (published_date, id), newest first, and the
+    cursor of the next page.
+
+    Unlike OFFSET, the position is a (published_date, id) pair compared against the
+    ix_article_published_date_id index, so every page costs the same however deep it is.
+    Articles without a published_date come last.
+
+    Args:
+        articles_query (Query): The filtered query, as built by build_articles_query.
+        cursor (str): The next_cursor of the previous page, None for the first page.
+        per_page (int): The number of articles per page, at least 1.
+
+    Returns:
+        tuple: The list of articles and the next cursor, None on the last page.
+
+    Raises:
+        ValueError: The cursor is not one returned by this function, or per_page is below 1.
+    """
+    if per_page < 1:
+        # The cursor of an empty page would point at the last article read, skipping it
+        raise ValueError("per_page must be at least 1")
+    position = None
+    if cursor:
+        published_date, article_id = decode_cursor(cursor)
+        position = (parse_datetime(published_date), article_id)
+    articles_query = articles_query.order_by(None)
+
+    articles = []
+    if position is None or position[0] is not None:
+        dated = articles_query.filter(Article.published_date.isnot(None))
+        if position is not None:
+            dated = dated.filter(tuple_(Article.published_date, Article.id) < position)
+        articles = (
+            dated.order_by(Article.published_date.desc(), Article.id.desc()).limit(per_page + 1).all()
+        )
+
+    if len(articles) <= per_page:
+        undated = articles_query.filter(Article.published_date.is_(None))
+        if position is not None and position[0] is None:
+            undated = undated.filter(Article.id < position[1])
+        articles += undated.order_by(Article.id.desc()).limit(per_page + 1 - len(articles)).all()
+
+    if len(articles) > per_page:
+        last = articles[per_page - 1]
+        # Full ISO 8601 date: dates differing in fractional seconds only must not compare equal
+        published_date = last.published_date.isoformat() if last.published_date is not None else None
+        return articles[:per_page], encode_cursor(published_date, last.id)
+    return articles, None
+
+
+def encode_cursor(published_date, article_id):
+    """Encodes a keyset position as an opaque URL-safe token."""
+    data = json.dumps([published_date, article_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Decodes a token built by encode_cursor, raising ValueError when it is not one."""
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        published_date, article_id = json.loads(data)
+        if not isinstance(article_id, str) or not isinstance(published_date, (str, type(None))):
+            raise TypeError(token)
+        parse_datetime(published_date)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+    return published_date, article_id
+
+
 def fetch_metadata_by_id(article_id):
-    """Fetches metadata from ArXiv API based on the provided article ID."""
-    url_id = ARXIV_API_FEED_URL + "?id_list=" + article_id
-    data = requests.get(url_id)
-    my_feed = feedparser.parse(data.text)
-    return my_feed
+    """Fetches the article dictionaries from ArXiv API based on the provided article ID."""
+    data = arxiv_client.get(params={"id_list": article_id})
+    return list(parse_arxiv_feed(data.content))
 
 
 def get_arxiv_articles(query="all", start=0, max_results=10, start_date=None, end_date=None):
     """Get ArXiv articles based on the search query and start date."""
+    feed_text = fetch_arxiv_feed(
+        query=query, start=start, max_results=max_results, start_date=start_date, end_date=end_date
+    )
+    return list(parse_arxiv_feed(feed_text))
+
+
+def fetch_arxiv_feed(query="all", start=0, max_results=10, start_date=None, end_date=None, sort_by="submittedDate"):
+    """Fetches one page of ArXiv search results, newest first by sort_by, and returns the raw Atom feed as bytes."""
     if not query or query.strip() == "":
         query = "all"
 
@@ -40,7 +263,7 @@ def get_arxiv_articles(query="all", start=0, max_results=10, start_date=None, en
         "search_query": query,
         "start": start,
         "max_results": max_results,
-        "sortBy": "submittedDate",
+        "sortBy": sort_by,
         "sortOrder": "descending",
     }
 
@@ -49,51 +272,118 @@ def get_arxiv_articles(query="all", start=0, max_results=10, start_date=None, en
     if end_date:
         params["end_date"] = end_date
 
-    response = requests.get(ARXIV_API_FEED_URL, params=params)
-    feed = feedparser.parse(response.text)
-    entries = feed.entries
+    response = arxiv_client.get(params=params)
+    return response.content
 
-    articles = []
-    for entry in entries:
-        article_id = entry.get("id", "").split("/")[-1]
-        summary = entry.get("summary", "")
-        published_date = entry.get("published", "")
-        updated_date = entry.get("updated", "")
-        doi = entry.get("arxiv_doi", "")
-        comment = entry.get("arxiv_comment", "")
-        journal_reference = entry.get("arxiv_journal_ref", "")
-
-        # Extract authors
-        authors = []
-        for author_entry in entry.get("authors", []):
-            author_name = author_entry.get("name", "")
-            authors.append({"name": author_name})
-
-        articles.append(
-            {
-                "id": article_id,
-                "title": entry.get("title", ""),
-                "summary": summary,
-                "published_date": published_date,
-                "updated_date": updated_date,
-                "doi": doi,
-                "comment": comment,
-                "journal_reference": journal_reference,
-                "authors": authors,
-            }
-        )
 
-    return articles
+def parse_arxiv_feed(feed_content):
+    """Yields an article dictionary for each entry of a raw ArXiv Atom feed."""
+    return metrics.timed_iter(iter_feed_entries(feed_content), "parse")
+
+
+def fetch_arxiv_feed_by_ids(article_ids):
+    """Fetches the ArXiv Atom feed describing all the given article IDs in one call."""
+    params = {
+        "id_list": ",".join(article_ids),
+        "max_results": len(article_ids),
+    }
+
+    response = arxiv_client.get(params=params)
+    return response.content
+
+
+def iter_articles_by_ids(article_ids, batch_size=ID_LIST_BATCH_SIZE, concurrency=FETCH_CONCURRENCY, on_page=None):
+    """
+    Fetches articles by ID, grouping up to batch_size IDs in each call to the ArXiv API.
+
+    Args:
+        article_ids (list): The ArXiv IDs to fetch, with or without a version suffix.
+        batch_size (int): The number of IDs sent per call.
+        concurrency (int): The maximum number of calls in flight.
+        on_page (callable): Called without arguments each time a response is received.
+
+    Yields:
+        dict: The article dictionary of each ID found, its "id" being the requested ID.
+    """
+    batches = list(chunked(article_ids, batch_size))
+    feeds = iter_in_order(fetch_arxiv_feed_by_ids, ({"article_ids": batch} for batch in batches), concurrency)
+
+    for batch, feed_content in zip(batches, feeds):
+        if on_page:
+            on_page()
+
+        requested = set(batch)
+        for article in parse_arxiv_feed(feed_content):
+            # ArXiv answers with versioned IDs, map them back to the requested ones
+            article_id = article["id"]
+            if article_id not in requested:
+                article_id = re.sub(r"v\d+$", "", article_id)
+            if article_id in requested:
+                yield {**article, "id": article_id}
+
+
+def iter_arxiv_entries(query="all", max_results=10, start=0, page_size=ARXIV_PAGE_SIZE,
+                       start_date=None, end_date=None, sort_by="submittedDate", concurrency=FETCH_CONCURRENCY,
+                       on_page=None):
+    """
+    Streams an ArXiv result set page by page.
+
+    Up to `concurrency` pages are fetched ahead while the current one is parsed and
+    consumed, and pages are always yielded in order, so memory use is bounded by
+    `concurrency` pages.
+
+    Args:
+        query (str): The search query.
+        max_results (int): The total number of results to fetch, counted from 0.
+        start (int): The position of the first result, used to resume a harvest.
+        page_size (int): The number of results requested per call.
+        sort_by (str): The ArXiv sort order, "submittedDate" or "lastUpdatedDate", newest first.
+        concurrency (int): The maximum number of calls in flight.
+        on_page (callable): Called without arguments each time a page is received.
+
+    Yields:
+        tuple: The position of the article in the result set and its dictionary.
+    """
+    calls = (
+        {
+            "query": query,
+            "start": position,
+            "max_results": min(page_size, max_results - position),
+            "start_date": start_date,
+            "end_date": end_date,
+            "sort_by": sort_by,
+        }
+        for position in range(start, max_results, page_size)
+    )
+    feeds = iter_in_order(fetch_arxiv_feed, calls, concurrency)
+
+    try:
+        position = start
+        for feed_content in feeds:
+            if on_page:
+                on_page()
+            size = min(page_size, max_results - position)
+
+            received = 0
+            for article in parse_arxiv_feed(feed_content):
+                yield position + received, article
+                received += 1
+
+            # A short page means the result set is exhausted
+            if received < size:
+                return
+            position += received
+    finally:
+        feeds.close()
 
 
 def fetch_summary_by_id(article_id):
     """Fetches the summary of the specified article from ArXiv API."""
-    url_id = ARXIV_API_FEED_URL + "?id_list=" + str(article_id)
-    data = requests.get(url_id)
-    my_feed = feedparser.parse(data.text)
+    data = arxiv_client.get(params={"id_list": str(article_id)})
+    entry = next(parse_arxiv_feed(data.content), None)
 
-    if "entries" in my_feed and my_feed["entries"]:
-        return my_feed["entries"][0]["summary"]
+    if entry:
+        return entry["summary"]
     else:
         return "Summary not available"
 
@@ -103,42 +393,59 @@ def populate_single_article(article_id):
     existing_article = db.session.get(Article, article_id)
 
     if existing_article is None:
+        if unknown_articles.contains(article_id):
+            return jsonify({"error": "Article not found in arXiv"}), 404
+
         # Fetch article details from arXiv API
-        url_id = ARXIV_API_FEED_URL + "?id_list=" + article_id
-        data = requests.get(url_id)
-        my_feed = feedparser.parse(data.text)
-
-        if "entries" in my_feed and my_feed["entries"]:
-            entry = my_feed["entries"][0]
-
-            new_article = Article(
-                id=article_id,
-                title=entry.get("title", ""),
-                summary=entry.get("summary", ""),
-                published_date=entry.get("published", ""),
-                updated_date=entry.get("updated", ""),
-                doi=entry.get("arxiv_doi", ""),
-                comment=entry.get("arxiv_comment", ""),
-                journal_reference=entry.get("arxiv_journal_ref", ""),
-            )
-
-            # Add authors to the new article
-            for author_entry in entry.get("authors", []):
-                author = Author(name=author_entry.get("name", ""), article=new_article)
-                db.session.add(author)
+        data = arxiv_client.get(params={"id_list": article_id})
+        entry = next(parse_arxiv_feed(data.content), None)
 
+        if entry:
             # Add the new article to the database
-            db.session.add(new_article)
-            db.session.commit()
+            try:
+                writer.run(store_article, article_id, entry)
+            except IntegrityError:
+                # Stored meanwhile by another worker
+                if db.session.get(Article, article_id) is None:
+                    raise
+                return jsonify({"error": "Article already exists in the database"}), 400
 
             return jsonify({"message": "Article added to the database successfully"})
         else:
+            unknown_articles.add(article_id)
             return jsonify({"error": "Article not found in arXiv"}), 404
     else:
         return jsonify({"error": "Article already exists in the database"}), 400
 
 
-def populate_articles_by_query(query, max_results, start_date=None, end_date=None):
+def store_article(article_id, entry):
+    """
+    Adds an article dictionary to the session under article_id, with its categories and authors.
+
+    Runs on the writer, see src.storage.
+
+    Raises:
+        IntegrityError: The article is already stored, raised by the commit.
+    """
+    db.session.add(
+        Article(
+            id=article_id,
+            title=entry.get("title", ""),
+            summary=entry.get("summary", ""),
+            published_date=entry.get("published_date", ""),
+            updated_date=entry.get("updated_date", ""),
+            doi=entry.get("doi", ""),
+            comment=entry.get("comment", ""),
+            journal_reference=entry.get("journal_reference", ""),
+            primary_category=entry.get("primary_category", ""),
+            categories=load_categories(entry.get("categories", [])),
+            authors=load_authors(author.get("name", "") for author in entry.get("authors", [])),
+        )
+    )
+    mark_articles_changed(db.session, [article_id])
+
+
+def populate_articles_by_query(query, max_results, start_date=None, end_date=None, **options):
     """
     Populates the database with articles based on the provided query, max_results, start_date, and end_date.
 
@@ -147,35 +454,516 @@ def populate_articles_by_query(query, max_results, start_date=None, end_date=Non
         max_results (int): The maximum number of results to fetch.
         start_date (str): The start date for filtering articles (format: "YYYY-MM-DD").
         end_date (str): The end date for filtering articles (format: "YYYY-MM-DD").
+        **options: Tuning options passed to harvest_articles_by_query.
 
     Returns:
         dict: A JSON response indicating the status of the operation.
     """
-    articles = get_arxiv_articles(query=query, max_results=max_results, start_date=start_date, end_date=end_date)
+    counts = harvest_articles_by_query(query, max_results, start_date=start_date, end_date=end_date, **options)
+    return jsonify({"message": "Articles added to the database successfully", **counts})
+
+
+def harvest_articles_by_query(query, max_results, start_date=None, end_date=None, chunk_size=BULK_CHUNK_SIZE,
+                              page_size=ARXIV_PAGE_SIZE, commit_interval=COMMIT_INTERVAL,
+                              concurrency=FETCH_CONCURRENCY, progress=None):
+    """
+    Streams the articles matching a query from the ArXiv API into the database.
+
+    Articles flow from the ArXiv API through the parser to the database: the result set
+    is fetched in pages of page_size articles and committed every commit_interval articles
+    together with a cursor in the harvest_cursor table, so memory use stays bounded and an
+    interrupted harvest with the same parameters resumes after the last committed batch.
+
+    Args:
+        query (str): The search query.
+        max_results (int): The maximum number of results to fetch.
+        start_date (str): The start date for filtering articles (format: "YYYY-MM-DD").
+        end_date (str): The end date for filtering articles (format: "YYYY-MM-DD").
+        chunk_size (int): The number of articles written per bulk statement.
+        page_size (int): The number of articles requested per call to the ArXiv API.
+        commit_interval (int): The number of articles written per transaction.
+        concurrency (int): The maximum number of calls to the ArXiv API in flight.
+        progress (callable): Called with the running counts after each commit.
+
+    Returns:
+        dict: The number of pages fetched and of inserted, updated and skipped articles.
+    """
+    key = harvest_key(query, max_results, start_date, end_date)
+    cursor = db.session.get(HarvestCursor, key)
+
+    counts = {"pages": 0, "inserted": 0, "updated": 0, "skipped": 0}
+    entries = iter_arxiv_entries(
+        query=query,
+        max_results=max_results,
+        start=cursor.next_start if cursor is not None else 0,
+        page_size=page_size,
+        start_date=start_date,
+        end_date=end_date,
+        concurrency=concurrency,
+        on_page=lambda: _increment(counts, "pages"),
+    )
+
+    for batch_counts in persist_articles(entries, key, commit_interval, chunk_size):
+        for name, value in batch_counts.items():
+            counts[name] += value
+        if progress:
+            progress(counts)
+
+    # The harvest is complete, the next call starts from the beginning again
+    writer.run(_delete_harvest_cursor, key)
+
+    return counts
+
+
+def sync_articles_by_query(query, max_results, chunk_size=BULK_CHUNK_SIZE, page_size=ARXIV_PAGE_SIZE,
+                           commit_interval=COMMIT_INTERVAL, concurrency=FETCH_CONCURRENCY, progress=None):
+    """
+    Fetches the articles of a query that were published or revised since its last sync.
 
-    for entry in articles:
-        article_id = entry["id"]
-        existing_article = db.session.get(Article, article_id)
+    Results are read most recently updated first, a new article counting as updated when
+    it is published, and paging stops at the first article older than the newest
+    updated_date recorded in the sync_state table by the previous sync. New articles are
+    inserted and stored articles whose updated_date changed are rewritten.
 
-        if existing_article is None:
-            new_article = Article(
-                id=article_id,
-                title=entry["title"],
-                summary=entry["summary"],
-                published_date=entry["published_date"],
-                updated_date=entry["updated_date"],
-                doi=entry["doi"],
-                comment=entry["comment"],
-                journal_reference=entry["journal_reference"],
-            )
+    A call reads at most max_results articles. The recorded dates only move once the
+    sync has read down to the articles known from the previous one, or to the end of the
+    results; until then the position reached is recorded and the next call resumes from
+    it. An interrupted call is simply done again by the next one.
+
+    Args:
+        query (str): The search query.
+        max_results (int): The maximum number of results to fetch per call.
+        chunk_size (int): The number of articles written per bulk statement.
+        page_size (int): The number of articles requested per call to the ArXiv API.
+        commit_interval (int): The number of articles written per transaction.
+        concurrency (int): The maximum number of calls to the ArXiv API in flight during a first sync.
+        progress (callable): Called with the running counts after each commit.
+
+    Returns:
+        dict: The number of pages fetched and of inserted, updated and skipped articles.
+    """
+    state = db.session.get(SyncState, query)
+    known_until = state.newest_updated_date if state is not None else None
+    start = 0
+    newest = {"published": state.newest_published_date if state is not None else None, "updated": known_until}
+    if state is not None and state.resume_start is not None:
+        # Articles revised since the previous call moved above the resume position, they
+        # are newer than the resume dates and read by the next sync
+        start = state.resume_start
+        newest = {"published": state.resume_published_date, "updated": state.resume_updated_date}
+
+    counts = {"pages": 0, "inserted": 0, "updated": 0, "skipped": 0}
+    reached = {"known": False, "position": start}
+    entries = iter_arxiv_entries(
+        query=query,
+        max_results=start + max_results,
+        start=start,
+        page_size=page_size,
+        sort_by="lastUpdatedDate",
+        # A delta usually ends within the first page, fetching ahead would be wasted
+        concurrency=1 if known_until is not None else concurrency,
+        on_page=lambda: _increment(counts, "pages"),
+    )
+
+    def unseen_entries():
+        for position, article in entries:
+            updated = parse_datetime(article.get("updated_date"))
+            if known_until is not None and updated is not None and updated < known_until:
+                reached["known"] = True
+                return
+            reached["position"] = position + 1
+            published = parse_datetime(article.get("published_date"))
+            newest["updated"] = _latest(newest["updated"], updated)
+            newest["published"] = _latest(newest["published"], published)
+            yield position, article
+
+    try:
+        for batch_counts in persist_articles(unseen_entries(), None, commit_interval, chunk_size):
+            for name, value in batch_counts.items():
+                counts[name] += value
+            if progress:
+                progress(counts)
+    finally:
+        entries.close()
+
+    # Stopping at max_results leaves older unseen articles, a short read means the results ran out
+    complete = reached["known"] or reached["position"] < start + max_results
+    resume_start = None if complete else reached["position"]
+    writer.run(_save_sync_state, query, newest["published"], newest["updated"], resume_start)
+
+    return counts
+
+
+def persist_articles(entries, cursor_key=None, commit_interval=COMMIT_INTERVAL, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Writes a stream of (position, article) pairs to the database in bounded batches.
+
+    Every commit_interval articles are upserted and committed by the writer, together
+    with the harvest cursor when one is given, so they are queryable before the stream
+    is exhausted.
+
+    Args:
+        entries (iterable): (position, article dictionary) pairs, as yielded by iter_arxiv_entries.
+        cursor_key (str): The key of the harvest cursor moved past each committed batch.
+        commit_interval (int): The number of articles written per transaction.
+        chunk_size (int): The number of articles written per bulk statement.
+
+    Yields:
+        dict: The number of inserted, updated and skipped articles of each committed batch.
+    """
+    for batch in chunked(entries, commit_interval):
+        articles = [article for _, article in batch]
+        yield writer.run(_write_batch, articles, cursor_key, batch[-1][0] + 1, chunk_size)
+
+
+def _write_batch(articles, cursor_key, next_start, chunk_size):
+    """Upserts a batch of a harvest and moves its cursor, run on the writer."""
+    counts = bulk_upsert_articles(articles, chunk_size=chunk_size)
+    if cursor_key is not None:
+        db.session.merge(HarvestCursor(key=cursor_key, next_start=next_start))
+    return counts
+
+
+def _delete_harvest_cursor(key):
+    """Forgets the cursor of a completed harvest, run on the writer."""
+    db.session.execute(delete(HarvestCursor).where(HarvestCursor.key == key))
+
+
+def _save_sync_state(query, newest_published_date, newest_updated_date, resume_start=None):
+    """Records the dates reached by the sync of a query, or the position to resume it from, run on the writer."""
+    state = db.session.get(SyncState, query) or SyncState(query=query)
+    if resume_start is None:
+        state.newest_published_date = newest_published_date
+        state.newest_updated_date = newest_updated_date
+        state.resume_published_date = state.resume_updated_date = None
+    else:
+        state.resume_published_date = newest_published_date
+        state.resume_updated_date = newest_updated_date
+    state.resume_start = resume_start
+    state.synced_at = datetime.utcnow()
+    db.session.add(state)
+
+
+def populate_articles_by_ids(article_ids, **options):
+    """
+    Populates the database with a list of articles, fetching several IDs per call to the ArXiv API.
+
+    Args:
+        article_ids (list): The ArXiv IDs to add.
+        **options: Tuning options passed to harvest_articles_by_ids.
+
+    Returns:
+        dict: A JSON response with the counts of the operation and the IDs that were not found.
+    """
+    counts = harvest_articles_by_ids(article_ids, **options)
+    return jsonify({"message": "Articles added to the database successfully", **counts})
+
+
+def harvest_articles_by_ids(article_ids, batch_size=ID_LIST_BATCH_SIZE, chunk_size=BULK_CHUNK_SIZE,
+                            commit_interval=COMMIT_INTERVAL, concurrency=FETCH_CONCURRENCY, progress=None):
+    """
+    Fetches a list of articles from the ArXiv API into the database, up to batch_size IDs per call.
+
+    IDs that are malformed, already in the article table or recently found unknown to
+    arXiv are left out before any call to the ArXiv API is made. Articles are stored under the requested ID, like
+    populate_single_article does.
+
+    Args:
+        article_ids (list): The ArXiv IDs to add.
+        batch_size (int): The number of IDs sent per call to the ArXiv API.
+        chunk_size (int): The number of articles written per bulk statement.
+        commit_interval (int): The number of articles written per transaction.
+        concurrency (int): The maximum number of calls to the ArXiv API in flight.
+        progress (callable): Called with the running counts after each commit.
+
+    Returns:
+        dict: The number of pages fetched, of inserted, updated and skipped articles, and
+            the list of IDs that were not found.
+    """
+    requested = list(dict.fromkeys(article_ids))
+    invalid = [article_id for article_id in requested if not ARXIV_ID_PATTERN.match(article_id)]
+    candidates = [article_id for article_id in requested if ARXIV_ID_PATTERN.match(article_id)]
+
+    stored = set()
+    for chunk in chunked(candidates, chunk_size):
+        stored.update(db.session.scalars(select(Article.id).where(Article.id.in_(chunk))))
+    missing = []
+    unknown = []
+    for article_id in candidates:
+        if article_id not in stored:
+            (unknown if unknown_articles.contains(article_id) else missing).append(article_id)
+
+    counts = {"pages": 0, "inserted": 0, "updated": 0, "skipped": len(stored)}
+    found = set()
+
+    def entries():
+        articles = iter_articles_by_ids(
+            missing, batch_size, concurrency, on_page=lambda: _increment(counts, "pages")
+        )
+        for position, article in enumerate(articles):
+            found.add(article["id"])
+            yield position, article
+
+    for batch_counts in persist_articles(entries(), commit_interval=commit_interval, chunk_size=chunk_size):
+        for name, value in batch_counts.items():
+            counts[name] += value
+        if progress:
+            progress(counts)
+
+    not_found = [article_id for article_id in missing if article_id not in found]
+    for article_id in not_found:
+        unknown_articles.add(article_id)
+    return {**counts, "not_found": not_found + unknown + invalid}
+
+
+def _increment(counts, name):
+    """Adds one to a counter of the running counts of a harvest."""
+    counts[name] += 1
+
+
+def _latest(current, candidate):
+    """Returns the later of two datetimes, either of which may be None."""
+    if current is None or (candidate is not None and candidate > current):
+        return candidate
+    return current
+
+
+def harvest_key(query, max_results, start_date=None, end_date=None):
+    """Builds the key identifying a harvest in the harvest_cursor table."""
+    return f"{query}|{start_date or ''}|{end_date or ''}|{max_results}"
+
+
+def chunked(iterable, size):
+    """Yields successive lists of at most `size` items from the iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
-            # Add authors to the new article
-            for author_entry in entry.get("authors", []):
-                author = Author(name=author_entry.get("name", ""), article=new_article)
-                db.session.add(author)
 
-            db.session.add(new_article)
+def bulk_upsert_articles(entries, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Inserts or updates article dictionaries using set-based statements.
+
+    Each chunk costs one SELECT to find the IDs already stored, then executemany
+    INSERT/UPDATE statements for the articles and their authors. Stored articles
+    whose updated_date did not change are skipped. The caller commits.
+
+    Args:
+        entries (iterable): Article dictionaries as returned by get_arxiv_articles.
+        chunk_size (int): The number of entries handled per round of statements.
+
+    Returns:
+        dict: The number of inserted, updated and skipped articles.
+    """
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+
+    for chunk in chunked(entries, chunk_size):
+        # Keep the last occurrence of an ID appearing twice in the same chunk
+        by_id = {entry["id"]: entry for entry in chunk}
+        counts["skipped"] += len(chunk) - len(by_id)
+
+        existing = dict(
+            db.session.execute(
+                select(Article.id, Article.updated_date).where(Article.id.in_(by_id))
+            ).all()
+        )
+
+        new_entries = []
+        changed_entries = []
+        for article_id, entry in by_id.items():
+            if article_id not in existing:
+                new_entries.append(entry)
+            elif parse_datetime(entry.get("updated_date")) != existing[article_id]:
+                changed_entries.append(entry)
+            else:
+                counts["skipped"] += 1
+
+        if new_entries:
+            db.session.execute(insert(Article.__table__), [_article_row(entry) for entry in new_entries])
+        if changed_entries:
+            db.session.execute(update(Article), [_article_row(entry) for entry in changed_entries])
+            changed_ids = [entry["id"] for entry in changed_entries]
+            db.session.execute(delete(ArticleAuthor).where(ArticleAuthor.article_id.in_(changed_ids)))
+            db.session.execute(delete(article_category).where(article_category.c.article_id.in_(changed_ids)))
 
-    db.session.commit()
+        _insert_article_authors(new_entries + changed_entries)
+        _insert_article_categories(new_entries + changed_entries)
 
-    return jsonify({"message": "Articles added to the database successfully"})
+        counts["inserted"] += len(new_entries)
+        counts["updated"] += len(changed_entries)
+        mark_articles_changed(db.session, [entry["id"] for entry in new_entries + changed_entries])
+
+    return counts
+
+
+def backfill_categories(batch_size=BULK_CHUNK_SIZE, concurrency=FETCH_CONCURRENCY):
+    """
+    Fetches and stores the categories of the articles that have none, such as the articles
+    stored before categories were. Each batch of articles is committed.
+
+    Args:
+        batch_size (int): The number of articles looked up and committed at once.
+        concurrency (int): The maximum number of ArXiv API calls in flight.
+
+    Returns:
+        dict: The number of updated articles and of articles not found in arXiv.
+    """
+    counts = {"updated": 0, "not_found": 0}
+    last_id = ""
+
+    while True:
+        article_ids = db.session.scalars(
+            select(Article.id)
+            .where(Article.primary_category.is_(None), Article.id > last_id)
+            .order_by(Article.id)
+            .limit(batch_size)
+        ).all()
+        if not article_ids:
+            return counts
+        last_id = article_ids[-1]
+
+        entries = {entry["id"]: entry for entry in iter_articles_by_ids(article_ids, concurrency=concurrency)}
+        counts["not_found"] += len(article_ids) - len(entries)
+        if not entries:
+            continue
+
+        writer.run(_store_categories, entries)
+        counts["updated"] += len(entries)
+
+
+def _store_categories(entries):
+    """Stores the categories of articles by ID, run on the writer."""
+    db.session.execute(
+        update(Article),
+        [{"id": article_id, "primary_category": entry["primary_category"]} for article_id, entry in entries.items()],
+    )
+    _insert_article_categories(entries.values())
+    mark_articles_changed(db.session, list(entries))
+
+
+def category_ids(terms):
+    """
+    Returns the IDs of ArXiv category terms, creating the missing categories.
+
+    Args:
+        terms (iterable): The category terms, e.g. "cs.AI".
+
+    Returns:
+        dict: The category ID of each term.
+    """
+    terms = set(terms)
+    if not terms:
+        return {}
+
+    ids_by_term = dict(db.session.execute(select(Category.term, Category.id).where(Category.term.in_(terms))).all())
+    missing = terms - ids_by_term.keys()
+    if missing:
+        # Another worker may create the same categories meanwhile
+        db.session.execute(insert(Category.__table__).prefix_with("OR IGNORE"), [{"term": term} for term in missing])
+        ids_by_term.update(
+            db.session.execute(select(Category.term, Category.id).where(Category.term.in_(missing))).all()
+        )
+    return ids_by_term
+
+
+def load_categories(terms):
+    """Returns the Category objects of ArXiv category terms, creating the missing ones."""
+    ids = category_ids(terms)
+    if not ids:
+        return []
+    return db.session.scalars(select(Category).where(Category.id.in_(ids.values()))).all()
+
+
+def author_ids(names):
+    """
+    Returns the IDs of authors, creating the missing authors.
+
+    Names are resolved by author_key, so "Jane  Doe" and "jane doe" are one author. All
+    the names of a chunk of articles are resolved with one SELECT, plus one INSERT and
+    one SELECT when some authors are new.
+
+    Args:
+        names (iterable): The author names, as found in the feeds.
+
+    Returns:
+        dict: The author ID of the author_key of each name.
+    """
+    names_by_key = {}
+    for name in names:
+        names_by_key.setdefault(author_key(name), normalize_author_name(name))
+
+    ids_by_key = _author_ids_by_key(names_by_key)
+    missing = names_by_key.keys() - ids_by_key.keys()
+    if missing:
+        # Another worker may create the same authors meanwhile
+        db.session.execute(
+            insert(Author.__table__).prefix_with("OR IGNORE"),
+            [{"name": names_by_key[key], "key": key} for key in missing],
+        )
+        ids_by_key.update(_author_ids_by_key(missing))
+    return ids_by_key
+
+
+def load_authors(names):
+    """Returns the Author objects of author names in the same order, creating the missing ones."""
+    names = list(names)
+    ids_by_key = author_ids(names)
+    if not ids_by_key:
+        return []
+    authors = db.session.scalars(select(Author).where(Author.id.in_(ids_by_key.values()))).all()
+    authors_by_id = {author.id: author for author in authors}
+    return [authors_by_id[ids_by_key[author_key(name)]] for name in names]
+
+
+def _author_ids_by_key(keys):
+    """Reads the IDs of the authors stored under the given keys."""
+    ids_by_key = {}
+    for chunk in chunked(keys, AUTHOR_KEY_CHUNK_SIZE):
+        ids_by_key.update(db.session.execute(select(Author.key, Author.id).where(Author.key.in_(chunk))).all())
+    return ids_by_key
+
+
+def _insert_article_authors(entries):
+    """Links article dictionaries to their authors in order, creating the missing authors."""
+    names_by_id = {
+        entry["id"]: [author.get("name", "") for author in entry.get("authors", [])] for entry in entries
+    }
+    ids_by_key = author_ids(name for names in names_by_id.values() for name in names)
+    author_rows = [
+        {"article_id": article_id, "position": position, "author_id": ids_by_key[author_key(name)]}
+        for article_id, names in names_by_id.items()
+        for position, name in enumerate(names)
+    ]
+    if author_rows:
+        db.session.execute(insert(ArticleAuthor.__table__), author_rows)
+
+
+def _insert_article_categories(entries):
+    """Links article dictionaries to their categories, creating the missing categories."""
+    terms_by_id = {entry["id"]: _category_terms(entry) for entry in entries}
+    ids_by_term = category_ids(term for terms in terms_by_id.values() for term in terms)
+    category_rows = [
+        {"article_id": article_id, "category_id": ids_by_term[term]}
+        for article_id, terms in terms_by_id.items()
+        for term in terms
+    ]
+    if category_rows:
+        db.session.execute(insert(article_category).prefix_with("OR IGNORE"), category_rows)
+
+
+def _category_terms(entry):
+    """Returns the category terms of an article dictionary, the primary category first."""
+    terms = [entry["primary_category"]] if entry.get("primary_category") else []
+    terms.extend(term for term in entry.get("categories", []) if term not in terms)
+    return terms
+
+
+def _article_row(entry):
+    """Builds the column mapping of an article dictionary for bulk statements."""
+    row = {"id": entry["id"]}
+    for field in ARTICLE_FIELDS:
+        row[field] = entry.get(field, "")
+    return row
@@ -0,0 +1,11 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# The tests run against a throwaway database, never against the data/arxiv_articles.db of
+# the working directory: test modules import this package before src.app, which opens the
+# database when imported
+_database_dir = tempfile.mkdtemp(prefix="arxiv-tests-")
+atexit.register(shutil.rmtree, _database_dir, ignore_errors=True)
+os.environ["FLASK_SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(_database_dir, "arxiv_articles.db")
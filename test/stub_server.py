@@ -0,0 +1,58 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for the connections opened at once by load tests
+    request_queue_size = 128
+
+
+class StubArxivServer:
+    """
+    Local stand-in for the ArXiv API, running in a background thread.
+
+    Each call is answered by `responder(params)`, which returns a (status, body) pair.
+    The server records the parameters of every call and the client port it came from,
+    so tests can count calls and reused connections. It listens on a free port of
+    127.0.0.1 unless told otherwise.
+    """
+
+    def __init__(self, responder, host="127.0.0.1", port=0):
+        self.responder = responder
+        self.calls = []
+        self.client_ports = []
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                params = {name: values[0] for name, values in parse_qs(urlparse(self.path).query).items()}
+                with stub._lock:
+                    stub.calls.append(params)
+                    stub.client_ports.append(self.client_address[1])
+                status, body = stub.responder(params)
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/atom+xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = _Server((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}/api/query"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
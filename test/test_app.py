@@ -1,11 +1,25 @@
 import unittest
 import os
 import sys
+import gzip
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
 
 # Add the root directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
+from unittest.mock import patch
+from pathlib import Path
 from src.app import app, db
-from src.models import Article, Author
+from src.client import ArxivClient, RateLimiter
+from src.cache import response_cache, unknown_articles
+from src.leases import acquire_lease, lease
+from src.instrumentation import count_queries, metrics
+from src.models import Article, Author, HarvestCursor, Job, SyncState
+from test.stub_server import StubArxivServer
 
 
 class AppTestCase(unittest.TestCase):
@@ -23,6 +37,8 @@ class AppTestCase(unittest.TestCase):
         with app.app_context():
             db.session.remove()
             db.drop_all()
+        response_cache.clear()
+        unknown_articles.purge()
 
     # ACTUAL TESTS
 
@@ -77,15 +93,435 @@ class AppTestCase(unittest.TestCase):
         result = response.get_json()
         self.assertIn("article", result)
 
-    def test_auto_populate(self):
-        response = self.app.get("/auto_populate")
+    def test_upload_article_category(self):
+        self.app.post("/articles", json={"id": "uploaded", "title": "Uploaded", "primary_category": "cs.AI"})
+        self.app.post("/articles", json={"id": "other", "title": "Other", "primary_category": "math.CO"})
+
+        listed = self.app.get("/articles?subcategory=cs.AI").get_json()["articles"]
+        self.assertEqual([article["id"] for article in listed], ["uploaded"])
+        per_category = self.app.get("/stats").get_json()["per_category"]
+        self.assertIn({"category": "cs.AI", "articles": 1}, per_category)
+
+        # Uploading the article again moves it to its new category
+        self.app.post("/articles", json={"id": "uploaded", "title": "Uploaded", "primary_category": "math.CO"})
+        self.assertEqual(self.app.get("/articles?subcategory=cs.AI").get_json()["articles"], [])
+        per_category = self.app.get("/stats").get_json()["per_category"]
+        self.assertIn({"category": "math.CO", "articles": 2}, per_category)
+
+    def test_upload_article_invalid_date(self):
+        response = self.app.post("/articles", json={"id": "dated_article", "published_date": "27/01/2024"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("published_date", response.get_json()["error"])
+
+    def test_articles_response_cache(self):
+        article = {"id": "cached_article", "title": "Cached Article", "summary": "Summary"}
+        self.app.post("/articles", json=article)
+
+        hits = self.app.get("/cache/stats").get_json()["responses"]["hits"]
+        first = self.app.get("/articles?per_page=5")
+        second = self.app.get("/articles?per_page=5")
+        self.assertEqual(first.data, second.data)
+        self.assertIsNotNone(first.headers["ETag"])
+        self.assertEqual(self.app.get("/cache/stats").get_json()["responses"]["hits"], hits + 1)
+
+        # An unchanged page is answered with 304 Not Modified
+        not_modified = self.app.get("/articles?per_page=5", headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.data, b"")
+
+        # Writing an article invalidates the listings and that article only
+        self.app.get("/articles/cached_article")
+        self.app.post("/articles", json={"id": "other_article", "title": "Other Article"})
+        self.assertEqual(self.app.get("/cache/stats").get_json()["responses"]["entries"], 1)
+        changed = self.app.get("/articles?per_page=5", headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.get_json()["articles"]), 2)
+
+        self.app.post("/remove/cached_article")
+        with patch("src.app.get_arxiv_articles", return_value=[]):
+            self.assertEqual(self.app.get("/articles/cached_article").status_code, 404)
+
+    def test_response_cache_sees_writes_of_other_processes(self):
+        self.app.post("/articles", json={"id": "local_article", "title": "Local Article"})
+        first = self.app.get("/articles?per_page=5")
+        self.app.get("/articles/local_article")
+        self.assertEqual(self.app.get("/cache/stats").get_json()["responses"]["entries"], 2)
+
+        # Another gunicorn worker writes to the database, this process does not see the commit
+        with app.app_context():
+            connection = sqlite3.connect(db.engine.url.database)
+        with connection:
+            connection.execute("INSERT INTO article (id, title) VALUES ('remote_article', 'Remote Article')")
+            connection.execute("UPDATE article SET title = 'Renamed Article' WHERE id = 'local_article'")
+        connection.close()
+
+        changed = self.app.get("/articles?per_page=5", headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.get_json()["articles"]), 2)
+        self.assertEqual(self.app.get("/articles/local_article").get_json()["article"]["title"], "Renamed Article")
+
+    def test_articles_compact_pretty_and_compressed(self):
+        with app.app_context():
+            for i in range(20):
+                db.session.add(Article(id=f"wire_{i:02d}", title=f"Article {i}", summary="Summary " * 20))
+            db.session.commit()
+
+        compact = self.app.get("/articles?per_page=20")
+        self.assertNotIn(b"\n", compact.data)
+        pretty = self.app.get("/articles?per_page=20&pretty=1")
+        self.assertIn(b'\n  "articles": [', pretty.data)
+        self.assertEqual(compact.get_json(), pretty.get_json())
+
+        compressed = self.app.get("/articles?per_page=20", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", compressed.headers["Vary"])
+        self.assertEqual(gzip.decompress(compressed.data), compact.data)
+        self.assertNotEqual(compressed.headers["ETag"], compact.headers["ETag"])
+
+        not_modified = self.app.get(
+            "/articles?per_page=20", headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]}
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+        # Small bodies are sent as is
+        small = self.app.get("/cache/stats", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", small.headers)
+
+    def test_metrics_and_server_timing(self):
+        with app.app_context():
+            db.session.add(Article(id="timed_article", title="Timed Article"))
+            db.session.commit()
+
+        self.app.get("/articles")
+        with patch.object(metrics, "server_timing", True):
+            response = self.app.get("/articles/timed_article")
+        self.assertRegex(response.headers["Server-Timing"], r'^sql;dur=[\d.]+;desc="\d+ calls", .*total;dur=[\d.]+$')
+        self.assertNotIn("Server-Timing", self.app.get("/articles").headers)
+
+        response = self.app.get("/metrics")
+        self.assertEqual(response.mimetype, "text/plain")
+        text = response.get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/articles",status="200"}', text)
+        self.assertIn('route="/articles/<string:article_id>"', text)
+        self.assertIn('stage_duration_seconds_count{stage="sql"}', text)
+
+    def test_author_articles(self):
+        with app.app_context():
+            for i, name in enumerate(["Jane Doe", "JANE  DOE", "John Smith"]):
+                article = Article(id=f"authored_{i}", title=f"Article {i}", published_date=f"2024-01-0{i + 1}")
+                db.session.add(Author(name=name, article=article))
+                db.session.add(Author(name=f"Coauthor {i}", article=article))
+            db.session.commit()
+
+        response = self.app.get("/authors/jane doe/articles")
         self.assertEqual(response.status_code, 200)
-        # Add assertions based on the expected behavior of the auto_populate route
+        data = response.get_json()
+        self.assertEqual(data["author"], {"name": "Jane Doe"})
+        self.assertEqual(data["total"], 2)
+        self.assertEqual([article["id"] for article in data["articles"]], ["authored_1", "authored_0"])
+        self.assertEqual(data["articles"][0]["authors"], [{"name": "Jane Doe"}, {"name": "Coauthor 1"}])
+
+        self.assertEqual(self.app.get("/authors/Nobody/articles").status_code, 404)
+
+    def test_articles_query_count(self):
+        with app.app_context():
+            for i in range(100):
+                article = Article(id=f"article_{i:03d}", title=f"Article {i}")
+                db.session.add(Author(name=f"First Author {i}", article=article))
+                db.session.add(Author(name=f"Second Author {i}", article=article))
+            db.session.commit()
+
+            # The invalidations logged since the last lookup, then COUNT, page and authors of
+            # the page: no query per article
+            with count_queries(db.engine) as counter:
+                response = self.app.get("/articles?per_page=100")
+            self.assertEqual(len(response.get_json()["articles"]), 100)
+            self.assertEqual(response.get_json()["articles"][0]["authors"][1], {"name": "Second Author 0"})
+            self.assertLessEqual(counter.count, 5)
+
+            # The unchanged sequence number of the log, then the article
+            with count_queries(db.engine) as counter:
+                response = self.app.get("/articles/article_042")
+            self.assertEqual(len(response.get_json()["article"]["authors"]), 2)
+            self.assertEqual(counter.count, 2)
+
+            # The authors are found through the article ID, not by scanning every authorship
+            plan = db.session.connection().exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + counter.statements[-1], ("article_042",)
+            ).all()
+            self.assertFalse([step for step in plan if step[-1].startswith("SCAN")], plan)
+
+    def test_articles_cursor_pagination(self):
+        with app.app_context():
+            for i in range(25):
+                # Five articles share each date and three have none
+                published_date = f"2023-01-{i // 5 + 1:02d}T00:00:00Z" if i < 22 else None
+                db.session.add(Article(id=f"keyset_{i:02d}", title=f"Article {i}", published_date=published_date))
+            db.session.commit()
+
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            response = self.app.get(f"/articles?per_page=4&cursor={cursor}")
+            self.assertEqual(response.status_code, 200)
+            data = response.get_json()
+            self.assertNotIn("total", data)
+            self.assertLessEqual(len(data["articles"]), 4)
+            seen.extend(article["id"] for article in data["articles"])
+            cursor = data["next_cursor"]
+
+        # Every article once, newest first, the undated ones last
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(seen[:5], ["keyset_21", "keyset_20", "keyset_19", "keyset_18", "keyset_17"])
+        self.assertEqual(seen[-3:], ["keyset_24", "keyset_23", "keyset_22"])
+
+        response = self.app.get("/articles?per_page=4&cursor=&include_total=1")
+        self.assertEqual(response.get_json()["total"], 25)
+
+    def test_articles_cursor_pagination_fractional_seconds(self):
+        with app.app_context():
+            # Published within the same second: "b" is newer than "c" by a quarter of a second
+            for article_id, published_date in [("a", "2023-01-01T00:00:00.750000"), ("b", "2023-01-01T00:00:00.500000"),
+                                               ("c", "2023-01-01T00:00:00.250000"), ("d", "2023-01-01T00:00:00")]:
+                db.session.add(Article(id=article_id, title=article_id, published_date=published_date))
+            db.session.commit()
+
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            data = self.app.get(f"/articles?per_page=1&cursor={cursor}").get_json()
+            seen.extend(article["id"] for article in data["articles"])
+            cursor = data["next_cursor"]
+        self.assertEqual(seen, ["a", "b", "c", "d"])
+
+    def test_articles_same_day_range(self):
+        with app.app_context():
+            for article_id, published_date in [("before", "2024-01-24T23:59:59"), ("morning", "2024-01-25T07:57:41"),
+                                               ("midnight", "2024-01-26T00:00:00")]:
+                db.session.add(Article(id=article_id, title=article_id, published_date=published_date))
+            db.session.commit()
+
+        # Both days of the range are included, whatever the time of publication
+        data = self.app.get("/articles?start_date=2024-01-25&end_date=2024-01-25").get_json()
+        self.assertEqual([article["id"] for article in data["articles"]], ["morning"])
+        data = self.app.get("/export?start_date=2024-01-24&end_date=2024-01-25")
+        self.assertEqual(data.data.count(b'"id"'), 2)
+
+    def test_articles_invalid_cursor(self):
+        for cursor in ("not-a-cursor", "WzFd"):
+            response = self.app.get(f"/articles?cursor={cursor}")
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("Invalid cursor", response.get_json()["error"])
+
+    def test_articles_invalid_per_page(self):
+        self.app.post("/articles", json={"id": "paged_article", "title": "Paged Article"})
+        for query_string in ("per_page=0&cursor=", "per_page=-1&cursor=", "per_page=0"):
+            response = self.app.get(f"/articles?{query_string}")
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("per_page", response.get_json()["error"])
+
+    def test_concurrent_requests_fetch_article_once(self):
+        feed = (Path(__file__).parent / "test_data" / "2401.13999-arxiv.xml").read_bytes()
+
+        def slow_feed(params):
+            time.sleep(0.2)
+            return 200, feed
+
+        responses = []
+
+        def get_article():
+            responses.append(app.test_client().get("/articles/2401.13999"))
+
+        with StubArxivServer(slow_feed) as server:
+            client = ArxivClient(base_url=server.url, limiter=RateLimiter(0))
+            with patch("src.utils.arxiv_client", client):
+                threads = [threading.Thread(target=get_article) for _ in range(50)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            client.close()
+
+        self.assertEqual(len(server.calls), 1)
+        self.assertEqual([response.status_code for response in responses], [200] * 50)
+        self.assertEqual(len({response.get_json()["article"]["title"] for response in responses}), 1)
+        with app.app_context():
+            self.assertEqual(db.session.query(Article).count(), 1)
+            self.assertEqual(db.session.query(Author).count(), 2)
+
+    def test_article_fetched_by_a_stuck_worker(self):
+        with app.app_context():
+            acquire_lease("article:2401.13999", "stuck-worker")
+        with patch("src.app.lease", partial(lease, wait_timeout=0.05)), \
+                patch("src.app.get_arxiv_articles") as get_arxiv_articles:
+            response = self.app.get("/articles/2401.13999")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+        get_arxiv_articles.assert_not_called()
+
+    def test_unknown_article_is_remembered(self):
+        avoided_calls = unknown_articles.avoided_calls
+        with patch("src.app.get_arxiv_articles", return_value=[]) as get_arxiv_articles:
+            for _ in range(3):
+                self.assertEqual(self.app.get("/articles/2401.99999").status_code, 404)
+            self.assertEqual(get_arxiv_articles.call_count, 1)
+            stats = self.app.get("/cache/stats").get_json()["unknown_articles"]
+            self.assertEqual((stats["entries"], stats["avoided_upstream_calls"]), (1, avoided_calls + 2))
+
+            # Purged IDs are looked up again
+            self.app.post("/cache/unknown_articles/purge", json={"article_ids": ["2401.99999"]})
+            self.app.get("/articles/2401.99999")
+            self.assertEqual(get_arxiv_articles.call_count, 2)
+
+        # Storing the article forgets that it was unknown
+        self.app.post("/articles", json={"id": "2401.99999", "title": "Published at last"})
+        self.assertEqual(self.app.get("/cache/stats").get_json()["unknown_articles"]["entries"], 0)
+        self.assertEqual(self.app.get("/articles/2401.99999").status_code, 200)
+
+    def test_auto_populate(self):
+        counts = {"pages": 10, "inserted": 990, "updated": 0, "skipped": 10}
+        with patch("src.utils.sync_articles_by_query", return_value=counts) as harvest:
+            response = self.app.get("/auto_populate")
+            self.assertEqual(response.status_code, 202)
+
+            # The harvest runs in the background, its progress is reported by /jobs/<id>
+            job = self.wait_for_job(response.get_json()["job_id"])
+
+        harvest.assert_called_once()
+        self.assertEqual(harvest.call_args.kwargs["max_results"], 1000)
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(job["pages_fetched"], 10)
+        self.assertEqual(job["articles_inserted"], 990)
+
+    def test_auto_populate_returns_active_job(self):
+        release = threading.Event()
+
+        def blocked_sync(query, max_results, progress):
+            release.wait(5)
+            return {"pages": 1, "inserted": 0, "updated": 0, "skipped": 0}
+
+        with patch("src.utils.sync_articles_by_query", side_effect=blocked_sync) as harvest:
+            job_id = self.app.get("/auto_populate").get_json()["job_id"]
+            self.assertEqual(self.app.get("/auto_populate").get_json()["job_id"], job_id)
+            release.set()
+            self.assertEqual(self.wait_for_job(job_id)["status"], "succeeded")
+
+            # Once it is over, the next call starts a new sync
+            other_job_id = self.app.get("/auto_populate").get_json()["job_id"]
+            self.assertNotEqual(other_job_id, job_id)
+            self.wait_for_job(other_job_id)
+        self.assertEqual(harvest.call_count, 2)
+
+    def test_abandoned_jobs_are_queued_again(self):
+        # Jobs of a worker that stopped: one running, one still queued, and one still alive
+        now = datetime.utcnow()
+        with app.app_context():
+            db.session.add_all(
+                [
+                    Job(id="abandoned_running", kind="sync_query", params='{"max_results": 10, "query": "a"}',
+                        status="running", created_at=now - timedelta(hours=1), heartbeat_at=now - timedelta(hours=1)),
+                    Job(id="abandoned_queued", kind="sync_query", params='{"max_results": 10, "query": "b"}',
+                        status="queued", created_at=now - timedelta(hours=1)),
+                    Job(id="alive", kind="sync_query", params='{"max_results": 10, "query": "c"}',
+                        status="running", created_at=now - timedelta(hours=1), heartbeat_at=now),
+                ]
+            )
+            db.session.commit()
+
+        counts = {"pages": 1, "inserted": 1, "updated": 0, "skipped": 0}
+        with patch("src.utils.sync_articles_by_query", return_value=counts) as harvest:
+            # Polling a job takes over the abandoned ones
+            self.assertEqual(self.wait_for_job("abandoned_running")["status"], "succeeded")
+            self.assertEqual(self.wait_for_job("abandoned_queued")["status"], "succeeded")
+        self.assertEqual(sorted(call.kwargs["query"] for call in harvest.call_args_list), ["a", "b"])
+        self.assertEqual(self.app.get("/jobs/alive").get_json()["job"]["status"], "running")
+
+    def test_populate_articles_job_failure(self):
+        with patch("src.utils.harvest_articles_by_ids", side_effect=ConnectionError("arXiv is down")):
+            response = self.app.post("/populate_articles", json={"article_ids": ["2401.13999"]})
+            self.assertEqual(response.status_code, 202)
+            job = self.wait_for_job(response.get_json()["job_id"])
+
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("arXiv is down", job["error"])
+
+    def test_cancel_job(self):
+        started = threading.Event()
+
+        def slow_harvest(query, max_results, progress):
+            counts = {"pages": 0, "inserted": 0, "updated": 0, "skipped": 0}
+            for _ in range(500):
+                counts["pages"] += 1
+                started.set()
+                time.sleep(0.01)
+                progress(counts)
+            return counts
+
+        with patch("src.utils.harvest_articles_by_query", side_effect=slow_harvest):
+            response = self.app.post("/populate_articles", json={"query": "physics", "max_results": 50000})
+            job_id = response.get_json()["job_id"]
+            started.wait(5)
+
+            response = self.app.post(f"/jobs/{job_id}/cancel")
+            self.assertEqual(response.status_code, 200)
+            job = self.wait_for_job(job_id)
+
+        self.assertEqual(job["status"], "cancelled")
+        self.assertLess(job["pages_fetched"], 500)
+
+    def test_unknown_articles_purged_by_other_processes(self):
+        with patch("src.app.get_arxiv_articles", return_value=[]) as get_arxiv_articles:
+            for article_id in ("2401.99991", "2401.99992", "2401.99993"):
+                self.assertEqual(self.app.get(f"/articles/{article_id}").status_code, 404)
+            self.assertEqual(get_arxiv_articles.call_count, 3)
+
+            # The purge route logs the purge for the other workers
+            self.app.post("/cache/unknown_articles/purge", json={"article_ids": ["2401.99991"]})
+            with app.app_context():
+                connection = sqlite3.connect(db.engine.url.database)
+            tags = [tag for tag, in connection.execute("SELECT tag FROM cache_invalidation ORDER BY seq")]
+            self.assertEqual(tags[-1], "unknown_article:2401.99991")
+
+            # Another worker stores one of the IDs, then purges every ID
+            with connection:
+                connection.execute("INSERT INTO article (id, title) VALUES ('2401.99992', 'Published at last')")
+            with app.app_context():
+                self.assertFalse(unknown_articles.contains("2401.99992"))
+                self.assertTrue(unknown_articles.contains("2401.99993"))
+            with connection:
+                connection.execute("INSERT INTO cache_invalidation (tag) VALUES ('unknown_articles')")
+            connection.close()
+
+            self.assertEqual(self.app.get("/articles/2401.99993").status_code, 404)
+            self.assertEqual(get_arxiv_articles.call_count, 4)
+
+    def test_get_unknown_job(self):
+        response = self.app.get("/jobs/unknown")
+        self.assertEqual(response.status_code, 404)
+
+    def wait_for_job(self, job_id, timeout=10):
+        """Polls /jobs/<id> until the job is finished and returns its description."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.app.get(f"/jobs/{job_id}").get_json()["job"]
+            if job["status"] in ("succeeded", "failed", "cancelled") or time.monotonic() > deadline:
+                return job
+            time.sleep(0.02)
 
     def test_empty_database_post_confirmation_yes(self):
+        with app.app_context():
+            db.session.add(SyncState(query="emptied", newest_updated_date=datetime(2024, 3, 1)))
+            db.session.add(HarvestCursor(key="emptied", next_start=100))
+            db.session.commit()
+
         response = self.app.post("/empty_database", data={"confirmation": "yes"})
         self.assertEqual(response.status_code, 200)
-        # Add assertions based on the expected behavior after confirming deletion
+
+        # Syncs and harvests start over instead of skipping the deleted articles
+        with app.app_context():
+            self.assertIsNone(db.session.get(SyncState, "emptied"))
+            self.assertIsNone(db.session.get(HarvestCursor, "emptied"))
 
     def test_empty_database_post_confirmation_no(self):
         response = self.app.post("/empty_database", data={"confirmation": "no"})
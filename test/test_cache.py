@@ -0,0 +1,113 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from src.cache import BloomFilter, NegativeCache, ResponseCache
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+
+    def test_invalidated_body_is_not_cached(self):
+        cache = ResponseCache()
+        # A request misses, reads the database, then a write commits before it caches its body
+        self.assertIsNone(cache.get("page"))
+        cache.invalidate("articles")
+        entry = cache.set("page", b"stale", ["articles"])
+        self.assertEqual(entry.body, b"stale")
+        self.assertIsNone(cache.get("page"))
+        self.assertEqual(cache.stats()["stale_sets"], 1)
+
+        # Unrelated tags, and lookups made after the invalidation, are cached
+        self.assertIsNone(cache.get("article"))
+        cache.invalidate("article:other")
+        cache.set("article", b"fresh", ["article:one"])
+        self.assertIsNone(cache.get("page"))
+        cache.set("page", b"fresh", ["articles"])
+        self.assertEqual(cache.get("article").body, b"fresh")
+        self.assertEqual(cache.get("page").body, b"fresh")
+
+    def test_generation_of_another_thread(self):
+        cache = ResponseCache()
+        cache.get("page")
+        generation = 0
+        cache.invalidate("articles")
+        # set() from another thread, given the generation explicitly
+        thread = threading.Thread(target=cache.set, args=("page", b"stale", ["articles"], generation))
+        thread.start()
+        thread.join()
+        self.assertIsNone(cache.get("page"))
+
+    def test_cleared_cache_refuses_earlier_lookups(self):
+        cache = ResponseCache(generation_slots=1)
+        cache.get("article")
+        cache.clear()
+        cache.set("article", b"stale", ["article:one"])
+        self.assertIsNone(cache.get("article"))
+        # Tags sharing the slot of an invalidated tag are not cached until the next lookup
+        cache.invalidate("article:two")
+        cache.set("article", b"body", ["article:one"])
+        self.assertIsNone(cache.get("article"))
+        cache.set("article", b"body", ["article:one"])
+        self.assertEqual(cache.get("article").body, b"body")
+
+
+class BloomFilterTestCase(unittest.TestCase):
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter(capacity=1000, false_positive_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"2401.{i:05d}")
+
+        self.assertTrue(all(f"2401.{i:05d}" in bloom for i in range(1000)))
+        false_positives = sum(f"2402.{i:05d}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+        # About 9.6 bits per key for a 1% error rate
+        self.assertLess(len(bloom.bits), 1300)
+
+
+class NegativeCacheTestCase(unittest.TestCase):
+
+    def test_contains_counts_avoided_calls(self):
+        cache = NegativeCache()
+        cache.add("2401.99999")
+        self.assertTrue(cache.contains("2401.99999"))
+        self.assertFalse(cache.contains("2401.00001"))
+        self.assertEqual(cache.stats()["avoided_upstream_calls"], 1)
+
+    def test_entries_expire(self):
+        cache = NegativeCache(ttl=0.05)
+        cache.add("2401.99999")
+        time.sleep(0.06)
+        self.assertFalse(cache.contains("2401.99999"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_size_is_bounded(self):
+        cache = NegativeCache(max_entries=100)
+        for i in range(1000):
+            cache.add(f"2401.{i:05d}")
+
+        self.assertEqual(cache.stats()["entries"], 100)
+        self.assertTrue(cache.contains("2401.00999"))
+        self.assertFalse(cache.contains("2401.00000"))
+        # The filter was rebuilt from the live entries as old ones were evicted
+        self.assertGreater(cache.stats()["bloom_filter_rebuilds"], 0)
+
+    def test_discard_and_purge(self):
+        cache = NegativeCache()
+        cache.add("2401.99998")
+        cache.add("2401.99999")
+
+        cache.discard("2401.99999", "2401.00001")
+        self.assertFalse(cache.contains("2401.99999"))
+        self.assertTrue(cache.contains("2401.99998"))
+
+        cache.purge()
+        self.assertFalse(cache.contains("2401.99998"))
+
+
+if __name__ == "__main__":
+    unittest.main()
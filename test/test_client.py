@@ -0,0 +1,85 @@
+import unittest
+import os
+import sys
+import time
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import requests
+from pathlib import Path
+from src.client import ArxivClient, RateLimiter
+from test.stub_server import StubArxivServer
+
+FEED = (Path(__file__).parent / "test_data" / "2401.13999-arxiv.xml").read_bytes()
+
+
+def make_client(server, **kwargs):
+    """Builds a client calling the stub server without rate limiting nor real backoff."""
+    options = {"backoff_factor": 0.01, "backoff_jitter": 0.01, "limiter": RateLimiter(0)}
+    options.update(kwargs)
+    return ArxivClient(base_url=server.url, **options)
+
+
+class ClientTestCase(unittest.TestCase):
+
+    def test_connection_reuse(self):
+        # Test that consecutive calls go through the same keep-alive connection
+        with StubArxivServer(lambda params: (200, FEED)) as server:
+            client = make_client(server)
+            for start in range(10):
+                response = client.get(params={"search_query": "all", "start": start})
+                self.assertEqual(response.content, FEED)
+            client.close()
+
+        self.assertEqual(len(server.calls), 10)
+        self.assertEqual(server.calls[3]["start"], "3")
+        self.assertEqual(len(set(server.client_ports)), 1)
+
+    def test_retry_on_server_errors(self):
+        # Test that 503 and 429 answers are retried until the call succeeds
+        statuses = [503, 429, 200]
+
+        with StubArxivServer(lambda params: (statuses.pop(0), FEED)) as server:
+            client = make_client(server)
+            response = client.get(params={"id_list": "2401.13999"})
+            client.close()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(server.calls), 3)
+
+    def test_retries_exhausted(self):
+        # Test that the last error is raised once every retry failed
+        with StubArxivServer(lambda params: (500, b"")) as server:
+            client = make_client(server, retries=2)
+            with self.assertRaises(requests.HTTPError):
+                client.get(params={"id_list": "2401.13999"})
+            client.close()
+
+        self.assertEqual(len(server.calls), 3)
+
+    def test_backoff(self):
+        # Test that the wait doubles on each retry, plus at most backoff_jitter seconds
+        client = ArxivClient(backoff_factor=1, backoff_max=6, backoff_jitter=0.5)
+        for attempt, base in enumerate([1, 2, 4, 6, 6]):
+            delay = client.backoff(attempt)
+            self.assertGreaterEqual(delay, base)
+            self.assertLessEqual(delay, base + 0.5)
+        self.assertEqual(client.backoff(0, retry_after="2"), 2)
+
+    def test_rate_limit(self):
+        # Test that calls from several clients share the same rate limiter
+        limiter = RateLimiter(0.2)
+        with StubArxivServer(lambda params: (200, FEED)) as server:
+            clients = [make_client(server, limiter=limiter) for _ in range(2)]
+            start = time.monotonic()
+            for client in clients * 2:
+                client.get()
+            elapsed = time.monotonic() - start
+            for client in clients:
+                client.close()
+
+        self.assertGreaterEqual(elapsed, 0.6)
+
+
+if __name__ == "__main__":
+    unittest.main()
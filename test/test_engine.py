@@ -0,0 +1,73 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from src.engine import iter_in_order
+
+
+class EngineTestCase(unittest.TestCase):
+
+    def test_iter_in_order_keeps_order(self):
+        # Test that results come out in submission order even when later calls finish first
+        def slow_identity(value):
+            time.sleep(0.01 * (5 - value))
+            return value
+
+        results = list(iter_in_order(slow_identity, ({"value": i} for i in range(5)), concurrency=3))
+        self.assertEqual(results, [0, 1, 2, 3, 4])
+
+    def test_iter_in_order_concurrency_limit(self):
+        # Test that no more than `concurrency` calls run at the same time
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def tracked_call(value):
+            with lock:
+                running.append(value)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(value)
+            return value
+
+        start = time.monotonic()
+        results = list(iter_in_order(tracked_call, ({"value": i} for i in range(12)), concurrency=4))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(results, list(range(12)))
+        self.assertEqual(max(peak), 4)
+        # 12 calls of 20ms with 4 in flight take about 60ms instead of 240ms
+        self.assertLess(elapsed, 0.2)
+
+    def test_iter_in_order_raises(self):
+        # Test that an error raised by a call reaches the consumer at its position
+        def failing_call(value):
+            if value == 2:
+                raise ValueError("failed")
+            return value
+
+        results = iter_in_order(failing_call, ({"value": i} for i in range(5)), concurrency=2)
+        self.assertEqual([next(results), next(results)], [0, 1])
+        with self.assertRaises(ValueError):
+            next(results)
+
+    def test_iter_in_order_serial(self):
+        # Test that a concurrency of 1 makes the calls one by one on the calling thread
+        threads = []
+
+        def record_thread(value):
+            threads.append(threading.current_thread())
+            return value
+
+        results = list(iter_in_order(record_thread, ({"value": i} for i in range(3)), concurrency=1))
+        self.assertEqual(results, [0, 1, 2])
+        self.assertEqual(set(threads), {threading.current_thread()})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import sys
+import csv
+import gzip
+import io
+import json
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
+from src.app import app, db
+from src.cache import response_cache
+from src.export import CSV_COLUMNS, iter_export_batches
+from src.instrumentation import count_queries
+from src.models import Article, Author
+
+
+class ExportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        app.config["TESTING"] = True
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            for i in range(25):
+                article = Article(
+                    id=f"export_{i:02d}",
+                    title=f"Article {i}, with a comma",
+                    summary="First line\nsecond line",
+                    published_date=f"2024-01-{i + 1:02d}T12:00:00Z",
+                )
+                db.session.add(Author(name=f"Author {i}", article=article))
+                db.session.add(Author(name="Shared Author", article=article))
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        response_cache.clear()
+
+    def test_export_ndjson(self):
+        response = self.app.get("/export")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+
+        articles = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(articles), 25)
+        self.assertEqual(articles[0]["published_date"], "2024-01-01T12:00:00Z")
+        self.assertEqual(articles[0]["authors"], [{"name": "Author 0"}, {"name": "Shared Author"}])
+
+    def test_export_csv_with_filters(self):
+        response = self.app.get("/export?format=csv&start_date=2024-01-10&end_date=2024-01-20")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/csv")
+
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        # From January 10 to January 20 included
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(tuple(rows[0]), CSV_COLUMNS)
+        self.assertEqual(rows[0]["title"], "Article 9, with a comma")
+        self.assertEqual(rows[0]["summary"], "First line\nsecond line")
+        self.assertEqual(rows[0]["authors"], "Author 9; Shared Author")
+
+    def test_export_gzip(self):
+        response = self.app.get("/export?format=csv&compress=gzip")
+        self.assertEqual(response.mimetype, "application/gzip")
+        self.assertIn("articles.csv.gz", response.headers["Content-Disposition"])
+        lines = gzip.decompress(response.data).decode("utf-8").splitlines()
+        self.assertEqual(lines[0], ",".join(CSV_COLUMNS))
+
+    def test_export_invalid_arguments(self):
+        self.assertEqual(self.app.get("/export?format=xml").status_code, 400)
+        self.assertEqual(self.app.get("/export?compress=zip").status_code, 400)
+        self.assertEqual(self.app.get("/export?start_date=yesterday").status_code, 400)
+
+    def test_iter_export_batches(self):
+        # Authors are loaded once per batch, not once per article
+        with app.app_context(), count_queries(db.engine) as counter:
+            batches = list(iter_export_batches(Article.query, batch_size=10))
+        self.assertEqual([len(batch) for batch in batches], [10, 10, 5])
+        self.assertEqual(batches[2][4]["authors"], [{"name": "Author 24"}, {"name": "Shared Author"}])
+        self.assertEqual(counter.count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import sys
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from src.instrumentation import NULL_TIMER, Histogram, Metrics, server_timing_header
+
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_render_prometheus_text(self):
+        histogram = Histogram("request_seconds", "Request time.", ("route",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, "/articles")
+        histogram.observe(0.5, "/articles")
+        histogram.observe(5.0, "/articles")
+        histogram.observe(0.1, 'quoted "route"')
+
+        text = histogram.render()
+        self.assertIn("# TYPE request_seconds histogram", text)
+        self.assertIn('request_seconds_bucket{route="/articles",le="0.1"} 1', text)
+        self.assertIn('request_seconds_bucket{route="/articles",le="1.0"} 2', text)
+        self.assertIn('request_seconds_bucket{route="/articles",le="+Inf"} 3', text)
+        self.assertIn('request_seconds_sum{route="/articles"} 5.55', text)
+        self.assertIn('request_seconds_count{route="/articles"} 3', text)
+        # Bucket bounds are inclusive and label values are escaped
+        self.assertIn('request_seconds_bucket{route="quoted \\"route\\"",le="0.1"} 1', text)
+        self.assertEqual(histogram.count("/articles"), 3)
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    def test_timers_record_stages(self):
+        metrics = Metrics()
+        with metrics.timer("serialize"):
+            pass
+        items = list(metrics.timed_iter(iter(range(3)), "parse"))
+
+        self.assertEqual(items, [0, 1, 2])
+        self.assertEqual(metrics.stages.count("serialize"), 1)
+        # A lazily consumed iterable is one sample, recorded once it is exhausted
+        self.assertEqual(metrics.stages.count("parse"), 1)
+
+    def test_timed_iter_records_when_closed_early(self):
+        metrics = Metrics()
+        items = metrics.timed_iter(iter(range(10)), "parse")
+        next(items)
+        items.close()
+        self.assertEqual(metrics.stages.count("parse"), 1)
+
+    def test_disabled_metrics_record_nothing(self):
+        metrics = Metrics(enabled=False)
+        iterable = iter(range(3))
+
+        self.assertIs(metrics.timer("sql"), NULL_TIMER)
+        self.assertIs(metrics.timed_iter(iterable, "parse"), iterable)
+        self.assertEqual(metrics.render().count("_bucket"), 0)
+
+    def test_server_timing_header(self):
+        header = server_timing_header({"upstream": (0.25, 1), "sql": (0.0012, 3)}, 0.3)
+        self.assertEqual(header, 'sql;dur=1.20;desc="3 calls", upstream;dur=250.00;desc="1 calls", total;dur=300.00')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
+from src.app import app, db
+from src.leases import acquire_lease, lease, lease_holder, release_lease
+
+
+class LeasesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_acquire_and_release(self):
+        with app.app_context():
+            self.assertTrue(acquire_lease("article:1", "worker-1"))
+            self.assertFalse(acquire_lease("article:1", "worker-2"))
+            self.assertEqual(lease_holder("article:1"), "worker-1")
+
+            # Only the owner releases its lease
+            release_lease("article:1", "worker-2")
+            self.assertEqual(lease_holder("article:1"), "worker-1")
+            release_lease("article:1", "worker-1")
+            self.assertIsNone(lease_holder("article:1"))
+
+    def test_expired_lease_is_taken_over(self):
+        with app.app_context():
+            self.assertTrue(acquire_lease("article:1", "dead-worker", ttl=timedelta(0)))
+            self.assertTrue(acquire_lease("article:1", "worker-2"))
+            self.assertEqual(lease_holder("article:1"), "worker-2")
+
+    def test_lease_waits_for_holder(self):
+        events = []
+
+        def hold(name, duration):
+            with app.app_context(), lease("article:1", poll_interval=0.01) as acquired:
+                events.append((name, "start", acquired))
+                time.sleep(duration)
+                events.append((name, "end", acquired))
+
+        first = threading.Thread(target=hold, args=("first", 0.2))
+        first.start()
+        time.sleep(0.05)
+        second = threading.Thread(target=hold, args=("second", 0))
+        second.start()
+        first.join()
+        second.join()
+
+        self.assertEqual(
+            events,
+            [("first", "start", True), ("first", "end", True), ("second", "start", True), ("second", "end", True)],
+        )
+
+    def test_lease_wait_timeout(self):
+        with app.app_context():
+            acquire_lease("article:1", "stuck-worker")
+            with lease("article:1", wait_timeout=0.05, poll_interval=0.01) as acquired:
+                self.assertFalse(acquired)
+            # The lease of the other worker is left alone
+            self.assertEqual(lease_holder("article:1"), "stuck-worker")
+
+    def test_waiting_reads_until_the_lease_looks_free(self):
+        def release_later():
+            time.sleep(0.15)
+            with app.app_context():
+                release_lease("article:1", "other-worker")
+
+        with app.app_context():
+            acquire_lease("article:1", "other-worker")
+            releaser = threading.Thread(target=release_later)
+            with patch("src.leases.acquire_lease", wraps=acquire_lease) as acquire:
+                releaser.start()
+                with lease("article:1", wait_timeout=5, poll_interval=0.01) as acquired:
+                    self.assertTrue(acquired)
+            releaser.join()
+            # No write transaction while the other worker held the lease
+            self.assertEqual(acquire.call_count, 1)
+
+            acquire_lease("article:1", "stuck-worker")
+            with patch("src.leases.acquire_lease", wraps=acquire_lease) as acquire:
+                with lease("article:1", wait_timeout=0.1, poll_interval=0.01) as acquired:
+                    self.assertFalse(acquired)
+            self.assertEqual(acquire.call_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
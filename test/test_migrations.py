@@ -0,0 +1,145 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from sqlalchemy import create_engine
+from src.migrations import MIGRATIONS, migrate
+
+# Schema of the article table before dates were typed
+LEGACY_ARTICLE_DDL = """
+CREATE TABLE article (
+    id VARCHAR(255) NOT NULL,
+    title VARCHAR(255),
+    summary TEXT,
+    published_date VARCHAR(20),
+    updated_date VARCHAR(20),
+    doi VARCHAR(50),
+    comment TEXT,
+    journal_reference VARCHAR(255),
+    PRIMARY KEY (id)
+)
+"""
+
+# Schema of the author table before authors were normalized, one row per (article, name)
+LEGACY_AUTHOR_DDL = """
+CREATE TABLE author (
+    id INTEGER NOT NULL,
+    name VARCHAR(255),
+    article_id VARCHAR(255) NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(article_id) REFERENCES article (id) ON DELETE CASCADE
+)
+"""
+
+
+class MigrationsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # Create a database shaped like the ones of older versions
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine("sqlite:///" + os.path.join(self.directory.name, "legacy.db"))
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(LEGACY_ARTICLE_DDL)
+            connection.exec_driver_sql(LEGACY_AUTHOR_DDL)
+            connection.exec_driver_sql(
+                "INSERT INTO article (id, published_date, updated_date) VALUES (?, ?, ?)",
+                [
+                    ("article_1", "2024-01-25T07:57:41Z", "2024-01-26T08:00:00Z"),
+                    ("article_2", "2024-01-27", ""),
+                    ("article_3", None, None),
+                    ("article_4", "2024-01-28T00:00:00Z", "2024-01-28T00:00:00Z"),
+                    ("article_5", "2023-12-31T23:59:59Z", "2023-12-31T23:59:59Z"),
+                ],
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO author (name, article_id) VALUES (?, ?)",
+                [
+                    ("Jane Doe", "article_1"),
+                    ("John Smith", "article_1"),
+                    ("John Smith", "article_2"),
+                    ("jane  DOE", "article_2"),
+                    ("Jane Doe", "article_3"),
+                    ("Ghost Author", "deleted_article"),
+                ],
+            )
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def test_migrate_legacy_database(self):
+        # Test that dates are rewritten in batches and the new column is added
+        with self.engine.connect() as connection:
+            self.assertEqual(migrate(connection, batch_size=2), len(MIGRATIONS))
+
+            columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(article)")}
+            self.assertIn("primary_category", columns)
+            rows = dict(
+                connection.exec_driver_sql("SELECT id, published_date FROM article").all()
+            )
+            self.assertEqual(rows["article_1"], "2024-01-25 07:57:41.000000")
+            self.assertEqual(rows["article_2"], "2024-01-27 00:00:00.000000")
+            self.assertIsNone(rows["article_3"])
+            self.assertEqual(rows["article_5"], "2023-12-31 23:59:59.000000")
+            self.assertIsNone(
+                connection.exec_driver_sql("SELECT updated_date FROM article WHERE id = 'article_2'").scalar()
+            )
+
+    def test_migrate_normalizes_authors(self):
+        # Test that duplicated author rows become one author listed in order on each article
+        with self.engine.connect() as connection:
+            migrate(connection, batch_size=2)
+
+            columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(author)")}
+            self.assertEqual(columns, {"id", "name", "key"})
+            self.assertEqual(
+                connection.exec_driver_sql("SELECT key, name FROM author ORDER BY id").all(),
+                [("jane doe", "Jane Doe"), ("john smith", "John Smith")],
+            )
+            authors = connection.exec_driver_sql(
+                "SELECT article_author.article_id, author.name FROM article_author "
+                "JOIN author ON author.id = article_author.author_id "
+                "ORDER BY article_author.article_id, article_author.position"
+            ).all()
+            self.assertEqual(
+                authors,
+                [
+                    ("article_1", "Jane Doe"),
+                    ("article_1", "John Smith"),
+                    ("article_2", "John Smith"),
+                    ("article_2", "Jane Doe"),
+                    ("article_3", "Jane Doe"),
+                ],
+            )
+
+    def test_migrate_adds_job_heartbeats(self):
+        # Test that the job table of the first version of the job queue gets its new column
+        with self.engine.connect() as connection:
+            connection.exec_driver_sql("CREATE TABLE job (id VARCHAR(36) NOT NULL, status VARCHAR(20), PRIMARY KEY (id))")
+            connection.commit()
+            migrate(connection)
+
+            columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(job)")}
+            self.assertIn("heartbeat_at", columns)
+
+    def test_migrate_is_idempotent(self):
+        # Test that a migrated database is left unchanged, even when a step runs again
+        with self.engine.connect() as connection:
+            migrate(connection)
+            before = connection.exec_driver_sql("SELECT * FROM article ORDER BY id").all()
+            authors = connection.exec_driver_sql("SELECT * FROM article_author ORDER BY article_id, position").all()
+
+            self.assertEqual(migrate(connection), len(MIGRATIONS))
+            connection.exec_driver_sql("PRAGMA user_version = 0")
+            migrate(connection)
+            self.assertEqual(connection.exec_driver_sql("SELECT * FROM article ORDER BY id").all(), before)
+            self.assertEqual(
+                connection.exec_driver_sql("SELECT * FROM article_author ORDER BY article_id, position").all(), authors
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ import sys
 
 # Add the root directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
 from src.app import app, db
 from src.models import Article, Author
 
@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+import json
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import feedparser
+from pathlib import Path
+from src.parser import CATEGORY_PATTERN, iter_feed_entries
+
+FEED_WITH_EDGE_CASES = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:arxiv="http://arxiv.org/schemas/atom">
+  <entry>
+    <id>http://arxiv.org/abs/2401.00001v2</id>
+    <updated>2024-01-25T07:57:41Z</updated>
+    <published>2024-01-24T07:57:41Z</published>
+    <title>  Multi line
+  title &amp; $x&lt;y$ </title>
+    <summary>  A summary with &lt;tags&gt; and <![CDATA[cdata & more]]>
+on two lines
+</summary>
+    <author><name>Jane  Doe</name><arxiv:affiliation>Somewhere</arxiv:affiliation></author>
+    <author><name>John Doe</name></author>
+    <arxiv:doi>10.1000/xyz</arxiv:doi>
+    <arxiv:journal_ref>J. Phys. 1 (2024)</arxiv:journal_ref>
+    <arxiv:primary_category term="cond-mat.str-el" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="cond-mat.str-el" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="hep-th" scheme="http://arxiv.org/schemas/atom"/>
+    <category term="I.2.6" scheme="http://arxiv.org/schemas/atom"/>
+    <arxiv:comment>
+      10 pages
+    </arxiv:comment>
+  </entry>
+  <entry>
+    <id>http://arxiv.org/abs/2401.00002v1</id>
+    <title>No optional fields</title>
+  </entry>
+</feed>
+"""
+
+
+def feedparser_articles(content):
+    """Builds the article dictionaries the way the feedparser-based code did."""
+    articles = []
+    for entry in feedparser.parse(content).entries:
+        articles.append(
+            {
+                "id": entry.get("id", "").split("/")[-1],
+                "title": entry.get("title", ""),
+                "summary": entry.get("summary", ""),
+                "published_date": entry.get("published", ""),
+                "updated_date": entry.get("updated", ""),
+                "doi": entry.get("arxiv_doi", ""),
+                "comment": entry.get("arxiv_comment", ""),
+                "journal_reference": entry.get("arxiv_journal_ref", ""),
+                "primary_category": entry.get("arxiv_primary_category", {}).get("term", ""),
+                "categories": [tag["term"] for tag in entry.get("tags", []) if CATEGORY_PATTERN.match(tag["term"])],
+                "authors": [{"name": author.get("name", "")} for author in entry.get("authors", [])],
+            }
+        )
+    return articles
+
+
+class ParserTestCase(unittest.TestCase):
+
+    def setUp(self):
+        test_data = Path(__file__).parent / "test_data"
+        with open(test_data / "2401.13999-arxiv.xml", "rb") as file:
+            self.feed_content = file.read()
+        with open(test_data / "2401.13999-function.json", "r") as file:
+            self.expected_article = json.load(file)
+
+    def test_iter_feed_entries(self):
+        # Test parsing the reference feed
+        articles = list(iter_feed_entries(self.feed_content))
+        self.assertEqual(articles, [self.expected_article])
+
+    def test_iter_feed_entries_matches_feedparser(self):
+        # Test that the output is the same as the feedparser-based conversion
+        for content in (self.feed_content, FEED_WITH_EDGE_CASES):
+            self.assertEqual(list(iter_feed_entries(content)), feedparser_articles(content))
+
+    def test_iter_feed_entries_categories(self):
+        # Test that MSC and ACM classes are not taken for ArXiv categories
+        articles = list(iter_feed_entries(FEED_WITH_EDGE_CASES))
+        self.assertEqual(articles[0]["primary_category"], "cond-mat.str-el")
+        self.assertEqual(articles[0]["categories"], ["cond-mat.str-el", "hep-th"])
+        self.assertEqual(articles[1]["categories"], [])
+
+    def test_iter_feed_entries_from_stream(self):
+        # Test parsing from a binary stream instead of bytes
+        with open(Path(__file__).parent / "test_data" / "2401.13999-arxiv.xml", "rb") as file:
+            articles = list(iter_feed_entries(file))
+        self.assertEqual(articles, [self.expected_article])
+
+    def test_iter_feed_entries_malformed(self):
+        # Test that a body which is not a feed yields no entries
+        self.assertEqual(list(iter_feed_entries(b"")), [])
+        self.assertEqual(list(iter_feed_entries(b"<html><body>Rate limited</body>")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import os
+import sys
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
+from sqlalchemy import text
+from src.app import app, db
+from src.cache import response_cache
+from src.models import Article
+from src.search import match_expression
+
+
+class SearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        app.config["TESTING"] = True
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all(
+                [
+                    Article(id="a1", title="Neural networks for physics", summary="We train models."),
+                    Article(id="a2", title="Fano threefolds", summary="Optimal degenerations of neural networks."),
+                    Article(id="a3", title="Quantum computing", summary="Networks of qubits, not neural ones."),
+                    Article(id="a4", title="Graph theory", summary="Nothing related."),
+                ]
+            )
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        response_cache.clear()
+
+    def search(self, query):
+        response = self.app.get("/articles", query_string={"query": query})
+        self.assertEqual(response.status_code, 200)
+        return [article["id"] for article in response.get_json()["articles"]]
+
+    def test_search_title_and_summary(self):
+        # A title match ranks above a summary match
+        self.assertEqual(self.search("neural"), ["a1", "a2", "a3"])
+        self.assertEqual(self.search("qubits"), ["a3"])
+
+    def test_search_prefix_and_phrase(self):
+        self.assertEqual(self.search("degenerat*"), ["a2"])
+        self.assertEqual(self.search('"neural networks"'), ["a1", "a2"])
+        self.assertEqual(self.search("neural networks"), ["a1", "a2", "a3"])
+
+    def test_search_special_characters(self):
+        self.assertEqual(self.search('AND "unbalanced ( NEAR'), [])
+        self.assertEqual(self.search("*"), ["a1", "a2", "a3", "a4"])
+
+    def test_search_index_follows_writes(self):
+        self.app.post("/articles", json={"id": "a4", "title": "Graph neural networks", "summary": "Updated."})
+        self.assertIn("a4", self.search("neural"))
+
+        self.app.post("/remove/a1")
+        self.assertNotIn("a1", self.search("neural"))
+
+        with app.app_context():
+            # The index stays consistent with the article table
+            db.session.execute(text("INSERT INTO article_fts(article_fts, rank) VALUES ('integrity-check', 1)"))
+
+    def test_match_expression(self):
+        self.assertEqual(match_expression('quantum "neural network" optim*'), '"quantum" "neural network" "optim"*')
+        self.assertEqual(match_expression("K-unstable"), '"K unstable"')
+        self.assertIsNone(match_expression('"" *'))
+
+
+if __name__ == "__main__":
+    unittest.main()
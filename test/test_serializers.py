@@ -0,0 +1,51 @@
+import unittest
+import os
+import sys
+import gzip
+from datetime import datetime
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+from unittest.mock import patch
+from werkzeug.datastructures import Accept
+from src.serializers import compress, dumps, loads, negotiate_encoding
+
+DATA = {"articles": [{"id": "2401.13999", "title": "Fano threefolds, Kähler", "authors": [{"name": "A"}]}]}
+
+
+class SerializersTestCase(unittest.TestCase):
+
+    def test_dumps_compact_and_pretty(self):
+        self.assertEqual(
+            dumps(DATA),
+            '{"articles":[{"id":"2401.13999","title":"Fano threefolds, Kähler","authors":[{"name":"A"}]}]}'.encode(),
+        )
+        self.assertTrue(dumps(DATA, pretty=True).startswith(b'{\n  "articles": [\n    {\n'))
+        self.assertEqual(loads(dumps(DATA, pretty=True)), DATA)
+
+    def test_dumps_standard_library_fallback(self):
+        # Without the optional encoders the output is the same
+        expected = dumps(DATA)
+        with patch("src.serializers.orjson", None), patch("src.serializers.msgspec", None):
+            self.assertEqual(dumps(DATA), expected)
+            self.assertEqual(loads(dumps(DATA, pretty=True)), DATA)
+            self.assertEqual(dumps({"at": datetime(2024, 1, 25, 7, 57, 41)}), b'{"at":"2024-01-25T07:57:41"}')
+        self.assertEqual(dumps({"at": datetime(2024, 1, 25, 7, 57, 41)}), b'{"at":"2024-01-25T07:57:41"}')
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding(Accept([("gzip", 1), ("deflate", 1)])), "gzip")
+        self.assertIsNone(negotiate_encoding(Accept([("gzip", 0)])))
+        self.assertIsNone(negotiate_encoding(Accept()))
+        with patch("src.serializers.brotli", object()):
+            self.assertEqual(negotiate_encoding(Accept([("gzip", 1), ("br", 1)])), "br")
+        with patch("src.serializers.brotli", None):
+            self.assertEqual(negotiate_encoding(Accept([("gzip", 1), ("br", 1)])), "gzip")
+
+    def test_compress(self):
+        body = dumps(DATA) * 100
+        self.assertEqual(gzip.decompress(compress(body, "gzip")), body)
+        self.assertIs(compress(body, None), body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import unittest
+import os
+import sys
+import tempfile
+from functools import partial
+from unittest.mock import patch
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
+from src.app import app, db
+from src.cache import response_cache
+from src.leases import acquire_lease, lease, release_lease
+from src.models import Article
+from src import similar
+from src.similar import SIMILAR_LEASE_KEY, SimilarIndex, similar_index, tokenize
+
+SUMMARIES = {
+    "nn1": "Deep neural networks trained with gradient descent on image classification benchmarks.",
+    "nn2": "Training deep neural networks for image recognition with stochastic gradient descent.",
+    "nn3": "Recurrent neural networks for speech recognition, trained end to end.",
+    "graph": "Chromatic number of planar graphs and the four colour theorem.",
+    "fano": "Optimal degenerations of Fano threefolds and K-stability.",
+}
+
+
+class SimilarTestCase(unittest.TestCase):
+    # Ranking backend under test, see ScipySimilarTestCase
+    backend = "python"
+
+    def setUp(self):
+        backend = patch("src.similar.SIMILAR_BACKEND", self.backend)
+        backend.start()
+        self.addCleanup(backend.stop)
+
+        app.config["TESTING"] = True
+        self.directory = tempfile.TemporaryDirectory()
+        app.config["SIMILAR_INDEX_PATH"] = self.directory.name
+        app.config["SIMILAR_REFRESH_INTERVAL"] = 0
+        similar_index.init_app(app)
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all(
+                [Article(id=article_id, title=f"Title {article_id}", summary=summary) for article_id, summary in SUMMARIES.items()]
+            )
+            db.session.add(Article(id="empty", title="No abstract"))
+            db.session.commit()
+            self.assertTrue(similar_index.build())
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        response_cache.clear()
+        del app.config["SIMILAR_INDEX_PATH"], app.config["SIMILAR_REFRESH_INTERVAL"]
+        similar_index.init_app(app)
+        self.directory.cleanup()
+
+    def similar(self, article_id, **params):
+        response = self.app.get(f"/articles/{article_id}/similar", query_string=params)
+        self.assertEqual(response.status_code, 200)
+        return [article["id"] for article in response.get_json()["similar"]]
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("The K-stability of Fano 3-folds, and 2 more."), ["stability", "fano", "folds"])
+
+    def test_similar_articles(self):
+        response = self.app.get("/articles/nn1/similar", query_string={"k": 2})
+        data = response.get_json()
+        self.assertEqual(data["article_id"], "nn1")
+        self.assertEqual([article["id"] for article in data["similar"]], ["nn2", "nn3"])
+        self.assertEqual(data["similar"][0]["title"], "Title nn2")
+        self.assertGreater(data["similar"][0]["score"], data["similar"][1]["score"])
+        # Articles sharing no term are not similar
+        self.assertEqual(self.similar("graph"), [])
+        self.assertEqual(self.similar("empty"), [])
+        self.assertEqual(self.app.get("/articles/unknown/similar").status_code, 404)
+
+    def test_invalid_k(self):
+        for k in ("abc", "0", "-1", "101"):
+            response = self.app.get("/articles/nn1/similar", query_string={"k": k})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("k must be", response.get_json()["error"])
+        self.assertEqual(len(self.similar("nn1", k=100)), 2)
+
+    def test_batched_queries(self):
+        with app.app_context():
+            ranked = similar_index.similar(["nn3", "empty", "nn2"], k=1)
+        self.assertEqual(ranked[0][0][0], "nn2")
+        self.assertIsNone(ranked[1])
+        self.assertEqual(ranked[2][0][0], "nn1")
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.similar("graph"), [])
+        builds = similar_index.builds
+
+        self.app.post("/articles", json={"id": "graph2", "title": "Graphs", "summary": "Planar graphs are four colourable."})
+        self.assertEqual(self.similar("graph"), ["graph2"])
+        self.app.post("/articles", json={"id": "nn2", "title": "Changed", "summary": "Colouring planar graphs."})
+        self.assertCountEqual(self.similar("graph"), ["nn2", "graph2"])
+        self.assertNotIn("nn2", self.similar("nn1"))
+        self.app.post("/remove/graph2")
+        self.assertEqual(self.similar("graph"), ["nn2"])
+
+        # Applied incrementally, without rebuilding the index
+        self.assertEqual(similar_index.builds, builds)
+        with app.app_context():
+            self.assertEqual(similar_index.stats()["articles"], 5)
+            self.assertEqual(db.session.query(Article).count(), 6)
+
+    def test_index_built_in_background(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        app.config["SIMILAR_INDEX_PATH"] = directory.name
+        similar_index.init_app(app)
+
+        # Requests do not wait for the first index
+        response = self.app.get("/articles/nn1/similar")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "30")
+
+        similar_index.wait()
+        self.assertEqual(self.similar("nn1")[0], "nn2")
+
+    def test_build_skipped_when_done_by_another_worker(self):
+        index = SimilarIndex(self.directory.name, refresh_interval=0)
+        with app.app_context():
+            # The index found missing was built while this worker waited for the lease
+            self.assertTrue(index.build(stale_generation=0))
+            self.assertEqual(index.builds, 0)
+            self.assertEqual(index.stats()["articles"], 5)
+
+            self.assertTrue(index.build(stale_generation=1))
+            self.assertEqual(index.builds, 1)
+            self.assertEqual(index._data.generation, 2)
+
+    def test_lease_held_by_another_worker(self):
+        self.app.post("/articles", json={"id": "graph2", "title": "Graphs", "summary": "Planar graphs are four colourable."})
+        with app.app_context():
+            self.assertTrue(acquire_lease(SIMILAR_LEASE_KEY, "other"))
+            # Queries answer from the current index instead of waiting for the changes
+            self.assertEqual(similar_index.similar(["graph"])[0], [])
+            with patch("src.similar.lease", partial(lease, wait_timeout=0.05)):
+                self.assertFalse(similar_index.build())
+            release_lease(SIMILAR_LEASE_KEY, "other")
+            self.assertEqual(similar_index.similar(["graph"])[0][0][0], "graph2")
+
+    def test_snapshots_share_postings(self):
+        if self.backend != "python":
+            self.skipTest("The inverted index is used by the Python backend")
+        with app.app_context():
+            similar_index.similar(["nn1"])
+            first = similar_index._data
+            self.app.post("/articles", json={"id": "nn4", "title": "Networks", "summary": "Deep neural networks."})
+            similar_index.similar(["nn1"])
+            second = similar_index._data
+
+        # One inverted index per generation, extended by each snapshot once
+        self.assertIsNot(first, second)
+        self.assertIs(first._postings, second._postings)
+        rows, _ = first._postings.columns[first.columns["neural"]]
+        self.assertEqual(len(rows), len(set(rows)))
+        self.assertEqual(first.top_k([first.row("nn2")], 2)[0][0][0], first.row("nn1"))
+
+    def test_index_is_persisted(self):
+        self.similar("nn1")
+        index = SimilarIndex(self.directory.name, refresh_interval=0)
+        with app.app_context():
+            self.assertEqual(index.similar(["nn2"], k=1)[0][0][0], "nn1")
+        self.assertEqual(index.builds, 0)
+
+    def test_index_rebuilt_for_new_database(self):
+        self.similar("nn1")
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.create_all()
+            db.session.add_all([Article(id="a", summary="Planar graphs"), Article(id="b", summary="Planar graphs")])
+            db.session.commit()
+        response_cache.clear()
+        # The index of the previous database answers while the new one is built
+        self.assertEqual(self.similar("a"), [])
+        similar_index.wait()
+        response_cache.clear()
+        self.assertEqual(self.similar("a"), ["b"])
+        self.assertEqual(self.app.get("/articles/nn1/similar").status_code, 404)
+
+
+@unittest.skipUnless(similar.sparse is not None, "NumPy and SciPy are not installed")
+class ScipySimilarTestCase(SimilarTestCase):
+    backend = "scipy"
+
+
+if __name__ == "__main__":
+    unittest.main()
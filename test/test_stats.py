@@ -0,0 +1,165 @@
+import unittest
+import os
+import sys
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
+from unittest.mock import patch
+from sqlalchemy import text
+from src.app import app, db
+from src.cache import response_cache
+from src.instrumentation import count_queries
+from src.stats import check_stats, rebuild_stats
+from src.utils import bulk_upsert_articles
+
+
+def entry(article_id, published_date, categories, authors):
+    return {
+        "id": article_id,
+        "title": f"Article {article_id}",
+        "summary": "Abstract.",
+        "published_date": published_date,
+        "updated_date": published_date,
+        "doi": "",
+        "comment": "",
+        "journal_reference": "",
+        "primary_category": categories[0],
+        "categories": categories,
+        "authors": [{"name": name} for name in authors],
+    }
+
+
+class StatsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        app.config["TESTING"] = True
+        self.app = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            bulk_upsert_articles(
+                [
+                    entry("a1", "2024-01-25T07:57:41Z", ["cs.AI", "cs.LG"], ["Jane Doe", "John Smith"]),
+                    entry("a2", "2024-01-27T10:00:00Z", ["cs.AI"], ["jane  doe"]),
+                    entry("a3", "2024-02-01T10:00:00Z", ["math.CO"], ["Ada Lovelace", "Jane Doe"]),
+                ]
+            )
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        response_cache.clear()
+
+    def stats(self, **params):
+        response = self.app.get("/stats", query_string=params)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def assert_consistent(self):
+        with app.app_context(), db.engine.connect() as connection:
+            self.assertEqual(
+                check_stats(connection), {"stats_month": [], "stats_category": [], "stats_author": []}
+            )
+
+    def test_stats(self):
+        data = self.stats(top_authors=2)
+        self.assertEqual(data["total"]["articles"], 3)
+        self.assertEqual(data["total"]["authors"], 3)
+        self.assertEqual(data["total"]["categories"], 3)
+        self.assertGreater(data["total"]["database_bytes"], 0)
+        self.assertEqual(data["per_month"], [{"month": "2024-01", "articles": 2}, {"month": "2024-02", "articles": 1}])
+        self.assertEqual(
+            data["per_category"],
+            [
+                {"category": "cs.AI", "articles": 2},
+                {"category": "cs.LG", "articles": 1},
+                {"category": "math.CO", "articles": 1},
+            ],
+        )
+        self.assertEqual(data["top_authors"][0], {"name": "Jane Doe", "articles": 3})
+        self.assertEqual(len(data["top_authors"]), 2)
+        self.assert_consistent()
+
+    def test_top_authors_bounds(self):
+        # Out of range numbers are brought back into 1 to STATS_MAX_TOP_AUTHORS
+        self.assertEqual(len(self.stats(top_authors=-1)["top_authors"]), 1)
+        self.assertEqual(len(self.stats(top_authors=0)["top_authors"]), 1)
+        with patch("src.app.STATS_MAX_TOP_AUTHORS", 2):
+            self.assertEqual(len(self.stats(top_authors=1000)["top_authors"]), 2)
+
+        response = self.app.get("/stats", query_string={"top_authors": "abc"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("top_authors", response.get_json()["error"])
+
+    def test_stats_follow_writes(self):
+        # Upload, update of the publication date, then deletion
+        self.app.post("/articles", json={"id": "a4", "title": "Uploaded", "published_date": "2023-12-31"})
+        self.assertEqual(self.stats()["per_month"][0], {"month": "2023-12", "articles": 1})
+        with app.app_context():
+            bulk_upsert_articles([entry("a3", "2024-03-01T10:00:00Z", ["cs.LG"], ["Ada Lovelace"])])
+            db.session.commit()
+        self.assert_consistent()
+
+        self.app.post("/remove/a1")
+        data = self.stats()
+        self.assertEqual(data["total"]["articles"], 3)
+        self.assertEqual(
+            data["per_month"],
+            [
+                {"month": "2023-12", "articles": 1},
+                {"month": "2024-01", "articles": 1},
+                {"month": "2024-03", "articles": 1},
+            ],
+        )
+        self.assertEqual(data["per_category"], [{"category": "cs.AI", "articles": 1}, {"category": "cs.LG", "articles": 1}])
+        self.assert_consistent()
+
+        self.app.post("/empty_database", data={"confirmation": "yes"})
+        data = self.stats()
+        self.assertEqual(data["total"]["articles"], 0)
+        self.assertEqual(data["per_category"], [])
+        self.assertEqual(data["top_authors"], [])
+        self.assert_consistent()
+
+    def test_stats_never_read_articles(self):
+        with app.app_context(), count_queries(db.engine) as counter:
+            self.stats()
+        self.assertGreater(counter.count, 0)
+        tables = {word for statement in counter.statements for word in statement.replace(",", " ").split()}
+        self.assertNotIn("article", tables)
+
+    def test_check_and_rebuild(self):
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(text("UPDATE stats_month SET articles = 5 WHERE month = '2024-01'"))
+                connection.execute(text("DELETE FROM stats_author"))
+            with db.engine.connect() as connection:
+                differences = check_stats(connection)
+            self.assertEqual(differences["stats_month"], [["2024-01", 5, 2]])
+            self.assertEqual(len(differences["stats_author"]), 3)
+
+            with db.engine.begin() as connection:
+                rebuild_stats(connection)
+        self.assert_consistent()
+        self.assertEqual(self.stats()["total"]["articles"], 3)
+
+    def test_check_and_rebuild_commands(self):
+        runner = app.test_cli_runner()
+        self.assertIn("Statistics are consistent", runner.invoke(args=["check-stats"]).output)
+
+        with app.app_context(), db.engine.begin() as connection:
+            connection.execute(text("UPDATE stats_month SET articles = 5 WHERE month = '2024-01'"))
+        result = runner.invoke(args=["check-stats"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("stats_month 2024-01: 5 stored, 2 counted", result.output)
+        self.assertIn("Error: Statistics are inconsistent", result.output)
+
+        self.assertEqual(runner.invoke(args=["rebuild-stats"]).output, "Statistics rebuilt\n")
+        self.assertEqual(runner.invoke(args=["check-stats"]).exit_code, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+import os
+import sys
+import threading
+from sqlalchemy import func, select, text
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
+from src.app import app, db
+from src.leases import acquire_lease, release_lease
+from src.models import Article, Category
+from src.storage import SQLITE_BUSY_TIMEOUT_MS, Writer, writer
+
+
+def add_category(term):
+    db.session.add(Category(term=term))
+    return term
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+class StorageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def blocked_writer(self):
+        """Returns a Writer busy until the returned event is set, so the next writes queue up."""
+        blocked = Writer()
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        with app.app_context():
+            blocked.submit(block)
+        started.wait()
+        return blocked, release
+
+    def test_connection_pragmas(self):
+        with app.app_context():
+            self.assertEqual(db.session.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual(db.session.execute(text("PRAGMA busy_timeout")).scalar(), SQLITE_BUSY_TIMEOUT_MS)
+            # NORMAL
+            self.assertEqual(db.session.execute(text("PRAGMA synchronous")).scalar(), 1)
+
+    def test_group_commit(self):
+        blocked, release = self.blocked_writer()
+        with app.app_context():
+            futures = [blocked.submit(add_category, f"cs.{i}") for i in range(5)]
+            release.set()
+
+            self.assertEqual([future.result() for future in futures], [f"cs.{i}" for i in range(5)])
+            self.assertEqual(db.session.scalar(select(func.count()).select_from(Category)), 5)
+        # The blocking write, then the 5 queued writes in one transaction
+        self.assertEqual(blocked.stats()["writes"], 6)
+        self.assertEqual(blocked.stats()["commits"], 2)
+
+    def test_failing_write_fails_alone(self):
+        blocked, release = self.blocked_writer()
+        with app.app_context():
+            first = blocked.submit(add_category, "cs.AI")
+            failing = blocked.submit(fail, "broken write")
+            last = blocked.submit(add_category, "cs.LG")
+            release.set()
+
+            with self.assertRaisesRegex(ValueError, "broken write"):
+                failing.result()
+            self.assertEqual(first.result(), "cs.AI")
+            self.assertEqual(last.result(), "cs.LG")
+            terms = db.session.scalars(select(Category.term).order_by(Category.term)).all()
+            self.assertEqual(terms, ["cs.AI", "cs.LG"])
+        self.assertEqual(blocked.stats()["retried_groups"], 1)
+
+    def test_nested_write_joins_the_transaction(self):
+        with app.app_context():
+            commits = writer.stats()["commits"]
+            writer.run(lambda: [add_category("cs.AI"), writer.run(add_category, "cs.LG")])
+            self.assertEqual(writer.stats()["commits"], commits + 1)
+            self.assertEqual(db.session.scalar(select(func.count()).select_from(Category)), 2)
+
+    def test_concurrent_readers_and_writers(self):
+        errors = []
+        done = threading.Event()
+
+        def write(worker):
+            try:
+                with app.app_context():
+                    for i in range(25):
+                        writer.run(lambda i=i: db.session.add(Article(id=f"{worker}.{i}", title="Stress")))
+            except Exception as e:
+                errors.append(e)
+
+        def read():
+            try:
+                with app.app_context():
+                    while not done.is_set():
+                        db.session.scalar(select(func.count()).select_from(Article))
+                        db.session.rollback()
+            except Exception as e:
+                errors.append(e)
+
+        def lease_writes():
+            # Leases commit their own transactions, waiting for the writer on the busy timeout
+            try:
+                with app.app_context():
+                    for i in range(25):
+                        self.assertTrue(acquire_lease(f"stress:{i}", "worker"))
+                        release_lease(f"stress:{i}", "worker")
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        writers = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+        writers.append(threading.Thread(target=lease_writes))
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with app.app_context():
+            self.assertEqual(db.session.scalar(select(func.count()).select_from(Article)), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
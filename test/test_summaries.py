@@ -0,0 +1,146 @@
+import unittest
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
+from unittest.mock import Mock, patch
+from src.app import app, db
+from src.cache import SingleFlight, unknown_articles
+from src.models import Article, CachedSummary
+from src.summaries import SUMMARY_NOT_AVAILABLE, SummaryCache, load_summary
+
+FEED_PATH = Path(__file__).parent / "test_data" / "2401.13999-arxiv.xml"
+SUMMARY_PATH = Path(__file__).parent / "test_data" / "2401.13999-summary.txt"
+
+
+class SummariesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        app.config["TESTING"] = True
+        self.app = app.test_client()
+        with app.app_context():
+            db.create_all()
+
+        # Every call to arXiv answers with the reference feed
+        response = Mock()
+        response.content = FEED_PATH.read_bytes()
+        patcher = patch("src.utils.arxiv_client.get", return_value=response)
+        self.arxiv_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        unknown_articles.purge()
+
+    def test_stored_article_is_not_fetched(self):
+        with app.app_context():
+            db.session.add(Article(id="2401.00001", title="Stored", summary="Stored summary"))
+            db.session.commit()
+
+        response = self.app.get("/text/2401.00001")
+        self.assertEqual(response.get_data(as_text=True), "Stored summary")
+        self.arxiv_get.assert_not_called()
+
+    def test_fetched_summary_is_cached(self):
+        expected_summary = SUMMARY_PATH.read_text()
+
+        self.assertEqual(self.app.get("/text/2401.13999").get_data(as_text=True), expected_summary)
+        self.assertEqual(self.app.get("/text/2401.13999").get_data(as_text=True), expected_summary)
+        self.assertEqual(self.arxiv_get.call_count, 1)
+
+        stats = self.app.get("/cache/stats").get_json()["summaries"]
+        self.assertEqual(stats["entries"], 1)
+        self.assertGreaterEqual(stats["hits"], 1)
+
+        # Expired entries are fetched again
+        with app.app_context():
+            db.session.get(CachedSummary, "2401.13999").fetched_at = datetime.utcnow() - timedelta(days=2)
+            db.session.commit()
+        self.app.get("/text/2401.13999")
+        self.assertEqual(self.arxiv_get.call_count, 2)
+
+    def test_unknown_article_is_not_cached(self):
+        self.arxiv_get.return_value.content = b'<feed xmlns="http://www.w3.org/2005/Atom"></feed>'
+        self.assertEqual(self.app.get("/text/2401.99999").get_data(as_text=True), SUMMARY_NOT_AVAILABLE)
+        with app.app_context():
+            self.assertIsNone(db.session.get(CachedSummary, "2401.99999"))
+
+        # The ID is remembered as unknown
+        self.assertEqual(self.app.get("/text/2401.99999").get_data(as_text=True), SUMMARY_NOT_AVAILABLE)
+        self.assertEqual(self.arxiv_get.call_count, 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = SummaryCache(max_entries=2, touch_interval=timedelta(0))
+        with app.app_context():
+            cache.set("a", "Summary a")
+            cache.set("b", "Summary b")
+            cache.get("a")
+            cache.set("c", "Summary c")
+
+            self.assertEqual(sorted(db.session.scalars(db.select(CachedSummary.article_id))), ["a", "c"])
+            self.assertEqual(cache.evictions, 1)
+
+            cache.purge()
+            self.assertIsNone(cache.get("a"))
+
+    def test_concurrent_misses_are_coalesced(self):
+        response = self.arxiv_get.return_value
+
+        def slow_get(params=None):
+            time.sleep(0.2)
+            return response
+
+        self.arxiv_get.side_effect = slow_get
+        summaries = []
+
+        def read_summary():
+            with app.app_context():
+                summaries.append(load_summary("2401.13999"))
+
+        threads = [threading.Thread(target=read_summary) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.arxiv_get.call_count, 1)
+        self.assertEqual(summaries, [SUMMARY_PATH.read_text()] * 10)
+
+    def test_single_flight_shares_exceptions(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def failing_call():
+            started.set()
+            time.sleep(0.1)
+            raise ConnectionError("arXiv is down")
+
+        def call():
+            try:
+                flight.do("key", failing_call)
+            except ConnectionError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=call)
+        follower.start()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(len(errors), 2)
+        self.assertEqual((flight.calls, flight.coalesced), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,33 +3,46 @@ import os
 import sys
 import json
 import sys
+import tracemalloc
+from datetime import datetime
 
 # Add the root directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+import test  # Points src.app at a throwaway database, before it is imported
 from unittest.mock import patch, Mock
 from pathlib import Path
+from sqlalchemy import event
 from src.app import app, db
+from src.cache import response_cache, unknown_articles
+from src.instrumentation import count_queries
 from src.utils import (
     article_to_dict,
     get_arxiv_articles,
     fetch_summary_by_id,
     populate_single_article,
     populate_articles_by_query,
+    bulk_upsert_articles,
+    populate_articles_by_ids,
+    sync_articles_by_query,
+    backfill_categories,
+    build_articles_query,
+    category_ids,
 )
-from src.models import Article, Author
+from src.models import Article, ArticleAuthor, Author, Category, HarvestCursor, SyncState
 
 
 class UtilsTestCase(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        # Mock the response from requests.get globally
-        cls.patcher = patch("src.utils.requests.get")
+        # Mock the response from the arXiv client globally
+        cls.patcher = patch("src.utils.arxiv_client.get")
         cls.mock_requests_get = cls.patcher.start()
+        cls.mock_requests_get.return_value.content = b""
 
     @classmethod
     def tearDownClass(cls):
-        # Stop patching requests.get
+        # Stop patching the arXiv client
         cls.patcher.stop()
 
     def setUp(self):
@@ -64,6 +77,8 @@ class UtilsTestCase(unittest.TestCase):
         with app.app_context():
             db.session.remove()
             db.drop_all()
+        response_cache.clear()
+        unknown_articles.purge()
 
     def test_article_to_dict(self):
         # Test converting Article object to dictionary
@@ -76,6 +91,7 @@ class UtilsTestCase(unittest.TestCase):
             doi="doi:1234/test",
             comment="Test comment",
             journal_reference="Test Journal",
+            primary_category="cs.AI",
         )
 
         # Add authors to the article
@@ -96,13 +112,20 @@ class UtilsTestCase(unittest.TestCase):
             "doi": "doi:1234/test",
             "comment": "Test comment",
             "journal_reference": "Test Journal",
+            "primary_category": "cs.AI",
             "authors": [{"name": "Author 1"}, {"name": "Author 2"}],
         }
 
         self.assertIsInstance(result_dict, dict)
         self.assertEqual(result_dict, expected_dict)
 
-    @patch("src.utils.requests.get")
+        # Stored dates are read back as dates and formatted like ArXiv dates
+        with app.app_context():
+            article = db.session.get(Article, "test_article_1")
+            self.assertEqual(article.published_date, datetime(2024, 1, 27))
+            self.assertEqual(article_to_dict(article)["published_date"], "2024-01-27T00:00:00Z")
+
+    @patch("src.utils.arxiv_client.get")
     def test_get_arxiv_articles(self, mock_requests_get):
         # Test for get_arxiv_articles
         mock_response = Mock()
@@ -111,8 +134,8 @@ class UtilsTestCase(unittest.TestCase):
         file_path = (
             Path(__file__).parent / "test_data" / "2401.13999-arxiv.xml"
         ).resolve()
-        with open(file_path, "r") as file:
-            mock_response.text = file.read()
+        with open(file_path, "rb") as file:
+            mock_response.content = file.read()
 
         mock_requests_get.return_value = mock_response
 
@@ -141,8 +164,8 @@ class UtilsTestCase(unittest.TestCase):
         file_path = (
             Path(__file__).parent / "test_data" / "2401.13999-arxiv.xml"
         ).resolve()
-        with open(file_path, "r") as file:
-            mock_response.text = file.read()
+        with open(file_path, "rb") as file:
+            mock_response.content = file.read()
 
         self.mock_requests_get.return_value = mock_response
 
@@ -168,16 +191,16 @@ class UtilsTestCase(unittest.TestCase):
             Path(__file__).parent / "test_data" / "2401.13999-arxiv.xml"
         ).resolve()
 
-        with open(template_response_path, "r") as template_file:
+        with open(template_response_path, "rb") as template_file:
             template_response_content = template_file.read()
 
         # Create a mock response with the template content
         mock_response = Mock()
-        mock_response.text = template_response_content
+        mock_response.content = template_response_content
 
         # Set up the mock to return the mocked response when the arXiv API is called
         with app.app_context(), patch(
-            "src.utils.requests.get", return_value=mock_response
+            "src.utils.arxiv_client.get", return_value=mock_response
         ):
             # Call the function that populates a single article
             article_id = "2401.13999"
@@ -208,6 +231,23 @@ class UtilsTestCase(unittest.TestCase):
             # Check if the response indicates that the article already exists
             self.assertEqual(result_duplicate[1], 400)
 
+    def test_populate_single_article_stored_meanwhile(self):
+        mock_response = Mock()
+        mock_response.content = (Path(__file__).parent / "test_data" / "2401.13999-arxiv.xml").read_bytes()
+
+        def stored_by_another_worker(article_id):
+            # Another worker stores the article while this one calls arXiv
+            db.session.add(Article(id=article_id, title="Stored meanwhile"))
+            db.session.commit()
+            return False
+
+        with app.app_context(), patch("src.utils.arxiv_client.get", return_value=mock_response), patch(
+            "src.utils.unknown_articles.contains", side_effect=stored_by_another_worker
+        ):
+            result = populate_single_article("2401.13999")
+            self.assertEqual(result[1], 400)
+            self.assertEqual(db.session.get(Article, "2401.13999").title, "Stored meanwhile")
+
     def test_populate_articles_by_query(self):
         # Test for populate_articles_by_query
         query = "test"
@@ -221,6 +261,359 @@ class UtilsTestCase(unittest.TestCase):
             result = response.get_json()
             self.assertIn("message", result)
 
+    def test_bulk_upsert_articles(self):
+        # Test for bulk_upsert_articles
+        entries = [
+            {
+                "id": f"bulk_article_{i}",
+                "title": f"Bulk Article {i}",
+                "summary": "Summary",
+                "published_date": "2024-01-27",
+                "updated_date": "2024-01-27",
+                "authors": [{"name": "Author A"}, {"name": "Author B"}],
+            }
+            for i in range(5)
+        ]
+        # An article already stored with the same updated_date is skipped
+        entries.append({"id": "test_article_1", "title": "Test Article 1", "updated_date": ""})
+
+        with app.app_context():
+            counts = bulk_upsert_articles(entries, chunk_size=2)
+            db.session.commit()
+            self.assertEqual(counts, {"inserted": 5, "updated": 0, "skipped": 1})
+            # Each author is stored once and listed on the 5 articles
+            self.assertEqual(db.session.query(Author).count(), 2)
+            self.assertEqual(db.session.query(ArticleAuthor).count(), 10)
+
+            # Only the article whose updated_date changed is rewritten
+            entries[0] = dict(entries[0], title="New Title", updated_date="2024-02-01", authors=[{"name": "Author C"}])
+            counts = bulk_upsert_articles(entries, chunk_size=2)
+            db.session.commit()
+            self.assertEqual(counts, {"inserted": 0, "updated": 1, "skipped": 5})
+
+            article = db.session.get(Article, "bulk_article_0")
+            self.assertEqual(article.title, "New Title")
+            self.assertEqual([author.name for author in article.authors], ["Author C"])
+
+    def test_bulk_upsert_articles_authors(self):
+        # Test that authors are resolved in bulk, merged by normalized name, and kept in order
+        entries = [
+            {
+                "id": f"authored_article_{i}",
+                "updated_date": "2024-01-27T10:00:00Z",
+                "authors": [{"name": f"Author {i}"}, {"name": "Jane  Doe" if i % 2 else "JANE DOE"}],
+            }
+            for i in range(50)
+        ]
+
+        with app.app_context():
+            db.session.add(Article(id="stored_article", authors=[Author(name="Jane Doe")]))
+            db.session.commit()
+
+            with count_queries(db.engine) as counter:
+                bulk_upsert_articles(entries)
+            db.session.commit()
+            # One SELECT and one INSERT per table, plus one SELECT of the new author IDs
+            self.assertLessEqual(counter.count, 6)
+
+            self.assertEqual(db.session.query(Author).count(), 51)
+            article = db.session.get(Article, "authored_article_7")
+            self.assertEqual([author.name for author in article.authors], ["Author 7", "Jane Doe"])
+            self.assertEqual(build_articles_query(author="jane doe").count(), 51)
+
+    def test_bulk_upsert_articles_categories(self):
+        # Test that categories are stored once and follow the updates of an article
+        entries = [
+            {"id": "category_article_1", "updated_date": "2024-01-27T10:00:00Z",
+             "primary_category": "cs.AI", "categories": ["cs.AI", "cs.LG"]},
+            {"id": "category_article_2", "updated_date": "2024-01-27T10:00:00Z",
+             "primary_category": "cs.LG", "categories": ["stat.ML"]},
+        ]
+
+        with app.app_context():
+            bulk_upsert_articles(entries)
+            db.session.commit()
+            self.assertEqual(db.session.query(Category).count(), 3)
+            self.assertEqual(db.session.get(Article, "category_article_2").primary_category, "cs.LG")
+
+            def category_ids(term):
+                return sorted(article.id for article in build_articles_query(subcategory=term))
+
+            self.assertEqual(category_ids("cs.LG"), ["category_article_1", "category_article_2"])
+            self.assertEqual(category_ids("stat.ML"), ["category_article_2"])
+
+            entries[0] = dict(entries[0], updated_date="2024-02-01T10:00:00Z", categories=["cs.AI", "cs.CL"])
+            counts = bulk_upsert_articles(entries)
+            db.session.commit()
+            self.assertEqual(counts, {"inserted": 0, "updated": 1, "skipped": 1})
+            self.assertEqual(category_ids("cs.LG"), ["category_article_2"])
+            self.assertEqual(category_ids("cs.CL"), ["category_article_1"])
+
+    def test_category_ids_created_meanwhile(self):
+        # Test that a category created by another worker between the lookup and the insert is reused
+        with app.app_context():
+            db.session.add(Category(term="cs.AI"))
+            db.session.commit()
+            stored_id = db.session.query(Category).filter_by(term="cs.AI").one().id
+
+            execute = db.session.execute
+            lookups = []
+
+            def first_lookup_misses(statement, *args, **kwargs):
+                lookups.append(statement)
+                if len(lookups) == 1:
+                    return Mock(all=lambda: [])
+                return execute(statement, *args, **kwargs)
+
+            with patch.object(db.session, "execute", side_effect=first_lookup_misses):
+                ids = category_ids(["cs.AI", "cs.LG"])
+            db.session.commit()
+
+            self.assertEqual(ids["cs.AI"], stored_id)
+            self.assertEqual(set(ids), {"cs.AI", "cs.LG"})
+            self.assertEqual(db.session.query(Category).count(), 2)
+
+    def test_articles_query_plans(self):
+        # Test that the date and category filters are index range scans, not table scans
+        with app.app_context():
+            plan = query_plan(build_articles_query(start_date=datetime(2024, 1, 1), end_date=datetime(2024, 2, 1)))
+            self.assertIn("SEARCH article USING INDEX ix_article_published_date_id", plan)
+
+            plan = query_plan(build_articles_query(subcategory="cs.AI"))
+            self.assertIn("SEARCH article_category USING COVERING INDEX ix_article_category_category_id", plan)
+            self.assertNotIn("SCAN", plan)
+
+            plan = query_plan(build_articles_query(author="Jane Doe"))
+            self.assertIn("SEARCH article_author USING COVERING INDEX ix_article_author_author_id", plan)
+            self.assertNotIn("SCAN", plan)
+
+    def test_backfill_categories(self):
+        # Test that the categories of stored articles are fetched by ID
+        file_path = Path(__file__).parent / "test_data" / "2401.13999-arxiv.xml"
+        mock_response = Mock()
+        mock_response.content = file_path.read_bytes()
+
+        with app.app_context(), patch("src.utils.arxiv_client.get", return_value=mock_response):
+            db.session.add(Article(id="2401.13999", title="Stored before categories"))
+            db.session.commit()
+
+            counts = backfill_categories(batch_size=2)
+            self.assertEqual(counts, {"updated": 1, "not_found": 2})
+
+            article = db.session.get(Article, "2401.13999")
+            self.assertEqual(article.primary_category, "math.AG")
+            self.assertEqual(sorted(category.term for category in article.categories), ["math.AG", "math.DG"])
+
+    def test_populate_articles_by_query_resumes_after_failure(self):
+        # Test that an interrupted paginated harvest restarts after the last committed batch
+        calls = []
+
+        def fake_fetch_arxiv_feed(query, start, max_results, start_date=None, end_date=None, sort_by=None):
+            calls.append(start)
+            if calls.count(20) == 1 and start == 20:
+                raise ConnectionError("arXiv went away")
+            return start, min(max_results, 25 - start)
+
+        with app.test_request_context(), patch(
+            "src.utils.fetch_arxiv_feed", side_effect=fake_fetch_arxiv_feed
+        ), patch("src.utils.parse_arxiv_feed", side_effect=synthetic_feed):
+            with self.assertRaises(ConnectionError):
+                populate_articles_by_query("paged", 25, page_size=10, commit_interval=10)
+            db.session.rollback()
+
+            cursor = db.session.get(HarvestCursor, "paged|||25")
+            self.assertEqual(cursor.next_start, 20)
+            self.assertEqual(db.session.query(Article).filter(Article.id.like("paged_%")).count(), 20)
+
+            response = populate_articles_by_query("paged", 25, page_size=10, commit_interval=10)
+            self.assertEqual(response.get_json()["inserted"], 5)
+            self.assertEqual(sorted(calls), [0, 10, 20, 20])
+            self.assertIsNone(db.session.get(HarvestCursor, "paged|||25"))
+
+    def test_populate_articles_by_query_memory_is_bounded(self):
+        # Test that the streaming pipeline peak memory does not grow with the harvest size
+        def peak_memory(max_results):
+            def fake_fetch_arxiv_feed(query, start, max_results, start_date=None, end_date=None, sort_by=None):
+                return start, max_results
+
+            with app.test_request_context(), patch(
+                "src.utils.fetch_arxiv_feed", side_effect=fake_fetch_arxiv_feed
+            ), patch("src.utils.parse_arxiv_feed", side_effect=synthetic_feed):
+                tracemalloc.start()
+                response = populate_articles_by_query(
+                    f"memory_{max_results}", max_results, page_size=1000, commit_interval=1000
+                )
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            counts = response.get_json()
+            self.assertEqual(counts["inserted"] + counts["skipped"], max_results)
+            return peak
+
+        small_peak = peak_memory(1000)
+        large_peak = peak_memory(100000)
+        self.assertLess(large_peak, small_peak * 1.5)
+
+    def test_sync_articles_by_query(self):
+        # Test that a sync stops paging at the articles known from the previous one
+        def synced_article(i, updated_day, published_day=None, title=None):
+            return {
+                "id": f"sync_article_{i}",
+                "title": title or f"Sync Article {i}",
+                "published_date": f"2024-03-{published_day or updated_day:02d}T00:00:00Z",
+                "updated_date": f"2024-03-{updated_day:02d}T00:00:00Z",
+                "authors": [{"name": "Author A"}],
+            }
+
+        # Most recently updated first, as sorted by lastUpdatedDate
+        feed_articles = [synced_article(i, 25 - i) for i in range(25)]
+        calls = []
+
+        def fake_fetch_arxiv_feed(query, start, max_results, start_date=None, end_date=None, sort_by=None):
+            calls.append((start, sort_by))
+            return start, max_results
+
+        def fake_parse_arxiv_feed(feed):
+            start, max_results = feed
+            return iter(feed_articles[start:start + max_results])
+
+        with app.app_context(), patch("src.utils.fetch_arxiv_feed", side_effect=fake_fetch_arxiv_feed), patch(
+            "src.utils.parse_arxiv_feed", side_effect=fake_parse_arxiv_feed
+        ):
+            counts = sync_articles_by_query("sync", 30, page_size=10, commit_interval=10)
+            self.assertEqual(counts, {"pages": 3, "inserted": 25, "updated": 0, "skipped": 0})
+            self.assertTrue(all(sort_by == "lastUpdatedDate" for _, sort_by in calls))
+            state = db.session.get(SyncState, "sync")
+            self.assertEqual(state.newest_updated_date, datetime(2024, 3, 25))
+
+            # A new article and a revision of an older one come first
+            revised = synced_article(3, 27, published_day=22, title="Revised Sync Article 3")
+            feed_articles.remove(synced_article(3, 22))
+            feed_articles[:0] = [revised, synced_article(25, 26)]
+            calls.clear()
+
+            counts = sync_articles_by_query("sync", 25, page_size=10, commit_interval=10)
+            self.assertEqual(counts, {"pages": 1, "inserted": 1, "updated": 1, "skipped": 1})
+            self.assertEqual([start for start, _ in calls], [0])
+            self.assertEqual(db.session.get(Article, "sync_article_3").title, "Revised Sync Article 3")
+
+            state = db.session.get(SyncState, "sync")
+            self.assertEqual(state.newest_updated_date, datetime(2024, 3, 27))
+            self.assertEqual(state.newest_published_date, datetime(2024, 3, 26))
+
+    def test_sync_articles_by_query_resumes_past_max_results(self):
+        # Test that new articles beyond max_results are read by the next calls before the dates move
+        def synced_article(i, updated_day):
+            return {
+                "id": f"resumed_article_{i}",
+                "title": f"Resumed Article {i}",
+                "published_date": f"2024-04-{updated_day:02d}T00:00:00Z",
+                "updated_date": f"2024-04-{updated_day:02d}T00:00:00Z",
+                "authors": [{"name": "Author A"}],
+            }
+
+        feed_articles = [synced_article(i, 5 - i) for i in range(5)]
+
+        def fake_fetch_arxiv_feed(query, start, max_results, start_date=None, end_date=None, sort_by=None):
+            return start, max_results
+
+        def fake_parse_arxiv_feed(feed):
+            start, max_results = feed
+            return iter(feed_articles[start:start + max_results])
+
+        with app.app_context(), patch("src.utils.fetch_arxiv_feed", side_effect=fake_fetch_arxiv_feed), patch(
+            "src.utils.parse_arxiv_feed", side_effect=fake_parse_arxiv_feed
+        ):
+            sync_articles_by_query("resumed", 10, page_size=10)
+
+            # 15 new articles, more than a call reads
+            feed_articles[:0] = [synced_article(i, 30 - i) for i in range(5, 20)]
+            counts = sync_articles_by_query("resumed", 10, page_size=10)
+            self.assertEqual(counts["inserted"], 10)
+            state = db.session.get(SyncState, "resumed")
+            self.assertEqual(state.newest_updated_date, datetime(2024, 4, 5))
+            self.assertEqual(state.resume_start, 10)
+
+            # An article revised meanwhile moves to the top and shifts the older ones down
+            feed_articles.insert(0, feed_articles.pop(feed_articles.index(synced_article(1, 4))))
+            feed_articles[0] = synced_article(1, 28)
+            counts = sync_articles_by_query("resumed", 10, page_size=10)
+            self.assertEqual(counts["inserted"], 5)
+            state = db.session.get(SyncState, "resumed")
+            self.assertEqual(state.newest_updated_date, datetime(2024, 4, 25))
+            self.assertIsNone(state.resume_start)
+
+            counts = sync_articles_by_query("resumed", 10, page_size=10)
+            self.assertEqual(counts["updated"], 1)
+            self.assertEqual(db.session.get(SyncState, "resumed").newest_updated_date, datetime(2024, 4, 28))
+            self.assertEqual(db.session.query(Article).filter(Article.id.like("resumed_article_%")).count(), 20)
+
+    def test_populate_articles_by_ids(self):
+        # Test that IDs are fetched in batches and that stored or malformed IDs are not requested
+        article_ids = [f"2401.{i:05d}" for i in range(250)] + ["2401.00000", "not an id", "2401.99999"]
+        requested_batches = []
+
+        def fake_get(params=None):
+            batch = params["id_list"].split(",")
+            requested_batches.append(batch)
+            response = Mock()
+            # ArXiv does not know 2401.99999 and answers with versioned IDs
+            response.content = atom_feed([f"{article_id}v1" for article_id in batch if article_id != "2401.99999"])
+            return response
+
+        with app.test_request_context(), patch("src.utils.arxiv_client.get", side_effect=fake_get):
+            db.session.add(Article(id="2401.00003", title="Stored"))
+            db.session.commit()
+
+            response = populate_articles_by_ids(article_ids, batch_size=100)
+            result = response.get_json()
+
+            self.assertEqual([len(batch) for batch in requested_batches], [100, 100, 50])
+            self.assertNotIn("2401.00003", sum(requested_batches, []))
+            self.assertEqual(result["inserted"], 249)
+            self.assertEqual(result["skipped"], 1)
+            self.assertEqual(result["not_found"], ["2401.99999", "not an id"])
+            self.assertEqual(db.session.get(Article, "2401.00042").title, "Title of 2401.00042v1")
+
+            # IDs found unknown are not requested again
+            requested_batches.clear()
+            result = populate_articles_by_ids(["2401.99999", "2401.00042"]).get_json()
+            self.assertEqual(requested_batches, [])
+            self.assertEqual(result["not_found"], ["2401.99999"])
+
+
+def atom_feed(article_ids):
+    """Builds a minimal ArXiv Atom feed with one entry per ID."""
+    entries = "".join(
+        f"<entry><id>http://arxiv.org/abs/{article_id}</id><title>Title of {article_id}</title>"
+        f"<author><name>Author A</name></author></entry>"
+        for article_id in article_ids
+    )
+    return f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'.encode()
+
+
+def query_plan(articles_query):
+    """Returns the SQLite query plan of an Article query, one step per line."""
+
+    def explain(connection, cursor, statement, parameters, context, executemany):
+        return "EXPLAIN QUERY PLAN " + statement, parameters
+
+    with db.engine.connect() as connection:
+        event.listen(connection, "before_cursor_execute", explain, retval=True)
+        return "\n".join(row[-1] for row in connection.execute(articles_query.statement))
+
+
+def synthetic_feed(feed):
+    """Stands in for parse_arxiv_feed, the feed being a (start, max_results) pair."""
+    start, max_results = feed
+    for i in range(start, start + max_results):
+        yield {
+            "id": f"paged_article_{i}",
+            "title": f"Paged Article {i}",
+            "summary": "Summary " * 100,
+            "authors": [{"name": "Author A"}, {"name": "Author B"}],
+        }
+
 
 if __name__ == "__main__":
     unittest.main()